@@ -0,0 +1,165 @@
+"""
+Batch scrape engine
+Fans a list of cities out across a bounded pool of asyncio workers, with
+global and per-upstream-host token-bucket rate limits and jittered retries
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from app.scraper import AsyncWeatherScraper
+from app.stats import percentile
+
+load_dotenv()
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 20))
+BATCH_RATE_LIMIT = float(os.getenv("BATCH_RATE_LIMIT", 20))  # upstream requests/sec, all hosts
+BATCH_HOST_RATE_LIMIT = float(os.getenv("BATCH_HOST_RATE_LIMIT", 10))  # upstream requests/sec, per host
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", 2))
+BATCH_BACKOFF_BASE = float(os.getenv("BATCH_BACKOFF_BASE", 1.0))  # seconds
+BATCH_AQI_BUDGET = float(os.getenv("BATCH_AQI_BUDGET", 10))  # seconds
+
+
+class TokenBucket:
+    """Token bucket allowing ``rate`` acquisitions per second with bursts up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RateLimiter:
+    """Global token bucket plus one token bucket per upstream host"""
+
+    def __init__(self, rate: float = BATCH_RATE_LIMIT, per_host_rate: float = BATCH_HOST_RATE_LIMIT):
+        self.per_host_rate = per_host_rate
+        self._global = TokenBucket(rate)
+        self._hosts: Dict[str, TokenBucket] = {}
+
+    async def acquire(self, host: str):
+        """Wait for permission to send one request to ``host``"""
+        bucket = self._hosts.get(host)
+        if bucket is None:
+            bucket = self._hosts.setdefault(host, TokenBucket(self.per_host_rate))
+        await bucket.acquire()
+        await self._global.acquire()
+
+
+async def scrape_cities(
+    cities: Iterable[str],
+    save: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    workers: int = BATCH_WORKERS,
+    rate: float = BATCH_RATE_LIMIT,
+    per_host_rate: float = BATCH_HOST_RATE_LIMIT,
+    max_retries: int = BATCH_MAX_RETRIES,
+    backoff_base: float = BATCH_BACKOFF_BASE,
+    scraper: Optional[AsyncWeatherScraper] = None
+) -> Dict[str, Any]:
+    """
+    Scrape weather for many cities concurrently
+    
+    Args:
+        cities: City names to scrape
+        save: Optional blocking callback run (in a thread) for each result
+        workers: Number of concurrent workers
+        rate: Global upstream requests per second (0 disables)
+        per_host_rate: Upstream requests per second per host (0 disables)
+        max_retries: Retries per city after the first failed attempt
+        backoff_base: Base delay for full-jitter exponential backoff (seconds)
+        scraper: Scraper to use; a rate-limited one is created (and closed) if omitted
+        
+    Returns:
+        Summary with success/failure counts, failed cities, per-city latency
+        percentiles and wall-clock time
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for city in cities:
+        city = city.strip()
+        if city:
+            queue.put_nowait(city)
+    total = queue.qsize()
+
+    own_scraper = scraper is None
+    if own_scraper:
+        scraper = AsyncWeatherScraper(aqi_budget=BATCH_AQI_BUDGET)
+    scraper.rate_limiter = RateLimiter(rate, per_host_rate)
+
+    latencies: List[float] = []
+    failures: Dict[str, str] = {}
+    retries = 0
+
+    async def worker():
+        nonlocal retries
+        while True:
+            try:
+                city = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            for attempt in range(max_retries + 1):
+                try:
+                    weather_data = await scraper.scrape_weather(city)
+                    weather_data.pop("cached", None)
+                    if save is not None:
+                        await asyncio.to_thread(save, weather_data)
+                    latencies.append(time.perf_counter() - start)
+                    failures.pop(city, None)
+                    break
+                except Exception as e:
+                    failures[city] = str(e)
+                    if attempt < max_retries:
+                        retries += 1
+                        await asyncio.sleep(random.uniform(0, backoff_base * 2 ** attempt))
+
+    wall_start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, min(workers, total)))))
+    finally:
+        if own_scraper:
+            await scraper.close()
+        else:
+            scraper.rate_limiter = None
+    wall_clock = time.perf_counter() - wall_start
+
+    return {
+        "total": total,
+        "successes": len(latencies),
+        "failures": len(failures),
+        "failed_cities": failures,
+        "retries": retries,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "wall_clock": wall_clock,
+        "cities_per_second": total / wall_clock if wall_clock > 0 else None,
+    }
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """One-line human readable batch summary"""
+    def ms(value):
+        return f"{value * 1000:.0f}ms" if value is not None else "n/a"
+
+    return (
+        f"{summary['successes']}/{summary['total']} succeeded, {summary['failures']} failed, "
+        f"{summary['retries']} retries, p50 {ms(summary['latency_p50'])}, "
+        f"p95 {ms(summary['latency_p95'])}, wall-clock {summary['wall_clock']:.1f}s"
+    )
@@ -0,0 +1,126 @@
+"""
+In-process response cache for scraped data
+TTL per data kind, LRU eviction by entry count, and single-flight
+coalescing of concurrent misses for the same key
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+CACHE_WEATHER_TTL = float(os.getenv("CACHE_WEATHER_TTL", 300))
+CACHE_AQI_TTL = float(os.getenv("CACHE_AQI_TTL", 1800))
+
+
+class ResponseCache:
+    """
+    Bounded TTL + LRU cache for asyncio fetches
+
+    Entries are keyed by (kind, key); each kind has its own TTL. When several
+    coroutines miss on the same key at once, only the first one runs the
+    fetch and the rest await its result.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else {"weather": CACHE_WEATHER_TTL, "aqi": CACHE_AQI_TTL}
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, kind: str, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a live entry
+
+        Returns:
+            (found, value) tuple
+        """
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[(kind, key)]
+            self._counters["expirations"] += 1
+            return False, None
+        self._entries.move_to_end((kind, key))
+        return True, value
+
+    def set(self, kind: str, key: str, value: Any):
+        """Store a value with the TTL configured for its kind, evicting LRU entries"""
+        ttl = self.ttls.get(kind, 0)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[(kind, key)] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end((kind, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    async def get_or_fetch(
+        self,
+        kind: str,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        cache_if: Optional[Callable[[Any], bool]] = None,
+        refresh: bool = False
+    ) -> Tuple[Any, bool]:
+        """
+        Return a cached value, or fetch it (once for all concurrent callers)
+
+        Args:
+            kind: Data kind, selects the TTL
+            key: Normalized cache key
+            fetch: Coroutine factory producing the value on a miss
+            cache_if: Optional predicate; results failing it are not stored
+            refresh: Ignore any cached value (an in-flight fetch is still shared)
+
+        Returns:
+            (value, fetched) tuple; ``fetched`` is True only for the caller
+            whose fetch actually ran
+        """
+        if not refresh:
+            found, value = self.get(kind, key)
+            if found:
+                self._counters["hits"] += 1
+                return value, False
+
+        inflight = self._inflight.get((kind, key))
+        if inflight is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(inflight), False
+
+        self._counters["misses"] += 1
+        task = asyncio.ensure_future(fetch())
+        self._inflight[(kind, key)] = task
+
+        def _done(task: asyncio.Future):
+            self._inflight.pop((kind, key), None)
+            if not task.cancelled() and task.exception() is None:
+                if cache_if is None or cache_if(task.result()):
+                    self.set(kind, key, task.result())
+
+        task.add_done_callback(_done)
+        # Shield so a cancelled caller does not cancel the fetch other callers wait on
+        return await asyncio.shield(task), True
+
+    def clear(self):
+        """Drop all cached entries"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters for monitoring"""
+        lookups = self._counters["hits"] + self._counters["misses"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "inflight": len(self._inflight),
+            "hit_ratio": round((self._counters["hits"] + self._counters["coalesced"]) / lookups, 4) if lookups else None,
+            "ttl_seconds": dict(self.ttls),
+        }
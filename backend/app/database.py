@@ -1,11 +1,21 @@
 """
 MongoDB database connection and configuration
 """
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
 from pymongo.database import Database
+from pymongo.errors import ConnectionFailure, WaitQueueTimeoutError
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+import asyncio
 import os
 import ssl
+import threading
+import time
 from dotenv import load_dotenv
+from app.rollups import ensure_rollup_indexes
+from app.forecast import ensure_forecast_indexes
+from app.leases import ensure_lease_indexes
 
 load_dotenv()
 
@@ -13,32 +23,79 @@ load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
 MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "weather_db")
 
-# Global MongoDB client
+# Connection pool, timeouts and read preference, shared by the sync (pymongo)
+# and async (Motor) clients. Options given in MONGODB_URI take precedence.
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", 60000))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 5000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", 10000))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 5000))
+MONGODB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "primary")
+
+# Seconds between reconnection probes while MongoDB is unreachable
+MONGODB_HEALTH_RETRY_SECONDS = float(os.getenv("MONGODB_HEALTH_RETRY_SECONDS", 10))
+
+# Optional retention for raw observations (0 keeps them forever)
+DATA_RETENTION_DAYS = int(os.getenv("DATA_RETENTION_DAYS", 0))
+
+# Fields returned to API clients
+WEATHER_FIELDS = ["city", "temperature", "humidity", "wind_speed", "condition", "aqi", "aqi_level"]
+WEATHER_PROJECTION = {"_id": 0, "location_id": 1, "timestamp": 1, **{field: 1 for field in WEATHER_FIELDS}}
+WEATHER_INDEX_NAME = "location_timestamp_id"
+# Earlier weather indexes: city-keyed, covering (the response fields as
+# trailing keys, which roughly doubled index size and write cost), and
+# without the _id tie-breaker used by history paging
+LEGACY_WEATHER_INDEX_NAMES = ["city_timestamp_covering", "location_timestamp_covering", "location_timestamp"]
+TTL_INDEX_NAME = "timestamp_ttl"
+
+# Global MongoDB clients
 client: MongoClient = None
 db: Database = None
+async_client: AsyncIOMotorClient = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_indexes_ensured = False
+
+def client_options() -> Dict[str, Any]:
+    """Keyword options for MongoClient / AsyncIOMotorClient, minus any set in the URI"""
+    options: Dict[str, Any] = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGODB_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGODB_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "readPreference": MONGODB_READ_PREFERENCE,
+    }
+    # For MongoDB Atlas (mongodb+srv://), TLS is automatically enabled
+    # Add tlsAllowInvalidCertificates for development to bypass SSL cert issues
+    if "mongodb+srv://" in MONGODB_URI:
+        options["tlsAllowInvalidCertificates"] = True  # For development only - bypasses SSL cert verification
+    
+    # Keyword arguments would override the URI, so skip options it already sets
+    in_uri = {pair.split("=", 1)[0].lower() for pair in urlsplit(MONGODB_URI).query.split("&") if pair}
+    return {name: value for name, value in options.items() if name.lower() not in in_uri}
+
+def _create_client():
+    """Create the sync client and database handle (pymongo connects lazily)"""
+    global client, db
+    client = MongoClient(MONGODB_URI, **client_options())
+    db = client[MONGODB_DB_NAME]
 
 def connect_db():
     """Initialize MongoDB connection"""
-    global client, db
     try:
-        # For MongoDB Atlas (mongodb+srv://), TLS is automatically enabled
-        # Add tlsAllowInvalidCertificates for development to bypass SSL cert issues
-        if "mongodb+srv://" in MONGODB_URI:
-            client = MongoClient(
-                MONGODB_URI,
-                tlsAllowInvalidCertificates=True,  # For development only - bypasses SSL cert verification
-                serverSelectionTimeoutMS=10000
-            )
-        else:
-            # Local MongoDB connection
-            client = MongoClient(MONGODB_URI)
-        
-        db = client[MONGODB_DB_NAME]
+        _create_client()
         # Test connection
         client.admin.command('ping')
+        db_health.record_success()
         print(f"✓ Connected to MongoDB: {MONGODB_DB_NAME}")
+        _ensure_indexes_once()
         return db
     except Exception as e:
+        db_health.record_failure(e)
         error_msg = str(e)
         if "authentication failed" in error_msg.lower():
             print(f"✗ MongoDB authentication failed. Please check:")
@@ -50,9 +107,61 @@ def connect_db():
             print(f"✗ MongoDB connection error: {error_msg}")
         raise
 
+def _ensure_indexes_once():
+    """Ensure indexes the first time the database is reachable"""
+    global _indexes_ensured
+    if not _indexes_ensured:
+        _indexes_ensured = ensure_indexes(get_db())
+
+def ensure_indexes(db: Database) -> bool:
+    """
+    Create the indexes used by weather queries
+    
+    - (location_id, timestamp desc, _id desc) compound index for history
+      (keyset paging) and latest observations (replaces older indexes)
+    - Optional TTL index on timestamp when DATA_RETENTION_DAYS is set
+    - Unique (location_id, bucket) indexes on the rollup collections
+    - Unique location_id index on the forecast collection
+    - TTL index expiring scheduler worker registrations
+    
+    Returns:
+        True if the indexes are in place, False if they could not be created
+    """
+    collection = db.weather_data
+    try:
+        collection.create_index(
+            [("location_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+            name=WEATHER_INDEX_NAME
+        )
+        
+        indexes = collection.index_information()
+        for name in LEGACY_WEATHER_INDEX_NAMES:
+            if name in indexes:
+                collection.drop_index(name)
+        if DATA_RETENTION_DAYS > 0:
+            expire_after = DATA_RETENTION_DAYS * 24 * 3600
+            if TTL_INDEX_NAME not in indexes:
+                collection.create_index("timestamp", name=TTL_INDEX_NAME, expireAfterSeconds=expire_after)
+            elif indexes[TTL_INDEX_NAME].get("expireAfterSeconds") != expire_after:
+                db.command("collMod", collection.name, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": expire_after})
+        elif TTL_INDEX_NAME in indexes:
+            collection.drop_index(TTL_INDEX_NAME)
+        
+        ensure_rollup_indexes(db)
+        ensure_forecast_indexes(db)
+        ensure_lease_indexes(db)
+        print("✓ MongoDB indexes ensured")
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not ensure MongoDB indexes: {e}")
+        return False
+
 def close_db():
-    """Close MongoDB connection"""
-    global client
+    """Close MongoDB connections"""
+    global client, async_client
+    if async_client:
+        async_client.close()
+        async_client = None
     if client:
         client.close()
         print("✓ MongoDB connection closed")
@@ -64,3 +173,128 @@ def get_db():
         connect_db()
     return db
 
+def get_async_client() -> AsyncIOMotorClient:
+    """
+    Get the Motor client for the running event loop
+    A client is bound to the loop it was created on, so a new loop (e.g. a
+    benchmark run after the app's loop closed) gets a new client
+    """
+    global async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if async_client is None or _async_client_loop is not loop:
+        if async_client is not None:
+            async_client.close()
+        async_client = AsyncIOMotorClient(MONGODB_URI, io_loop=loop, **client_options())
+        _async_client_loop = loop
+    return async_client
+
+def get_async_db() -> AsyncIOMotorDatabase:
+    """Get the async (Motor) database instance"""
+    return get_async_client()[MONGODB_DB_NAME]
+
+
+class DatabaseHealth:
+    """
+    Whether MongoDB is reachable, re-probed while it is down
+    
+    A failed check is not permanent: once MONGODB_HEALTH_RETRY_SECONDS have
+    passed, the next check pings the server again (one probe at a time;
+    concurrent callers get the last known state). Operations that fail with
+    a connection error mark the database unavailable straight away. Before
+    the first probe the database is assumed to be available.
+    """
+    
+    def __init__(self, retry_seconds: float = MONGODB_HEALTH_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self.available: Optional[bool] = None
+        self.last_error: Optional[str] = None
+        self._checked_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._counters = {"probes": 0, "failures": 0, "recoveries": 0}
+    
+    def _claim_probe(self) -> bool:
+        """Whether the caller should probe now"""
+        with self._lock:
+            if self._probing or self.available:
+                return False
+            if self.available is False and time.monotonic() - self._checked_at < self.retry_seconds:
+                return False
+            self._probing = True
+            self._counters["probes"] += 1
+            return True
+    
+    def record_success(self) -> bool:
+        """Mark the database reachable; returns True if it had been down"""
+        with self._lock:
+            recovered = self.available is False
+            self.available = True
+            self.last_error = None
+            self._checked_at = time.monotonic()
+            self._probing = False
+            if recovered:
+                self._counters["recoveries"] += 1
+        if recovered:
+            print("✓ MongoDB available again")
+        return recovered
+    
+    def record_failure(self, error: Exception):
+        """Mark the database unreachable until the next probe"""
+        with self._lock:
+            was_available = self.available is not False
+            self.available = False
+            self.last_error = str(error)
+            self._checked_at = time.monotonic()
+            self._probing = False
+            self._counters["failures"] += 1
+        if was_available:
+            print(
+                f"⚠️  MongoDB not available - data will not be saved to database "
+                f"(retrying every {self.retry_seconds:g}s): {error}"
+            )
+    
+    def record_error(self, error: Exception):
+        """Mark the database unreachable if an operation failed to reach it"""
+        # A full connection pool (wait queue timeout) means busy, not down
+        if isinstance(error, ConnectionFailure) and not isinstance(error, WaitQueueTimeoutError):
+            self.record_failure(error)
+    
+    def check(self) -> bool:
+        """Whether the database is usable, probing it (blocking, one ping) if a probe is due"""
+        if self._claim_probe():
+            try:
+                if client is None:
+                    _create_client()
+                client.admin.command("ping")
+            except Exception as e:
+                self.record_failure(e)
+            else:
+                self.record_success()
+                _ensure_indexes_once()
+        return self.available is not False
+    
+    async def check_async(self) -> bool:
+        """Whether the database is usable, probing it through Motor if a probe is due"""
+        if self._claim_probe():
+            try:
+                await get_async_client().admin.command("ping")
+            except Exception as e:
+                self.record_failure(e)
+            else:
+                self.record_success()
+                if not _indexes_ensured:
+                    await asyncio.to_thread(_ensure_indexes_once)
+        return self.available is not False
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "available": self.available,
+                "last_error": self.last_error,
+                "seconds_since_check": round(time.monotonic() - self._checked_at, 1) if self._checked_at else None,
+                "retry_seconds": self.retry_seconds,
+                **self._counters,
+            }
+
+
+db_health = DatabaseHealth()
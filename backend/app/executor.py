@@ -0,0 +1,166 @@
+"""
+Bounded execution with backpressure
+Blocking calls (pymongo) run on a dedicated, fixed-size thread pool, and
+async database reads and upstream scrapes are limited to a fixed number of
+concurrent slots. Both admit only a bounded number of waiting calls; beyond
+that they reject immediately with ExecutorSaturated, which the API turns
+into a 503 with a Retry-After header.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict
+from dotenv import load_dotenv
+from app.metrics import EXECUTOR_IN_FLIGHT, EXECUTOR_QUEUE_WAIT, EXECUTOR_REJECTED, record_stage
+
+load_dotenv()
+
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", 8))
+DB_EXECUTOR_QUEUE = int(os.getenv("DB_EXECUTOR_QUEUE", 64))
+# Concurrent async (Motor) reads made for API requests, and how many may wait
+DB_READ_MAX_CONCURRENCY = int(os.getenv("DB_READ_MAX_CONCURRENCY", 64))
+DB_READ_QUEUE_LIMIT = int(os.getenv("DB_READ_QUEUE_LIMIT", 512))
+SCRAPE_MAX_CONCURRENCY = int(os.getenv("SCRAPE_MAX_CONCURRENCY", 20))
+SCRAPE_QUEUE_LIMIT = int(os.getenv("SCRAPE_QUEUE_LIMIT", 100))
+# Seconds clients are asked to wait before retrying a rejected request
+BACKPRESSURE_RETRY_AFTER = int(os.getenv("BACKPRESSURE_RETRY_AFTER", 2))
+
+
+class ExecutorSaturated(Exception):
+    """Raised when an executor's workers are busy and its queue is full"""
+
+    def __init__(self, name: str, retry_after: int = BACKPRESSURE_RETRY_AFTER):
+        super().__init__(f"{name} executor saturated, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class _Admission:
+    """In-flight accounting shared by the executors"""
+
+    def __init__(self, name: str, max_active: int, max_queue: int, retry_after: int):
+        self.name = name
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._counters = {"admitted": 0, "rejected": 0}
+        self._gauge = EXECUTOR_IN_FLIGHT.labels(name)
+        self._wait = EXECUTOR_QUEUE_WAIT.labels(name)
+        self._rejected = EXECUTOR_REJECTED.labels(name)
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.max_active + self.max_queue:
+                self._counters["rejected"] += 1
+                self._rejected.inc()
+                raise ExecutorSaturated(self.name, self.retry_after)
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+        self._gauge.inc()
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._gauge.dec()
+
+    def _record_wait(self, seconds: float):
+        self._wait.observe(seconds)
+        record_stage(f"queue.{self.name}", seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.max_active),
+                "max_active": self.max_active,
+                "max_queue": self.max_queue,
+            }
+
+
+class BoundedExecutor(_Admission):
+    """Fixed-size thread pool for blocking calls, with a bounded queue"""
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_queue: int,
+        retry_after: int = BACKPRESSURE_RETRY_AFTER
+    ):
+        super().__init__(name, max_workers, max_queue, retry_after)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking function on the pool and await its result
+        The caller's context (e.g. the request trace) is carried into the worker.
+
+        Raises:
+            ExecutorSaturated: If all workers are busy and the queue is full
+        """
+        self._admit()
+        submitted = time.perf_counter()
+        context = contextvars.copy_context()
+
+        def call():
+            self._record_wait(time.perf_counter() - submitted)
+            return fn(*args, **kwargs)
+
+        try:
+            future = self._pool.submit(context.run, call)
+        except BaseException:
+            self._release()
+            raise
+        # Released when the call finishes (or is cancelled before starting),
+        # not when the awaiting request gives up
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class ConcurrencyLimiter(_Admission):
+    """Limit on concurrently running async operations, with a bounded queue"""
+
+    def __init__(
+        self,
+        name: str,
+        max_active: int,
+        max_queue: int,
+        retry_after: int = BACKPRESSURE_RETRY_AFTER
+    ):
+        super().__init__(name, max_active, max_queue, retry_after)
+        self._slots = asyncio.Semaphore(max_active)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one of the active slots for the duration of the block
+
+        Raises:
+            ExecutorSaturated: If all slots are taken and the queue is full
+        """
+        self._admit()
+        try:
+            submitted = time.perf_counter()
+            async with self._slots:
+                self._record_wait(time.perf_counter() - submitted)
+                yield
+        finally:
+            self._release()
+
+
+# Pool for blocking MongoDB calls made on behalf of API requests
+db_executor = BoundedExecutor("db", DB_EXECUTOR_WORKERS, DB_EXECUTOR_QUEUE)
+# Concurrent async MongoDB reads made on behalf of API requests
+db_read_limiter = ConcurrencyLimiter("db_read", DB_READ_MAX_CONCURRENCY, DB_READ_QUEUE_LIMIT)
+# Concurrent upstream scrapes started by API requests (cache hits don't take a slot)
+scrape_limiter = ConcurrencyLimiter("scrape", SCRAPE_MAX_CONCURRENCY, SCRAPE_QUEUE_LIMIT)
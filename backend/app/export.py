@@ -0,0 +1,138 @@
+"""
+Streaming serializers for weather history exports
+Each serializer turns an iterator of observation documents into an iterator
+of byte chunks, so exports can be streamed straight from a Mongo cursor
+"""
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Listed in requirements.txt; parquet export is refused without it
+    pa = None
+    pq = None
+
+EXPORT_FIELDS = ["timestamp", "city", "temperature", "humidity", "wind_speed", "condition", "aqi", "aqi_level"]
+
+# Rows buffered per CSV/NDJSON chunk and per Parquet row group
+CHUNK_ROWS = 500
+PARQUET_ROW_GROUP = 10000
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    """Whether pyarrow is installed"""
+    return pq is not None
+
+
+def _export_row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    row = {field: doc.get(field) for field in EXPORT_FIELDS}
+    row["timestamp"] = doc["timestamp"].isoformat()
+    return row
+
+
+def csv_chunks(docs: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Serialize documents as CSV with a header row"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    rows = 0
+    for doc in docs:
+        writer.writerow(_export_row(doc))
+        rows += 1
+        if rows % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(docs: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Serialize documents as newline-delimited JSON"""
+    lines = []
+    for doc in docs:
+        lines.append(json.dumps(_export_row(doc)))
+        if len(lines) == CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every row group"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_chunks(docs: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    Serialize documents as Parquet, one row group at a time
+
+    Raises:
+        RuntimeError: If pyarrow is not installed
+    """
+    if not parquet_available():
+        raise RuntimeError("Parquet export requires pyarrow")
+
+    schema = pa.schema([
+        ("timestamp", pa.timestamp("us")),
+        ("city", pa.string()),
+        ("temperature", pa.float64()),
+        ("humidity", pa.float64()),
+        ("wind_speed", pa.float64()),
+        ("condition", pa.string()),
+        ("aqi", pa.int32()),
+        ("aqi_level", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write_group(rows):
+        columns = {field: [row.get(field) for row in rows] for field in EXPORT_FIELDS}
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+    rows = []
+    for doc in docs:
+        rows.append(doc)
+        if len(rows) == PARQUET_ROW_GROUP:
+            write_group(rows)
+            rows = []
+            yield sink.drain()
+    if rows:
+        write_group(rows)
+    writer.close()
+    yield sink.drain()
+
+
+EXPORT_SERIALIZERS = {
+    "csv": csv_chunks,
+    "ndjson": ndjson_chunks,
+    "parquet": parquet_chunks,
+}
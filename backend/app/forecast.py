@@ -0,0 +1,155 @@
+"""
+Forecasts from the wttr.in j1 payload
+The ``weather[]`` blocks that come with every ``format=j1`` response are
+parsed into columnar daily and hourly series (one list per field) and kept
+per location, so forecasts are served from storage without extra upstream calls
+"""
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING, UpdateOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+from app.metrics import MONGO_LATENCY, stage
+
+FORECAST_COLLECTION = "weather_forecasts"
+
+# Column name -> j1 field, for daily and 3-hourly series
+DAILY_FIELDS = {
+    "min_temperature": "mintempC",
+    "max_temperature": "maxtempC",
+    "avg_temperature": "avgtempC",
+    "sun_hours": "sunHour",
+    "uv_index": "uvIndex",
+}
+HOURLY_FIELDS = {
+    "temperature": "tempC",
+    "feels_like": "FeelsLikeC",
+    "humidity": "humidity",
+    "wind_speed": "windspeedKmph",
+    "precipitation": "precipMM",
+    "chance_of_rain": "chanceofrain",
+}
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_j1_forecast(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Extract the daily and hourly forecast from a wttr.in ``format=j1`` payload
+
+    Returns:
+        ``{"daily": {...}, "hourly": {...}}`` with one list per column, or
+        None if the payload has no forecast. Daily rows are keyed by
+        ``date`` (YYYY-MM-DD), hourly rows by ``time`` (YYYY-MM-DDTHH:MM);
+        both are local time at the location, as wttr.in reports them.
+    """
+    days = [day for day in data.get("weather") or [] if day.get("date")]
+    if not days:
+        return None
+
+    daily: Dict[str, List[Any]] = {"date": [], **{column: [] for column in DAILY_FIELDS}}
+    hourly: Dict[str, List[Any]] = {"time": [], **{column: [] for column in HOURLY_FIELDS}, "condition": []}
+    for day in days:
+        daily["date"].append(day["date"])
+        for column, field in DAILY_FIELDS.items():
+            daily[column].append(_number(day.get(field)))
+        for slot in day.get("hourly") or []:
+            minutes = int(_number(slot.get("time")) or 0)
+            hourly["time"].append(f"{day['date']}T{minutes // 100:02d}:{minutes % 100:02d}")
+            for column, field in HOURLY_FIELDS.items():
+                hourly[column].append(_number(slot.get(field)))
+            hourly["condition"].append((slot.get("weatherDesc") or [{}])[0].get("value", "Unknown"))
+    return {"daily": daily, "hourly": hourly}
+
+
+def slice_forecast(forecast: Dict[str, Any], days: int) -> Dict[str, Any]:
+    """Limit a columnar forecast to its first ``days`` days"""
+    dates = forecast["daily"]["date"][:days]
+    last_date = dates[-1] if dates else ""
+    hours = sum(1 for time in forecast["hourly"]["time"] if time[:10] <= last_date)
+    return {
+        "daily": {column: values[:days] for column, values in forecast["daily"].items()},
+        "hourly": {column: values[:hours] for column, values in forecast["hourly"].items()},
+    }
+
+
+def ensure_forecast_indexes(db: Database):
+    """Create the unique location_id index on the forecast collection"""
+    collection = db[FORECAST_COLLECTION]
+    if "city" in collection.index_information():
+        # Forecasts keyed by city predate location IDs; they are replaced on the next scrape
+        collection.drop_index("city")
+        collection.delete_many({"location_id": {"$exists": False}})
+    collection.create_index([("location_id", ASCENDING)], name="location_id", unique=True)
+
+
+class ForecastBuffer:
+    """
+    Latest forecast per location, waiting to be written
+
+    ``add`` keeps only the newest forecast for each location; ``flush`` upserts
+    them in one bulk write. A stored forecast is only replaced by a newer
+    one, and forecasts that could not be written stay buffered (unless a
+    newer one arrived meanwhile).
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, location_id: str, city: str, forecast: Dict[str, Any], issued_at: datetime):
+        with self._lock:
+            current = self._pending.get(location_id)
+            if current is None or current["issued_at"] <= issued_at:
+                self._pending[location_id] = {
+                    "location_id": location_id, "city": city, "issued_at": issued_at, **forecast
+                }
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, db: Database) -> int:
+        """
+        Upsert buffered forecasts
+
+        Returns:
+            Number of forecasts written
+
+        Raises:
+            Exception: If the write failed (the forecasts stay buffered)
+        """
+        with self._lock:
+            docs, self._pending = list(self._pending.values()), {}
+        if not docs:
+            return 0
+
+        # Match only older (or missing) forecasts; a newer stored one makes the
+        # upsert collide with the unique location_id index, which is ignored
+        operations = [
+            UpdateOne(
+                {"location_id": doc["location_id"], "issued_at": {"$lte": doc["issued_at"]}},
+                {"$set": doc},
+                upsert=True
+            )
+            for doc in docs
+        ]
+        try:
+            with stage("mongo.forecast_upsert", MONGO_LATENCY, operation="forecast_upsert"):
+                db[FORECAST_COLLECTION].bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            other_errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != 11000]
+            if other_errors:
+                print(f"⚠️  {len(other_errors)} forecasts failed to save: {other_errors[0].get('errmsg')}")
+        except Exception:
+            for doc in docs:
+                forecast = {"daily": doc["daily"], "hourly": doc["hourly"]}
+                self.add(doc["location_id"], doc["city"], forecast, doc["issued_at"])
+            raise
+        return len(docs)
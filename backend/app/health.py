@@ -0,0 +1,155 @@
+"""
+Upstream health tracking
+Circuit breakers per upstream host and timeouts derived from observed
+provider latencies
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from app.stats import ProviderStats, percentile
+
+load_dotenv()
+
+# Consecutive failures that open a breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 30))
+
+# Adaptive timeout = latency percentile x multiplier, clamped between the
+# minimum and the provider's default timeout
+ADAPTIVE_TIMEOUT_PERCENTILE = float(os.getenv("ADAPTIVE_TIMEOUT_PERCENTILE", 99))
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", 3))
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", 1))
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
+
+# Upper-bound timeouts per provider (seconds)
+DEFAULT_TIMEOUTS = {
+    "wttr_json": 30,
+    "wttr_html": 30,
+    "waqi_feed": 8,
+    "waqi_search": 8,
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker
+
+    Opens after ``failure_threshold`` consecutive failures. After
+    ``open_seconds`` one probe request is let through (half-open): success
+    closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.transitions: Dict[str, int] = {}
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        print(f"Circuit breaker {self.name}: {key}")
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (claims the probe slot when half-open)"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a probe through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._probe_in_flight = False
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._probe_in_flight = False
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self._transition(OPEN)
+
+    def release(self):
+        """Give back a probe slot without an outcome (e.g. the request was cancelled)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_after_seconds": round(self.retry_after(), 1),
+                "transitions": dict(self.transitions),
+            }
+
+
+class UpstreamHealth:
+    """Provider latency stats, per-host circuit breakers and adaptive timeouts"""
+
+    def __init__(self, stats: Optional[ProviderStats] = None):
+        self.stats = stats if stats is not None else ProviderStats()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """Get (creating if needed) the breaker for an upstream host"""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(host))
+        return breaker
+
+    def timeout(self, provider: str) -> float:
+        """
+        Timeout for the next call to a provider
+        Falls back to the provider's default until enough latencies are known
+        """
+        default = DEFAULT_TIMEOUTS.get(provider, 30)
+        samples = self.stats.samples(provider)
+        if len(samples) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return default
+        observed = percentile(samples, ADAPTIVE_TIMEOUT_PERCENTILE) * ADAPTIVE_TIMEOUT_MULTIPLIER
+        return min(default, max(ADAPTIVE_TIMEOUT_MIN, observed))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Breaker states and current timeouts for monitoring"""
+        providers = set(DEFAULT_TIMEOUTS) | set(self.stats.snapshot())
+        return {
+            "breakers": {host: breaker.snapshot() for host, breaker in list(self._breakers.items())},
+            "timeouts_seconds": {provider: round(self.timeout(provider), 2) for provider in sorted(providers)},
+        }
@@ -0,0 +1,414 @@
+"""
+On-disk HTTP cache for upstream responses
+Honours Cache-Control, Expires, ETag and Last-Modified: fresh responses are
+served without a request, stale ones are revalidated with a conditional
+request and a 304 reuses the stored body. Bodies are stored compressed, and
+the least recently used entries are evicted to keep the cache under a size
+limit. Metadata is kept in memory; bodies are read from disk on use.
+"""
+import asyncio
+import email.utils
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+import httpx
+from dotenv import load_dotenv
+
+try:
+    import brotli
+except ImportError:  # optional codec
+    brotli = None
+
+load_dotenv()
+
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "http_cache")
+# Upper bound on stored bodies (bytes, compressed); 0 disables the cache
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# How bodies are stored: br (if brotli is installed), gzip or identity
+HTTP_CACHE_COMPRESSION = os.getenv("HTTP_CACHE_COMPRESSION", "br" if brotli is not None else "gzip")
+# Longest heuristic lifetime for responses that only carry Last-Modified (seconds)
+HTTP_CACHE_HEURISTIC_MAX = float(os.getenv("HTTP_CACHE_HEURISTIC_MAX", 3600))
+
+# Content codings requested from upstreams (httpx decodes them)
+ACCEPT_ENCODING = "br, gzip" if brotli is not None else "gzip"
+
+CODECS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "identity": (lambda body: body, lambda body: body),
+    "gzip": (lambda body: gzip.compress(body, compresslevel=6), gzip.decompress),
+}
+if brotli is not None:
+    CODECS["br"] = (lambda body: brotli.compress(body, quality=5), brotli.decompress)
+
+# Response headers kept with a cached body
+_STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires", "date", "age")
+# Headers a 304 may update
+_UPDATED_HEADERS = ("etag", "last-modified", "cache-control", "expires", "date", "age")
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """Cache-Control directives, lower-cased, with their (unquoted) arguments"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds of an HTTP date (None if missing or invalid)"""
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: Mapping[str, str], now: float) -> Optional[float]:
+    """
+    Seconds a response stays fresh after it was received (RFC 9111)
+
+    Returns:
+        The lifetime (0 means every use must be revalidated), or None if
+        the response must not be stored
+    """
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+
+    age = 0.0
+    try:
+        age = max(0.0, float(headers.get("age", 0)))
+    except ValueError:
+        pass
+
+    if "max-age" in directives:
+        try:
+            return max(0.0, int(directives["max-age"] or 0) - age)
+        except ValueError:
+            return 0.0
+
+    date = _http_date(headers.get("date")) or now
+    if "expires" in headers:
+        expires = _http_date(headers["expires"])
+        return max(0.0, expires - date - age) if expires is not None else 0.0
+
+    # Heuristic freshness: a tenth of the time since the last modification
+    last_modified = _http_date(headers.get("last-modified"))
+    if last_modified is not None:
+        return min(HTTP_CACHE_HEURISTIC_MAX, max(0.0, (date - last_modified) / 10 - age))
+    return 0.0
+
+
+class CachedResponse:
+    """Metadata of a stored response"""
+
+    __slots__ = ("key", "url", "status", "headers", "stored_at", "fresh_until", "wire_bytes", "disk_bytes", "encoding")
+
+    def __init__(
+        self,
+        key: str,
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        stored_at: float,
+        fresh_until: float,
+        wire_bytes: int,
+        disk_bytes: int,
+        encoding: str
+    ):
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.stored_at = stored_at
+        self.fresh_until = fresh_until
+        self.wire_bytes = wire_bytes
+        self.disk_bytes = disk_bytes
+        self.encoding = encoding
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) < self.fresh_until
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Validators to send when revalidating"""
+        headers = {}
+        if "etag" in self.headers:
+            headers["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+        return headers
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CachedResponse":
+        return cls(**data)
+
+
+class HttpCache:
+    """
+    Size-bounded on-disk cache of GET responses
+
+    Entries are keyed by URL and Accept header. Only 200 responses that
+    carry a freshness lifetime or a validator (ETag / Last-Modified) are
+    stored; ``no-store`` responses never are.
+
+    Args:
+        directory: Directory holding the cache files (created on first store)
+        max_bytes: Upper bound on the size of stored bodies
+        compression: Codec for stored bodies ("br", "gzip" or "identity")
+    """
+
+    def __init__(
+        self,
+        directory: str = HTTP_CACHE_DIR,
+        max_bytes: int = HTTP_CACHE_MAX_BYTES,
+        compression: str = HTTP_CACHE_COMPRESSION
+    ):
+        if compression not in CODECS:
+            raise ValueError(f"Unknown HTTP cache compression: {compression} (available: {', '.join(CODECS)})")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0, "revalidated": 0, "revalidation_requests": 0, "misses": 0,
+            "stores": 0, "uncacheable": 0, "evictions": 0,
+            "bytes_downloaded": 0, "bytes_saved": 0, "body_bytes_stored": 0,
+        }
+        self._load_index()
+
+    @staticmethod
+    def key(url: str, headers: Mapping[str, str]) -> str:
+        return hashlib.sha256(f"{url}\n{headers.get('Accept', '')}".encode()).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def _load_index(self):
+        """Index entries left by a previous run, oldest first"""
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".meta"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    entry = CachedResponse.from_dict(json.load(f))
+                if entry.encoding in CODECS and os.path.exists(self._path(entry.key, "body")):
+                    entries.append(entry)
+                    continue
+            except (OSError, ValueError, TypeError):
+                pass
+            self._remove_files(filename[:-len(".meta")])
+        for entry in sorted(entries, key=lambda entry: entry.stored_at):
+            self._entries[entry.key] = entry
+            self._bytes += entry.disk_bytes
+        self._evict()
+
+    def _write_file(self, path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove_files(self, key: str):
+        for suffix in ("meta", "body"):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _read_body(self, entry: CachedResponse) -> Optional[bytes]:
+        """Stored body, decompressed (None if the files are gone)"""
+        try:
+            with open(self._path(entry.key, "body"), "rb") as f:
+                data = f.read()
+            return CODECS[entry.encoding][1](data)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  HTTP cache entry for {entry.url} unreadable, dropping it: {e}")
+            self._drop(entry.key)
+            return None
+
+    def _drop(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.disk_bytes
+        self._remove_files(key)
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        evicted = []
+        with self._lock:
+            while self._entries and self._bytes > self.max_bytes:
+                key, entry = self._entries.popitem(last=False)
+                self._bytes -= entry.disk_bytes
+                self._counters["evictions"] += 1
+                evicted.append(key)
+        for key in evicted:
+            self._remove_files(key)
+
+    def _write_meta(self, entry: CachedResponse):
+        self._write_file(self._path(entry.key, "meta"), json.dumps(entry.to_dict()).encode())
+
+    def _store(self, key: str, url: str, response: httpx.Response, lifetime: float, now: float) -> CachedResponse:
+        """Write a 200 response to disk and index it"""
+        body = CODECS[self.compression][0](response.content)
+        entry = CachedResponse(
+            key=key,
+            url=url,
+            status=response.status_code,
+            headers={name: response.headers[name] for name in _STORED_HEADERS if name in response.headers},
+            stored_at=now,
+            fresh_until=now + lifetime,
+            wire_bytes=response.num_bytes_downloaded,
+            disk_bytes=len(body),
+            encoding=self.compression,
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_file(self._path(key, "body"), body)
+        self._write_meta(entry)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.disk_bytes
+            self._entries[key] = entry
+            self._bytes += entry.disk_bytes
+            self._counters["stores"] += 1
+            self._counters["body_bytes_stored"] += len(response.content)
+        self._evict()
+        return entry
+
+    def _revalidate(self, entry: CachedResponse, response: httpx.Response, now: float):
+        """Refresh a stored entry's headers and lifetime after a 304"""
+        for name in _UPDATED_HEADERS:
+            if name in response.headers:
+                entry.headers[name] = response.headers[name]
+        lifetime = freshness_lifetime(entry.headers, now)
+        entry.stored_at = now
+        entry.fresh_until = now + (lifetime or 0.0)
+        self._write_meta(entry)
+
+    def _response(self, entry: CachedResponse, body: bytes, url: str, state: str) -> httpx.Response:
+        return httpx.Response(
+            entry.status,
+            headers=entry.headers,
+            content=body,
+            request=httpx.Request("GET", url),
+            extensions={"http_cache": state},
+        )
+
+    async def fetch(
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        send: Callable[[Dict[str, str]], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        """
+        GET a URL through the cache
+
+        Args:
+            url: URL to fetch
+            headers: Request headers
+            send: Performs the request with the given headers
+
+        Returns:
+            The response; ``response.extensions["http_cache"]`` is "hit"
+            (served without a request), "revalidated" (304, stored body)
+            or "miss"
+        """
+        if self.max_bytes <= 0:
+            response = await send(dict(headers))
+            with self._lock:
+                self._counters["bytes_downloaded"] += response.num_bytes_downloaded
+            return response
+
+        key = self.key(url, headers)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        body = await asyncio.to_thread(self._read_body, entry) if entry is not None else None
+        if body is None:
+            entry = None
+        elif entry.is_fresh():
+            with self._lock:
+                self._counters["hits"] += 1
+                self._counters["bytes_saved"] += entry.wire_bytes
+            return self._response(entry, body, url, "hit")
+
+        request_headers = dict(headers)
+        if entry is not None:
+            request_headers.update(entry.conditional_headers())
+        response = await send(request_headers)
+        now = time.time()
+
+        with self._lock:
+            self._counters["bytes_downloaded"] += response.num_bytes_downloaded
+            if entry is not None and entry.conditional_headers():
+                self._counters["revalidation_requests"] += 1
+
+        if response.status_code == 304 and entry is not None:
+            await asyncio.to_thread(self._revalidate, entry, response, now)
+            with self._lock:
+                self._counters["revalidated"] += 1
+                self._counters["bytes_saved"] += max(0, entry.wire_bytes - response.num_bytes_downloaded)
+            return self._response(entry, body, url, "revalidated")
+
+        with self._lock:
+            self._counters["misses"] += 1
+        if response.status_code == 200:
+            lifetime = freshness_lifetime(response.headers, now)
+            has_validator = "etag" in response.headers or "last-modified" in response.headers
+            if lifetime is not None and (lifetime > 0 or has_validator):
+                await asyncio.to_thread(self._store, key, url, response, lifetime, now)
+            else:
+                with self._lock:
+                    self._counters["uncacheable"] += 1
+                if entry is not None:
+                    await asyncio.to_thread(self._drop, key)
+        response.extensions["http_cache"] = "miss"
+        return response
+
+    def clear(self):
+        """Remove every stored entry"""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        for key in keys:
+            self._remove_files(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit, revalidation and byte counters"""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["revalidated"] + self._counters["misses"]
+            requests = self._counters["revalidation_requests"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "compression": self.compression,
+                "hit_ratio": round((self._counters["hits"] + self._counters["revalidated"]) / lookups, 3) if lookups else None,
+                "revalidation_hit_rate": round(self._counters["revalidated"] / requests, 3) if requests else None,
+            }
+
+
+# Shared by every scraper instance (including the scheduler's batch scrapers)
+http_cache = HttpCache()
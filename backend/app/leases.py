@@ -0,0 +1,387 @@
+"""
+MongoDB-backed leases for splitting scheduled work across processes
+Scheduled work is partitioned into shards (by a stable hash of the location
+key). A process only works on shards it holds a lease for; leases expire
+unless renewed by the holder's heartbeat, so shards held by a crashed
+process are taken over once their lease runs out. Adding workers or
+replicas divides the work instead of repeating it.
+"""
+import math
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+load_dotenv()
+
+# Shards scheduled work is split into (0 disables leases: every process does all the work)
+SCHEDULER_SHARDS = int(os.getenv("SCHEDULER_SHARDS", 16))
+# Seconds a lease lasts without renewal, and between heartbeats
+LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", 30))
+LEASE_HEARTBEAT_SECONDS = float(os.getenv("LEASE_HEARTBEAT_SECONDS", 10))
+
+LEASE_COLLECTION = "scheduler_leases"
+WORKER_COLLECTION = "scheduler_workers"
+
+# expires_at of released leases
+_RELEASED = datetime(1970, 1, 1)
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Shard for a key; stable across processes (unlike hash())"""
+    return zlib.crc32(key.encode()) % shards
+
+
+def ensure_lease_indexes(db: Database):
+    """Expire worker registrations that stopped heartbeating"""
+    db[WORKER_COLLECTION].create_index("expires_at", name="expires_ttl", expireAfterSeconds=0)
+
+
+class LeaseTable:
+    """
+    Leases held by this process in the lease collection
+
+    A lease document is ``{_id, owner, expires_at}``; it can be acquired
+    when it is missing, expired or already ours. Held leases are treated as
+    lost a tenth of the TTL before they expire, so a holder stops working
+    before anyone else may take over.
+
+    Args:
+        database: Returns the database holding the lease collection
+        ttl: Seconds a lease lasts without renewal
+        worker_id: Identity of this process (host:pid:random by default)
+    """
+
+    def __init__(
+        self,
+        database: Callable[[], Database],
+        ttl: float = LEASE_TTL_SECONDS,
+        worker_id: Optional[str] = None
+    ):
+        self._database = database
+        self.ttl = ttl
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        # Lease ID -> expiry we last wrote
+        self._held: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {
+            "acquired": 0, "takeovers": 0, "contended": 0, "renewals": 0,
+            "lost": 0, "released": 0, "heartbeat_errors": 0,
+        }
+
+    def collection(self):
+        """The lease collection"""
+        return self._database()[LEASE_COLLECTION]
+
+    def acquire(self, lease_id: str, conditions: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Take a lease if it is free, expired or ours (and matches ``conditions``)
+
+        Returns:
+            Whether this process now holds the lease
+
+        Raises:
+            Exception: If the lease collection is unreachable
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        query = {
+            "_id": lease_id,
+            "$or": [{"owner": self.worker_id}, {"expires_at": {"$lte": now}}],
+            **(conditions or {}),
+        }
+        try:
+            previous = self.collection().find_one_and_update(
+                query,
+                {"$set": {"owner": self.worker_id, "expires_at": expires_at}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # Held by another live process, or fails ``conditions``
+            with self._lock:
+                self._counters["contended"] += 1
+            return False
+        with self._lock:
+            self._held[lease_id] = expires_at
+            self._counters["acquired"] += 1
+            if previous and previous.get("owner") not in (None, self.worker_id):
+                self._counters["takeovers"] += 1
+        return True
+
+    def _safe(self, expires_at: Optional[datetime], now: datetime) -> bool:
+        """Whether a lease expiring at ``expires_at`` is safely within its TTL"""
+        return expires_at is not None and expires_at - timedelta(seconds=self.ttl / 10) > now
+
+    def holds(self, lease_id: str) -> bool:
+        """Whether this process holds a lease that is safely within its TTL"""
+        # The heartbeat thread updates _held concurrently
+        with self._lock:
+            expires_at = self._held.get(lease_id)
+        return self._safe(expires_at, datetime.utcnow())
+
+    def held(self) -> Set[str]:
+        with self._lock:
+            held = dict(self._held)
+        now = datetime.utcnow()
+        return {lease_id for lease_id, expires_at in held.items() if self._safe(expires_at, now)}
+
+    def renew(self) -> Set[str]:
+        """
+        Extend every held lease; leases another process took are dropped
+
+        Returns:
+            IDs of the leases still held
+        """
+        with self._lock:
+            lease_ids = list(self._held)
+        if not lease_ids:
+            return set()
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        leases = self.collection()
+        leases.update_many(
+            {"_id": {"$in": lease_ids}, "owner": self.worker_id}, {"$set": {"expires_at": expires_at}}
+        )
+        kept = {doc["_id"] for doc in leases.find({"_id": {"$in": lease_ids}, "owner": self.worker_id}, {"_id": 1})}
+        with self._lock:
+            for lease_id in lease_ids:
+                if lease_id in kept:
+                    self._held[lease_id] = expires_at
+                elif self._held.pop(lease_id, None) is not None:
+                    self._counters["lost"] += 1
+            self._counters["renewals"] += len(kept)
+        return kept
+
+    def release(self, lease_id: str, updates: Optional[Dict[str, Any]] = None):
+        """Give up a lease (optionally recording ``updates`` on it) so others can take it at once"""
+        with self._lock:
+            self._held.pop(lease_id, None)
+            self._counters["released"] += 1
+        self.collection().update_one(
+            {"_id": lease_id, "owner": self.worker_id},
+            {"$set": {"owner": None, "expires_at": _RELEASED, **(updates or {})}}
+        )
+
+    def release_all(self):
+        """Give up every held lease (on shutdown)"""
+        with self._lock:
+            lease_ids = list(self._held)
+        for lease_id in lease_ids:
+            try:
+                self.release(lease_id)
+            except Exception as e:
+                print(f"⚠️  Could not release lease {lease_id}: {e}")
+
+    def register_worker(self) -> int:
+        """
+        Announce this process for another TTL
+
+        Returns:
+            Number of processes currently registered (including this one)
+        """
+        now = datetime.utcnow()
+        workers = self._database()[WORKER_COLLECTION]
+        workers.update_one(
+            {"_id": self.worker_id},
+            {"$set": {"expires_at": now + timedelta(seconds=self.ttl), "heartbeat_at": now}},
+            upsert=True
+        )
+        return workers.count_documents({"expires_at": {"$gt": now}})
+
+    def start(self, interval: float = LEASE_HEARTBEAT_SECONDS, on_heartbeat: Optional[Callable[[], Any]] = None):
+        """
+        Renew held leases every ``interval`` seconds in a daemon thread
+
+        Args:
+            interval: Seconds between heartbeats (well below the TTL)
+            on_heartbeat: Called after each renewal attempt (e.g. to rebalance shards)
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def beat():
+            while True:
+                try:
+                    self.renew()
+                except Exception as e:
+                    with self._lock:
+                        self._counters["heartbeat_errors"] += 1
+                    print(f"⚠️  Lease heartbeat failed: {e}")
+                if on_heartbeat is not None:
+                    on_heartbeat()
+                if self._stop.wait(interval):
+                    return
+
+        self._thread = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop heartbeating, release held leases and deregister this process"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.release_all()
+        try:
+            self._database()[WORKER_COLLECTION].delete_one({"_id": self.worker_id})
+        except Exception as e:
+            print(f"⚠️  Could not deregister scheduler worker: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "worker_id": self.worker_id,
+            "held": sorted(self.held()),
+            "ttl_seconds": self.ttl,
+        }
+
+
+class ShardOwnership:
+    """
+    This process's fair share of a set of shard leases, for continuous work
+
+    Each rebalance registers the process, computes its share
+    (ceil(shards / live workers)), releases shards beyond it and claims free
+    or expired ones up to it. While the lease collection is unreachable the
+    process owns every shard, so work degrades to duplicated rather than
+    stopped.
+
+    Args:
+        leases: Lease table of this process
+        name: Lease ID prefix ("<name>:<shard>")
+        shards: Number of shards
+    """
+
+    def __init__(self, leases: LeaseTable, name: str, shards: int = SCHEDULER_SHARDS):
+        self.leases = leases
+        self.name = name
+        self.shards = shards
+        # None until the first rebalance, then whether leases are usable
+        self._active: Optional[bool] = None
+        self._workers = 0
+
+    def _lease_id(self, shard: int) -> str:
+        return f"{self.name}:{shard}"
+
+    def owned(self) -> Set[int]:
+        held = self.leases.held()
+        return {shard for shard in range(self.shards) if self._lease_id(shard) in held}
+
+    def rebalance(self):
+        """Register, then release or claim shards to match this process's share"""
+        try:
+            self._workers = self.leases.register_worker()
+            target = math.ceil(self.shards / max(1, self._workers))
+            owned = sorted(self.owned())
+            for shard in owned[target:]:
+                self.leases.release(self._lease_id(shard))
+            free = [shard for shard in range(self.shards) if shard not in owned]
+            random.shuffle(free)
+            for shard in free:
+                if len(owned) >= target:
+                    break
+                if self.leases.acquire(self._lease_id(shard)):
+                    owned.append(shard)
+            if self._active is False:
+                print(f"✓ Scheduler leases available again - owning {len(owned)}/{self.shards} shards")
+            self._active = True
+        except Exception as e:
+            if self._active is not False:
+                print(f"⚠️  Scheduler leases unavailable - this process takes all shards: {e}")
+            self._active = False
+
+    def owns(self, key: str) -> bool:
+        """Whether this process should work on ``key`` (nothing before the first rebalance)"""
+        if self._active is None:
+            return False
+        if not self._active:
+            return True
+        return self.leases.holds(self._lease_id(shard_of(key, self.shards)))
+
+    def share(self) -> float:
+        """Fraction of the shards this process works on"""
+        if self._active is None:
+            return 0.0
+        if not self._active:
+            return 1.0
+        return len(self.owned()) / self.shards
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shards": self.shards,
+            "owned": sorted(self.owned()),
+            "live_workers": self._workers,
+            "leases_available": self._active,
+        }
+
+
+def run_sharded_cycle(
+    leases: LeaseTable,
+    name: str,
+    cycle: str,
+    shards: int,
+    work: Callable[[int], Any],
+    poll_interval: float = 1.0
+) -> List[int]:
+    """
+    Run one cycle of sharded work, each shard exactly once across processes
+
+    Every process calls this at the start of a cycle. Shards are claimed
+    one at a time (a shard is claimable while its lease is free or expired
+    and it has not completed ``cycle``); completing a shard records the
+    cycle on its lease. A process returns once every shard has completed
+    the cycle, waiting out shards held by others so it can take over those
+    whose holder dies. A crash mid-shard means that shard is run again.
+
+    Args:
+        leases: Lease table of this process (its heartbeat renews the claims)
+        name: Lease ID prefix
+        cycle: Cycle identifier (e.g. the date of a daily run)
+        shards: Number of shards
+        work: Runs one shard (blocking)
+        poll_interval: Seconds between checks while other processes finish
+
+    Returns:
+        Shards this process ran
+    """
+    lease_ids = [f"{name}:{shard}" for shard in range(shards)]
+    ran: List[int] = []
+    failed: Set[int] = set()
+    order = list(range(shards))
+    random.shuffle(order)
+
+    while True:
+        progress = False
+        for shard in order:
+            if shard in failed or not leases.acquire(lease_ids[shard], {"cycle": {"$ne": cycle}}):
+                continue
+            progress = True
+            try:
+                work(shard)
+            except Exception as e:
+                # Leave the shard to another process (or the next cycle)
+                print(f"✗ Shard {shard} of {name} cycle {cycle} failed: {e}")
+                failed.add(shard)
+                leases.release(lease_ids[shard])
+                continue
+            leases.release(lease_ids[shard], {"cycle": cycle})
+            ran.append(shard)
+        if progress:
+            continue
+        completed = leases.collection().count_documents({"_id": {"$in": lease_ids}, "cycle": cycle})
+        if completed + len(failed) >= shards:
+            return ran
+        time.sleep(poll_interval)
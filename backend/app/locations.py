@@ -0,0 +1,557 @@
+"""
+Location canonicalization
+Resolves the free-form locations clients send (city names in any case or
+spacing, "lat,lon" pairs) to a stable location ID used to key the caches,
+stored observations, rollups and forecasts:
+
+- Coordinates are snapped to a grid and identified by their cell
+  ("geo:28.6,77.2"), so nearby points share one ID
+- Names start out as "name:<normalized name>"; once a fetch reports where a
+  name is (the j1 nearest_area), the name resolves to that grid cell
+
+Learned resolutions are shared through a MongoDB collection, so every
+process resolves a name to the same ID: the first resolution stored for a
+name wins and learned resolutions are never forgotten. Resolving never
+waits on the database: answers come from memory, and a background thread
+loads the collection, looks up what missed, stores what was learned and
+moves anything stored under a name's "name:" ID to the cell it resolved to.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+load_dotenv()
+
+# Collection of learned resolutions, shared by all processes
+LOCATION_COLLECTION = "locations"
+# Grid cell size in degrees (0.1 is about 11 km)
+LOCATION_GRID_DEGREES = float(os.getenv("LOCATION_GRID_DEGREES", 0.1))
+# Seconds a lookup that found nothing is remembered before looking it up again
+LOCATION_MISS_TTL_SECONDS = float(os.getenv("LOCATION_MISS_TTL_SECONDS", 60))
+# Most unresolved names remembered as misses (oldest are forgotten first)
+LOCATION_CACHE_MAX_ENTRIES = int(os.getenv("LOCATION_CACHE_MAX_ENTRIES", 10000))
+# Seconds between background syncs with the shared collection (pending work wakes it sooner)
+LOCATION_SYNC_INTERVAL_SECONDS = float(os.getenv("LOCATION_SYNC_INTERVAL_SECONDS", 5))
+
+COORDINATES = re.compile(r"^\s*([-+]?\d{1,3}(?:\.\d+)?)\s*,\s*([-+]?\d{1,3}(?:\.\d+)?)\s*$")
+
+
+def normalize_name(name: str) -> str:
+    """Comparison key for a location name: Unicode-normalized, casefolded, single-spaced"""
+    name = unicodedata.normalize("NFKC", name).casefold()
+    return " ".join(name.replace(",", " ").split()).strip(".")
+
+
+def display_name(name: str) -> str:
+    """Title-cased, single-spaced name for responses and storage"""
+    return " ".join(unicodedata.normalize("NFKC", name).split()).title()
+
+
+def parse_coordinates(query: str) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) if the query is a valid "lat,lon" pair"""
+    match = COORDINATES.match(query)
+    if not match:
+        return None
+    latitude, longitude = float(match.group(1)), float(match.group(2))
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def area_from_j1(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Name and coordinates of the area a wttr.in ``format=j1`` payload describes
+
+    Returns:
+        Dict with name, latitude and longitude, or None if the payload has
+        no usable nearest_area
+    """
+    area = (data.get("nearest_area") or [{}])[0]
+    try:
+        latitude, longitude = float(area["latitude"]), float(area["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    name = ((area.get("areaName") or [{}])[0].get("value") or "").strip()
+    return {"name": name or None, "latitude": latitude, "longitude": longitude}
+
+
+class Location:
+    """A resolved location: stable ID, display name and the upstream query"""
+
+    __slots__ = ("id", "name", "query", "latitude", "longitude")
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        query: str,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ):
+        self.id = id
+        self.name = name
+        self.query = query
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @property
+    def resolved(self) -> bool:
+        """Whether the location is pinned to a grid cell"""
+        return self.latitude is not None
+
+    def __repr__(self) -> str:
+        return f"Location({self.id!r}, {self.name!r})"
+
+
+class LocationResolver:
+    """
+    Maps client location strings to Locations
+
+    ``resolve`` and ``learn`` answer from memory and never wait on the
+    database. With a database, a background thread syncs with the shared
+    collection: it loads every stored resolution once, looks up locations
+    that missed in memory (a lookup that finds nothing is repeated after
+    miss_ttl seconds), stores resolutions learned here and moves data stored
+    under a name's "name:" ID to its cell. Until its lookup completes, a
+    name not yet known here keeps its "name:" ID.
+
+    Args:
+        database: Returns the database holding the shared resolutions, or
+            None while it is unavailable (omit to keep resolutions in memory)
+        grid: Grid cell size in degrees
+        max_entries: Most unresolved names remembered as misses
+        miss_ttl: Seconds a miss is remembered before looking it up again
+        sync_interval: Seconds between background syncs while work is pending
+    """
+
+    def __init__(
+        self,
+        database: Optional[Callable[[], Optional[Database]]] = None,
+        grid: float = LOCATION_GRID_DEGREES,
+        max_entries: int = LOCATION_CACHE_MAX_ENTRIES,
+        miss_ttl: float = LOCATION_MISS_TTL_SECONDS,
+        sync_interval: float = LOCATION_SYNC_INTERVAL_SECONDS
+    ):
+        self._database = database
+        self.grid = grid
+        self.max_entries = max_entries
+        self.miss_ttl = miss_ttl
+        self.sync_interval = sync_interval
+        self._decimals = len(f"{grid:g}".partition(".")[2])
+        # Name key -> location ID, and location ID -> cell (name, latitude, longitude)
+        self._names: Dict[str, str] = {}
+        self._cells: Dict[str, Dict[str, Any]] = {}
+        # Shared document ID -> when a lookup last found nothing
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+        # Work for the sync thread: shared document IDs to look up, resolutions
+        # to store, and location IDs whose data is to be moved (old -> new)
+        self._lookups: Set[str] = set()
+        self._unsynced: Dict[str, Dict[str, Any]] = {}
+        self._migrations: Dict[str, str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {
+            "hits": 0, "misses": 0, "coordinates": 0, "learned": 0,
+            "lookups": 0, "syncs": 0, "errors": 0, "migrated": 0,
+        }
+
+    def snap(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        """Centre of the grid cell containing a point"""
+        latitude = min(90.0, max(-90.0, round(latitude / self.grid) * self.grid))
+        longitude = round(longitude / self.grid) * self.grid
+        if longitude >= 180:
+            longitude -= 360
+        # + 0.0 turns -0.0 into 0.0
+        return round(latitude, self._decimals) + 0.0, round(longitude, self._decimals) + 0.0
+
+    def _coordinates(self, latitude: float, longitude: float) -> str:
+        return f"{latitude:.{self._decimals}f},{longitude:.{self._decimals}f}"
+
+    def resolve(self, query: str, refresh: bool = False) -> Location:
+        """
+        Resolve a location string from memory
+
+        Locations not known here are queued for a lookup in the shared
+        collection, which later calls see once it completes.
+
+        Args:
+            query: City name or "lat,lon" pair
+            refresh: Queue a lookup even if one found nothing within miss_ttl
+
+        Returns:
+            Location; names that were never fetched are not yet resolved
+            (their ID is "name:<normalized name>")
+
+        Raises:
+            ValueError: If the query is empty
+        """
+        coordinates = parse_coordinates(query)
+        if coordinates:
+            latitude, longitude = self.snap(*coordinates)
+            point = self._coordinates(latitude, longitude)
+            location_id = f"geo:{point}"
+            with self._lock:
+                self._counters["coordinates"] += 1
+                cell = self._cells.get(location_id)
+                queued = cell is None and self._request_lookup(location_id, refresh)
+            if queued:
+                self._notify()
+            return Location(location_id, cell["name"] if cell else point, point, latitude, longitude)
+
+        key = normalize_name(query)
+        if not key:
+            raise ValueError("Location is empty")
+        with self._lock:
+            location = self._resolve_name(key, query)
+            self._counters["hits" if location else "misses"] += 1
+            queued = location is None and self._request_lookup(f"name:{key}", refresh)
+        if queued:
+            self._notify()
+        return location or Location(f"name:{key}", display_name(query), display_name(query))
+
+    def _resolve_name(self, key: str, query: str) -> Optional[Location]:
+        """Resolution of a name known here (lock held)"""
+        location_id = self._names.get(key)
+        cell = self._cells.get(location_id) if location_id else None
+        if cell is None:
+            return None
+        return Location(location_id, cell["name"], display_name(query), cell["latitude"], cell["longitude"])
+
+    def _request_lookup(self, doc_id: str, refresh: bool) -> bool:
+        """Queue a shared document for lookup (lock held); returns whether it was queued"""
+        if self._database is None or doc_id in self._lookups:
+            return False
+        checked = self._misses.get(doc_id)
+        if not refresh and checked is not None and time.monotonic() - checked < self.miss_ttl:
+            return False
+        self._lookups.add(doc_id)
+        return True
+
+    def learn(self, query: str, area: Optional[Dict[str, Any]]) -> Location:
+        """
+        Record where a fetched location is and return its resolution
+
+        The first resolution known for a name is kept (one stored earlier by
+        another process replaces it at the next sync), so a name always
+        resolves to the same cell; observations, rollups and forecasts
+        stored under its "name:" ID are moved to the cell in the background.
+
+        Args:
+            query: The client's location string
+            area: Name and coordinates reported by the upstream (see area_from_j1),
+                or None if it reported none
+
+        Returns:
+            Location for the query, resolved to a grid cell when possible
+        """
+        coordinates = parse_coordinates(query)
+        if coordinates:
+            # A point keeps the cell it is in; the upstream only names it
+            latitude, longitude = self.snap(*coordinates)
+            name = area.get("name") if area else None
+            key = None
+        elif area is not None:
+            latitude, longitude = self.snap(area["latitude"], area["longitude"])
+            name = display_name(query)
+            key = normalize_name(query)
+        else:
+            # Another process may have resolved the name since the last lookup
+            return self.resolve(query, refresh=True)
+
+        location_id = f"geo:{self._coordinates(latitude, longitude)}"
+        learned = False
+        with self._lock:
+            if name and location_id not in self._cells:
+                self._remember(location_id, {"name": name, "latitude": latitude, "longitude": longitude})
+                learned = True
+            if key is not None and key not in self._names:
+                self._remember(f"name:{key}", {"location_id": location_id, **self._cells[location_id]})
+                learned = True
+        if learned:
+            self._notify()
+        return self.resolve(query)
+
+    def _remember(self, doc_id: str, fields: Dict[str, Any]):
+        """Adopt a resolution learned here and queue it for storing (lock held)"""
+        self._adopt(doc_id, fields)
+        self._counters["learned"] += 1
+        if self._database is not None:
+            self._unsynced[doc_id] = fields
+
+    def _adopt(self, doc_id: str, doc: Dict[str, Any]):
+        """Remember a resolution (lock held); the first one for a cell or name is kept"""
+        cell = {"name": doc["name"], "latitude": doc["latitude"], "longitude": doc["longitude"]}
+        if doc_id.startswith("name:"):
+            self._cells.setdefault(doc["location_id"], cell)
+            self._names.setdefault(doc_id[len("name:"):], doc["location_id"])
+        else:
+            self._cells.setdefault(doc_id, cell)
+        self._misses.pop(doc_id, None)
+
+    def _notify(self):
+        """Wake the sync thread, starting it if needed"""
+        if self._database is None:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._closed.clear()
+                    self._thread = threading.Thread(target=self._run, name="locations-sync", daemon=True)
+                    self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            self.sync()
+
+    def _pending(self) -> bool:
+        with self._lock:
+            return bool(self._lookups or self._unsynced or self._migrations)
+
+    def _db(self) -> Optional[Database]:
+        """The shared database, or None if there is none or it is unavailable"""
+        if self._database is None:
+            return None
+        try:
+            return self._database()
+        except Exception:
+            return None
+
+    def sync(self) -> bool:
+        """
+        Sync with the shared collection now (blocking; the sync thread calls this)
+
+        Loads every stored resolution the first time, then looks up queued
+        locations, stores resolutions learned here and moves data stored
+        under resolved names' "name:" IDs. Work that fails is kept for the
+        next sync.
+
+        Returns:
+            Whether nothing is left pending (False while the database is unavailable)
+        """
+        with self._sync_lock:
+            if self._loaded and not self._pending():
+                return True
+            db = self._db()
+            if db is None:
+                return False
+            try:
+                if not self._loaded:
+                    self._load(db)
+                self._sync_lookups(db)
+                self._sync_stores(db)
+                self._sync_migrations(db)
+            except PyMongoError as e:
+                print(f"⚠️  Could not sync locations: {e}")
+                with self._lock:
+                    self._counters["errors"] += 1
+                return False
+            with self._lock:
+                self._counters["syncs"] += 1
+        return not self._pending()
+
+    def _load(self, db: Database):
+        """Adopt every stored resolution"""
+        docs = list(db[LOCATION_COLLECTION].find({}, {"learned_at": 0}))
+        with self._lock:
+            for doc in docs:
+                self._adopt(doc["_id"], doc)
+            self._loaded = True
+
+    def _sync_lookups(self, db: Database):
+        with self._lock:
+            lookups, self._lookups = self._lookups, set()
+        if not lookups:
+            return
+        try:
+            docs = {doc["_id"]: doc for doc in db[LOCATION_COLLECTION].find({"_id": {"$in": sorted(lookups)}})}
+        except PyMongoError:
+            with self._lock:
+                self._lookups |= lookups
+            raise
+        now = time.monotonic()
+        with self._lock:
+            self._counters["lookups"] += len(lookups)
+            for doc_id in lookups:
+                doc = docs.get(doc_id)
+                if doc is None:
+                    self._misses[doc_id] = now
+                    self._misses.move_to_end(doc_id)
+                    continue
+                self._adopt(doc_id, doc)
+                if doc_id.startswith("name:"):
+                    # This process may have stored data under the name meanwhile
+                    self._migrations[doc_id] = doc["location_id"]
+            while len(self._misses) > self.max_entries:
+                self._misses.popitem(last=False)
+
+    def _sync_stores(self, db: Database):
+        """Store resolutions learned here; a name another process stored first keeps its cell"""
+        with self._lock:
+            pending, self._unsynced = list(self._unsynced.items()), {}
+        for i, (doc_id, fields) in enumerate(pending):
+            try:
+                doc = self._insert(db, doc_id, fields)
+            except PyMongoError:
+                with self._lock:
+                    for doc_id, fields in pending[i:]:
+                        self._unsynced.setdefault(doc_id, fields)
+                raise
+            if not doc_id.startswith("name:"):
+                continue
+            with self._lock:
+                if doc["location_id"] != fields["location_id"]:
+                    # Another process stored a different cell first; use it from now on
+                    self._names[doc_id[len("name:"):]] = doc["location_id"]
+                    self._cells.setdefault(
+                        doc["location_id"],
+                        {"name": doc["name"], "latitude": doc["latitude"], "longitude": doc["longitude"]}
+                    )
+                self._migrations[doc_id] = doc["location_id"]
+
+    def _insert(self, db: Database, doc_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return db[LOCATION_COLLECTION].find_one_and_update(
+                {"_id": doc_id},
+                {"$setOnInsert": {**fields, "learned_at": datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another process inserted it first
+            return db[LOCATION_COLLECTION].find_one({"_id": doc_id})
+
+    def _sync_migrations(self, db: Database):
+        with self._lock:
+            pending, self._migrations = list(self._migrations.items()), {}
+        for i, (old_id, new_id) in enumerate(pending):
+            try:
+                moved = migrate_location_id(db, old_id, new_id)
+            except PyMongoError:
+                with self._lock:
+                    for old_id, new_id in pending[i:]:
+                        self._migrations.setdefault(old_id, new_id)
+                raise
+            if moved:
+                print(f"✓ Moved {moved} observations from {old_id} to {new_id}")
+                with self._lock:
+                    self._counters["migrated"] += moved
+
+    def close(self):
+        """Stop the sync thread and sync pending work one last time"""
+        self._closed.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pending():
+            self.sync()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get resolution counters for monitoring"""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "names": len(self._names),
+                "cells": len(self._cells),
+                "remembered_misses": len(self._misses),
+                "pending_lookups": len(self._lookups),
+                "unsynced": len(self._unsynced),
+                "pending_migrations": len(self._migrations),
+                "loaded": self._loaded,
+                "max_entries": self.max_entries,
+                "miss_ttl_seconds": self.miss_ttl,
+                "grid_degrees": self.grid,
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else None,
+                "shared": self._database is not None,
+            }
+
+
+def _shared_database() -> Optional[Database]:
+    """The app database, or None while it is unavailable (probes it: sync thread only)"""
+    from app.database import db_health, get_db
+
+    return get_db() if db_health.check() else None
+
+
+# Shared resolver used by the scrapers, services and routes
+locations = LocationResolver(database=_shared_database)
+
+
+def migrate_location_id(db: Database, old_id: str, new_id: str) -> int:
+    """
+    Move observations, rollups and the forecast stored under one location ID
+    to another (e.g. from a name's "name:" ID to the cell it resolved to)
+
+    Returns:
+        Number of observations moved
+    """
+    from app.forecast import FORECAST_COLLECTION
+    from app.rollups import ROLLUP_COLLECTIONS, apply_rollups
+
+    docs = list(db.weather_data.find({"location_id": old_id}))
+    if docs:
+        db.weather_data.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in docs]}}, {"$set": {"location_id": new_id}}
+        )
+    for collection_name in ROLLUP_COLLECTIONS.values():
+        db[collection_name].delete_many({"location_id": old_id})
+    for doc in docs:
+        doc["location_id"] = new_id
+    apply_rollups(db, docs)
+    try:
+        db[FORECAST_COLLECTION].update_one({"location_id": old_id}, {"$set": {"location_id": new_id}})
+    except DuplicateKeyError:
+        # The cell has its own forecast
+        db[FORECAST_COLLECTION].delete_one({"location_id": old_id})
+    return len(docs)
+
+
+def backfill_location_ids(db) -> int:
+    """
+    Set location_id on stored observations that predate it (by resolving
+    their city) and rebuild the rollups keyed by it
+
+    Cities never fetched since get their "name:" ID; their observations are
+    moved to the cell when the name is first resolved (see migrate_location_id).
+
+    Returns:
+        Number of observations updated
+    """
+    from app.rollups import rebuild_rollups
+
+    # Load the stored resolutions first, resolve() does not wait for them
+    locations.sync()
+    updated = 0
+    missing = {"location_id": {"$exists": False}}
+    for city in db.weather_data.distinct("city", missing):
+        result = db.weather_data.update_many(
+            {"city": city, **missing}, {"$set": {"location_id": locations.resolve(city).id}}
+        )
+        updated += result.modified_count
+    rebuild_rollups(db)
+    return updated
+
+
+if __name__ == "__main__":
+    # Key observations stored before location IDs: python -m app.locations
+    from app.database import get_db
+
+    count = backfill_location_ids(get_db())
+    print(f"✓ Set location_id on {count} observations and rebuilt rollups")
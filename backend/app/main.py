@@ -3,10 +3,19 @@ Main FastAPI application entry point
 """
 from fastapi.middleware.cors import CORSMiddleware
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import weather
-from app.scheduler import start_scheduler
+from app.routes import weather, monitoring
+from app.scheduler import start_scheduler, stop_scheduler
+from app.scraper import async_scraper
+from app.services import weather_writer, weather_spool
+from app.metrics import MetricsMiddleware, StatsCollector
+from app.executor import db_executor
+from app.database import close_db, db_health
+from app.serialization import orjson_available
+from app.locations import locations
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+import asyncio
 
 app = FastAPI()
 from fastapi import FastAPI
@@ -24,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
    
@@ -38,10 +48,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Time every request and trace its stages (outermost, so it sees the full response)
+app.add_middleware(MetricsMiddleware)
+REGISTRY.register(StatsCollector(async_scraper, weather_writer, db_health, weather_spool))
+
 # Include routers
 app.include_router(weather.router, prefix="/api", tags=["weather"])
+app.include_router(monitoring.router, prefix="/api", tags=["monitoring"])
 
 @app.get("/")
 async def root():
@@ -53,9 +69,30 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
 # Start scheduler on app startup
 @app.on_event("startup")
 async def startup_event():
     """Start scheduled tasks on application startup"""
+    if orjson_available():
+        print("✓ JSON encoder: orjson")
+    else:
+        print("⚠️  JSON encoder: json (orjson not installed - large responses encode slower)")
     start_scheduler()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background work and close connections on application shutdown"""
+    # Stop producing observations first, then flush buffered writes (spooled
+    # if MongoDB is down) before the database pool and connections go away
+    await stop_scheduler()
+    await async_scraper.close()
+    await asyncio.to_thread(weather_writer.close)
+    await asyncio.to_thread(weather_spool.close)
+    await asyncio.to_thread(locations.close)
+    db_executor.shutdown()
+    close_db()
@@ -0,0 +1,263 @@
+"""
+Prometheus metrics and per-request stage tracing
+Histograms are observed where the work happens; counters that other
+components already keep (cache, writer, breakers) are read at scrape time
+by StatsCollector. Each HTTP request gets a Trace in a context variable,
+and timed stages are attached to it so slow requests can be broken down.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+load_dotenv()
+
+# Requests slower than this are logged with their stage breakdown (seconds, 0 disables)
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 2))
+
+# Bucket boundaries (seconds)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800)
+
+UPSTREAM_LATENCY = Histogram(
+    "weather_upstream_fetch_seconds", "Upstream provider call latency",
+    ["provider", "outcome"], buckets=REQUEST_BUCKETS
+)
+PARSE_LATENCY = Histogram(
+    "weather_parse_seconds", "Time spent parsing upstream responses",
+    ["format"], buckets=FAST_BUCKETS
+)
+MONGO_LATENCY = Histogram(
+    "weather_mongo_seconds", "MongoDB operation latency",
+    ["operation"], buckets=REQUEST_BUCKETS
+)
+HTTP_LATENCY = Histogram(
+    "weather_http_request_seconds", "HTTP request latency until the response is fully sent",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS
+)
+SCHEDULER_JOB_LATENCY = Histogram(
+    "weather_scheduler_job_seconds", "Scheduled job duration",
+    ["job", "outcome"], buckets=JOB_BUCKETS
+)
+SCHEDULER_CITIES = Counter(
+    "weather_scheduler_cities_total", "Cities processed by scheduled scrapes", ["outcome"]
+)
+EXECUTOR_QUEUE_WAIT = Histogram(
+    "weather_executor_queue_wait_seconds", "Time calls waited for a worker or slot",
+    ["executor"], buckets=FAST_BUCKETS + (2.5, 5, 10)
+)
+EXECUTOR_IN_FLIGHT = Gauge(
+    "weather_executor_in_flight", "Calls running or waiting in an executor", ["executor"]
+)
+EXECUTOR_REJECTED = Counter(
+    "weather_executor_rejected_total", "Calls rejected because the executor was saturated", ["executor"]
+)
+
+
+class Trace:
+    """Timed stages of one request"""
+
+    __slots__ = ("request_id", "start", "stages")
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id or os.urandom(8).hex()
+        self.start = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float):
+        self.stages.append((name, seconds))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """Stages as a Server-Timing header value (durations in milliseconds)"""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def summary(self) -> str:
+        return ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.stages) or "no stages"
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def record_stage(name: str, seconds: float):
+    """Attach a timed stage to the current request's trace, if there is one"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+# Labelled histogram children, resolved once per label set
+_children: Dict[Tuple[Any, ...], Any] = {}
+
+
+class stage:
+    """
+    Time a block as a trace stage, optionally observing it in a histogram
+
+    Usage:
+        with stage("mongo.history", MONGO_LATENCY, operation="history"):
+            docs = list(cursor)
+    """
+
+    __slots__ = ("name", "metric", "start")
+
+    def __init__(self, name: str, histogram: Optional[Histogram] = None, **labels: str):
+        self.name = name
+        self.metric = None
+        if histogram is not None:
+            key = (histogram, *labels.items())
+            self.metric = _children.get(key)
+            if self.metric is None:
+                self.metric = _children.setdefault(key, histogram.labels(**labels))
+
+    def __enter__(self) -> "stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        if self.metric is not None:
+            self.metric.observe(elapsed)
+        record_stage(self.name, elapsed)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times every HTTP request and traces its stages
+
+    Latency is labelled with the matched route's path template, so path
+    parameters don't create new series. Responses carry ``X-Request-ID``
+    and a ``Server-Timing`` header with the stages recorded before the
+    response started.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self._route_paths: Dict[Any, str] = {}
+
+    def _route_path(self, scope: Dict[str, Any]) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            path = self._route_paths.setdefault(endpoint, path or "unmatched")
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = current_trace.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", trace.request_id.encode()))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            elapsed = trace.elapsed()
+            route = self._route_path(scope)
+            key = (HTTP_LATENCY, scope["method"], route, status)
+            metric = _children.get(key)
+            if metric is None:
+                metric = _children.setdefault(key, HTTP_LATENCY.labels(scope["method"], route, str(status)))
+            metric.observe(elapsed)
+            if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+                print(
+                    f"⚠️  Slow request {trace.request_id} {scope['method']} {route} "
+                    f"{status} {elapsed:.2f}s: {trace.summary()}"
+                )
+
+
+class StatsCollector:
+    """Exposes the scraper's cache, provider and breaker stats, the writer's and spool's counters and database health"""
+
+    def __init__(self, scraper, writer, database_health=None, spool=None):
+        self.scraper = scraper
+        self.writer = writer
+        self.database_health = database_health
+        self.spool = spool
+
+    def collect(self):
+        cache = self.scraper.cache.stats()
+        for name in ("hits", "misses", "coalesced", "evictions", "expirations"):
+            counter = CounterMetricFamily(f"weather_cache_{name}", f"Response cache {name}")
+            counter.add_metric([], cache[name])
+            yield counter
+        yield GaugeMetricFamily("weather_cache_entries", "Response cache entries", value=cache["entries"])
+        yield GaugeMetricFamily(
+            "weather_cache_hit_ratio", "Response cache hits / lookups", value=cache["hit_ratio"] or 0
+        )
+
+        calls = CounterMetricFamily(
+            "weather_upstream_calls", "Upstream provider calls by outcome", labels=["provider", "outcome"]
+        )
+        for provider, stats in self.scraper.stats.snapshot().items():
+            for outcome in ("success", "empty", "failure", "rejected", "cached", "cancelled"):
+                calls.add_metric([provider, outcome], stats.get(outcome, 0))
+        yield calls
+
+        breakers = GaugeMetricFamily(
+            "weather_circuit_open", "1 if the upstream host's circuit breaker is not closed", labels=["host"]
+        )
+        for host, breaker in self.scraper.health.snapshot()["breakers"].items():
+            breakers.add_metric([host], 0 if breaker["state"] == "closed" else 1)
+        yield breakers
+
+        http_cache = self.scraper.http_cache.stats()
+        for name in ("hits", "revalidated", "revalidation_requests", "misses", "evictions", "bytes_downloaded", "bytes_saved"):
+            counter = CounterMetricFamily(f"weather_http_cache_{name}", f"Upstream HTTP cache {name.replace('_', ' ')}")
+            counter.add_metric([], http_cache[name])
+            yield counter
+        yield GaugeMetricFamily("weather_http_cache_bytes", "Size of stored upstream bodies", value=http_cache["bytes"])
+
+        writer = self.writer.stats()
+        for name in ("inserted", "failed", "flushes"):
+            counter = CounterMetricFamily(f"weather_writer_{name}", f"Buffered writer {name}")
+            counter.add_metric([], writer[name])
+            yield counter
+        yield GaugeMetricFamily("weather_writer_pending", "Documents waiting to be flushed", value=writer["pending"])
+
+        if self.database_health is not None:
+            health = self.database_health.snapshot()
+            yield GaugeMetricFamily(
+                "weather_mongo_available", "1 unless the last MongoDB probe or operation failed",
+                value=0 if health["available"] is False else 1
+            )
+            for name in ("probes", "failures", "recoveries"):
+                counter = CounterMetricFamily(f"weather_mongo_health_{name}", f"MongoDB health {name}")
+                counter.add_metric([], health[name])
+                yield counter
+
+        if self.spool is not None:
+            spool = self.spool.stats()
+            for name in ("appended", "duplicates", "dropped", "replayed"):
+                counter = CounterMetricFamily(f"weather_spool_{name}", f"Write-ahead spool documents {name}")
+                counter.add_metric([], spool[name])
+                yield counter
+            yield GaugeMetricFamily("weather_spool_pending", "Spooled documents waiting for replay", value=spool["pending"])
+            yield GaugeMetricFamily("weather_spool_bytes", "Size of the spool on disk", value=spool["bytes"])
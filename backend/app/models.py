@@ -8,6 +8,7 @@ from typing import Optional
 class WeatherData(BaseModel):
     """Weather data model"""
     city: str
+    location_id: Optional[str] = Field(None, description="Stable location ID (see app.locations)")
     temperature: float = Field(..., description="Temperature in Celsius")
     humidity: float = Field(..., description="Humidity percentage")
     wind_speed: float = Field(..., description="Wind speed in km/h")
@@ -19,6 +20,7 @@ class WeatherData(BaseModel):
 class WeatherResponse(BaseModel):
     """API response model for current weather"""
     city: str
+    location_id: Optional[str] = None
     temperature: float
     humidity: float
     wind_speed: float
@@ -27,8 +29,96 @@ class WeatherResponse(BaseModel):
     aqi_level: Optional[str] = None
     timestamp: datetime
 
+class CurrentWeatherResponse(WeatherResponse):
+    """API response model for current weather, with freshness information"""
+    age_seconds: float = Field(..., description="Seconds since the observation was scraped")
+    refresh_triggered: bool = Field(False, description="Whether a background refresh was started")
+
+class BatchWeatherRequest(BaseModel):
+    """Request body for the multi-city current weather endpoint"""
+    cities: list[str] = Field(..., description="City names")
+
 class HistoricalWeatherResponse(BaseModel):
     """API response model for historical weather"""
     city: str
     data: list[WeatherResponse]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as cursor to get the next (older) page; null on the last page"
+    )
+
+class DeltaTimestamps(BaseModel):
+    """Delta-encoded epoch milliseconds"""
+    first: Optional[int] = Field(None, description="First timestamp (ms since epoch, UTC); null if empty")
+    deltas: list[int] = Field(..., description="Difference to the previous timestamp, from the second row on")
+
+class DictionaryColumn(BaseModel):
+    """Dictionary-encoded strings"""
+    values: list[str] = Field(..., description="Distinct values")
+    codes: list[Optional[int]] = Field(..., description="Index into values per row; null for a missing value")
+
+class HistoricalColumnarResponse(BaseModel):
+    """Historical weather with one list per field, aligned by index (format=columnar)"""
+    city: str
+    location_id: Optional[str] = None
+    count: int
+    timestamps: DeltaTimestamps
+    temperature: list[float]
+    humidity: list[float]
+    wind_speed: list[float]
+    aqi: list[Optional[int]]
+    condition: DictionaryColumn
+    aqi_level: DictionaryColumn
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as cursor to get the next (older) page; null on the last page"
+    )
+
 
+class FieldSummary(BaseModel):
+    """Min/max/mean of one field over a rollup bucket"""
+    min: float
+    max: float
+    mean: float
+
+class RollupPoint(BaseModel):
+    """Aggregated weather for one hour or day bucket"""
+    timestamp: datetime = Field(..., description="Bucket start (UTC)")
+    samples: int = Field(..., description="Observations in the bucket")
+    temperature: Optional[FieldSummary] = None
+    humidity: Optional[FieldSummary] = None
+    wind_speed: Optional[FieldSummary] = None
+    aqi: Optional[FieldSummary] = None
+
+class HistoricalRollupResponse(BaseModel):
+    """API response model for aggregated historical weather"""
+    city: str
+    resolution: str
+    data: list[RollupPoint]
+
+class DailyForecast(BaseModel):
+    """Daily forecast series, one list entry per day"""
+    date: list[str] = Field(..., description="Local date (YYYY-MM-DD)")
+    min_temperature: list[Optional[float]]
+    max_temperature: list[Optional[float]]
+    avg_temperature: list[Optional[float]]
+    sun_hours: list[Optional[float]]
+    uv_index: list[Optional[float]]
+
+class HourlyForecast(BaseModel):
+    """3-hourly forecast series, one list entry per slot"""
+    time: list[str] = Field(..., description="Local time at the location (YYYY-MM-DDTHH:MM)")
+    temperature: list[Optional[float]]
+    feels_like: list[Optional[float]]
+    humidity: list[Optional[float]]
+    wind_speed: list[Optional[float]]
+    precipitation: list[Optional[float]] = Field(..., description="Precipitation in mm")
+    chance_of_rain: list[Optional[float]] = Field(..., description="Chance of rain in percent")
+    condition: list[str]
+
+class ForecastResponse(BaseModel):
+    """API response model for a stored forecast (columnar: one list per field)"""
+    city: str
+    location_id: str
+    issued_at: datetime = Field(..., description="When the forecast was fetched (UTC)")
+    age_seconds: float = Field(..., description="Seconds since the forecast was fetched")
+    daily: DailyForecast
+    hourly: HourlyForecast
@@ -0,0 +1,163 @@
+"""
+Upstream provider interface and registry
+Weather and AQI sources register with a priority; the registry orders them
+at runtime so the fastest healthy provider is tried first
+"""
+import os
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from app.health import OPEN, UpstreamHealth
+from app.stats import percentile
+
+load_dotenv()
+
+# Providers whose recent success rate drops below this are tried last
+PROVIDER_MIN_SUCCESS_RATE = float(os.getenv("PROVIDER_MIN_SUCCESS_RATE", 0.5))
+# Calls needed before a provider's success rate and latency are trusted
+PROVIDER_MIN_SAMPLES = int(os.getenv("PROVIDER_MIN_SAMPLES", 5))
+# Share of lookups that try the least-sampled healthy provider first, so
+# fallbacks keep getting measured while the primary is working
+PROVIDER_EXPLORE_RATE = float(os.getenv("PROVIDER_EXPLORE_RATE", 0.05))
+
+WEATHER = "weather"
+AQI = "aqi"
+
+# The scraper's GET helper: get(url, provider_name, headers=None)
+Getter = Callable[..., Awaitable[Any]]
+
+
+class Provider:
+    """
+    Base class for an upstream data source
+
+    Subclasses set ``name`` and ``kind`` and implement ``fetch``. Lower
+    ``priority`` values are preferred until latencies have been measured.
+    ``host`` names the upstream host whose circuit breaker covers the
+    provider (None for providers that don't go over HTTP).
+    """
+
+    name: str = ""
+    kind: str = WEATHER
+    priority: int = 100
+    host: Optional[str] = None
+
+    async def fetch(self, get: Getter, city: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch data for a city
+
+        Args:
+            get: The scraper's ``_get(url, provider, headers=None)`` coroutine
+            city: City name
+
+        Returns:
+            Weather fields for weather providers, ``{"aqi", "level"}`` for AQI
+            providers, or None if the provider has no data for the city
+
+        Raises:
+            Exception: If the upstream call or parsing fails
+        """
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name} priority={self.priority}>"
+
+
+class ProviderRegistry:
+    """
+    Registered providers, ordered per kind by health and latency
+
+    Healthy providers come first, fastest median latency first; providers
+    without enough measured calls follow, in priority order; unhealthy
+    providers (open breaker or low success rate) come last so they are
+    still used as a last resort. A small share of lookups (``explore_rate``)
+    put the least-sampled healthy provider first so a faster fallback is
+    noticed. With ``adaptive=False`` the order is priority only.
+    """
+
+    def __init__(
+        self,
+        health: UpstreamHealth,
+        adaptive: bool = True,
+        min_success_rate: float = PROVIDER_MIN_SUCCESS_RATE,
+        min_samples: int = PROVIDER_MIN_SAMPLES,
+        explore_rate: float = PROVIDER_EXPLORE_RATE
+    ):
+        self.health = health
+        self.adaptive = adaptive
+        self.min_success_rate = min_success_rate
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self._random = random.Random()
+        self._providers: Dict[str, Provider] = {}
+
+    def register(self, provider: Provider):
+        """Add a provider, replacing any provider with the same name"""
+        self._providers[provider.name] = provider
+
+    def unregister(self, name: str) -> Optional[Provider]:
+        """Remove a provider by name, returning it (None if not registered)"""
+        return self._providers.pop(name, None)
+
+    def get(self, name: str) -> Optional[Provider]:
+        return self._providers.get(name)
+
+    def providers(self, kind: Optional[str] = None) -> List[Provider]:
+        """Registered providers (optionally of one kind) in priority order"""
+        selected = [p for p in self._providers.values() if kind is None or p.kind == kind]
+        return sorted(selected, key=lambda p: p.priority)
+
+    def _measured(self, provider: Provider) -> bool:
+        return self.health.stats.call_count(provider.name) >= self.min_samples
+
+    def is_healthy(self, provider: Provider) -> bool:
+        """Whether the provider's breaker is not open and its success rate is acceptable"""
+        if provider.host and self.health.breaker(provider.host).state == OPEN:
+            return False
+        if not self._measured(provider):
+            return True
+        return self.health.stats.success_rate(provider.name) >= self.min_success_rate
+
+    def median_latency(self, provider: Provider) -> Optional[float]:
+        """Median recent latency in seconds (None if never called)"""
+        return percentile(self.health.stats.samples(provider.name), 50)
+
+    def ordered(self, kind: str, explore: bool = True) -> List[Provider]:
+        """Providers of a kind in the order they should be tried"""
+        providers = self.providers(kind)
+        if not self.adaptive:
+            return providers
+
+        def sort_key(provider: Provider):
+            if not self.is_healthy(provider):
+                return (2, 0.0, provider.priority)
+            if not self._measured(provider):
+                return (1, 0.0, provider.priority)
+            return (0, self.median_latency(provider), provider.priority)
+
+        ordered = sorted(providers, key=sort_key)
+        if explore and len(ordered) > 1 and self._random.random() < self.explore_rate:
+            healthy = [p for p in ordered[1:] if self.is_healthy(p)]
+            if healthy:
+                explore = min(healthy, key=lambda p: self.health.stats.call_count(p.name))
+                ordered.remove(explore)
+                ordered.insert(0, explore)
+        return ordered
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Current order and health of every provider, per kind"""
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for kind in sorted({p.kind for p in self._providers.values()}):
+            entries = []
+            for provider in self.ordered(kind, explore=False):
+                success_rate = self.health.stats.success_rate(provider.name)
+                median = self.median_latency(provider)
+                entries.append({
+                    "name": provider.name,
+                    "priority": provider.priority,
+                    "healthy": self.is_healthy(provider),
+                    "success_rate": round(success_rate, 3) if success_rate is not None else None,
+                    "median_latency_ms": round(median * 1000, 1) if median is not None else None,
+                })
+            result[kind] = entries
+        return result
@@ -0,0 +1,309 @@
+"""
+Demand- and staleness-driven refresh planning
+Every location that clients ask for is tracked with a request rate that
+decays over time and the age of its newest observation. Each tick the
+locations with the highest staleness x demand score are refreshed, within a
+budget of upstream requests per minute.
+"""
+import asyncio
+import heapq
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from dotenv import load_dotenv
+from app.cache import CACHE_WEATHER_TTL
+from app.metrics import SCHEDULER_CITIES, SCHEDULER_JOB_LATENCY
+
+load_dotenv()
+
+# Upstream requests per minute spent on refreshes (0 falls back to the daily cron)
+REFRESH_BUDGET_PER_MINUTE = float(os.getenv("REFRESH_BUDGET_PER_MINUTE", 30))
+# Upstream requests one refresh costs (weather plus AQI)
+REFRESH_REQUESTS_PER_CITY = float(os.getenv("REFRESH_REQUESTS_PER_CITY", 2))
+REFRESH_TICK_SECONDS = float(os.getenv("REFRESH_TICK_SECONDS", 5))
+# Request rates halve after this many seconds without requests
+REFRESH_DEMAND_HALF_LIFE = float(os.getenv("REFRESH_DEMAND_HALF_LIFE", 3600))
+# Observations younger than this are never refreshed (defaults to the response cache TTL)
+REFRESH_MIN_AGE = float(os.getenv("REFRESH_MIN_AGE", CACHE_WEATHER_TTL))
+# Ages are capped here when scoring (and locations never observed count as this old)
+REFRESH_MAX_STALENESS = float(os.getenv("REFRESH_MAX_STALENESS", 86400))
+REFRESH_MAX_TRACKED = int(os.getenv("REFRESH_MAX_TRACKED", 10000))
+# Demand floor for configured (SCRAPE_CITIES) locations, so they stay fresh-ish without traffic
+REFRESH_SEED_DEMAND = float(os.getenv("REFRESH_SEED_DEMAND", 0.05))
+
+# Locations whose decayed demand falls below this are forgotten
+_FORGET_DEMAND = 0.01
+
+
+def epoch_seconds(timestamp: datetime) -> float:
+    """Seconds since the epoch for a naive UTC datetime (as stored observations use)"""
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+
+class _Entry:
+    __slots__ = ("query", "demand", "demand_at", "observed_at", "floor", "busy_until")
+
+    def __init__(self, query: str, floor: float = 0.0):
+        self.query = query
+        self.demand = 0.0
+        self.demand_at = 0.0
+        self.observed_at: Optional[float] = None
+        self.floor = floor
+        self.busy_until = 0.0
+
+
+class RefreshPlanner:
+    """
+    Picks which locations to refresh next
+
+    Not thread-safe; callers share one event loop (or one simulation). All
+    methods take ``now`` in epoch seconds so traces can be replayed.
+
+    Args:
+        budget_per_minute: Upstream requests per minute (token bucket with a
+            one-minute burst)
+        requests_per_refresh: Upstream requests charged per refresh
+        half_life: Demand half-life in seconds
+        min_age: Minimum observation age before a refresh
+        max_staleness: Cap on the age used for scoring
+        max_tracked: Most locations tracked (least demanded are dropped)
+        partition: Optional work partition (see app.leases.ShardOwnership):
+            only locations it ``owns()`` are refreshed, and the budget is
+            scaled by its ``share()`` so the processes sharing the work
+            together spend ``budget_per_minute``
+    """
+
+    def __init__(
+        self,
+        budget_per_minute: float = REFRESH_BUDGET_PER_MINUTE,
+        requests_per_refresh: float = REFRESH_REQUESTS_PER_CITY,
+        half_life: float = REFRESH_DEMAND_HALF_LIFE,
+        min_age: float = REFRESH_MIN_AGE,
+        max_staleness: float = REFRESH_MAX_STALENESS,
+        max_tracked: int = REFRESH_MAX_TRACKED,
+        partition: Optional[Any] = None
+    ):
+        self.budget_per_minute = budget_per_minute
+        self.requests_per_refresh = requests_per_refresh
+        self.half_life = half_life
+        self.min_age = min_age
+        self.max_staleness = max_staleness
+        self.max_tracked = max_tracked
+        self.partition = partition
+        self._entries: Dict[str, _Entry] = {}
+        self._tokens = 0.0
+        self._tokens_at: Optional[float] = None
+        self._counters = {"requests": 0, "refreshes": 0, "failures": 0, "upstream_budget_used": 0.0}
+
+    def _entry(self, location_id: str, query: str) -> _Entry:
+        entry = self._entries.get(location_id)
+        if entry is None:
+            entry = self._entries[location_id] = _Entry(query)
+        return entry
+
+    def _decayed(self, entry: _Entry, now: float) -> float:
+        return entry.demand * 0.5 ** (max(0.0, now - entry.demand_at) / self.half_life)
+
+    def demand(self, entry: _Entry, now: float) -> float:
+        """Decayed request count (roughly requests per half-life), at least the entry's floor"""
+        return max(self._decayed(entry, now), entry.floor)
+
+    def staleness(self, entry: _Entry, now: float) -> float:
+        if entry.observed_at is None:
+            return self.max_staleness
+        return min(self.max_staleness, max(0.0, now - entry.observed_at))
+
+    def score(self, entry: _Entry, now: float) -> float:
+        return self.demand(entry, now) * self.staleness(entry, now)
+
+    def seed(self, queries: Iterable[str], location_id: Callable[[str], str], demand: float = REFRESH_SEED_DEMAND):
+        """Track configured locations with a demand floor"""
+        for query in queries:
+            query = query.strip()
+            if query:
+                self._entry(location_id(query), query).floor = demand
+
+    def record_request(self, location_id: str, query: str, now: float):
+        """Count a client request for a location"""
+        entry = self._entry(location_id, query)
+        entry.demand = self._decayed(entry, now) + 1
+        entry.demand_at = now
+        self._counters["requests"] += 1
+
+    def record_observation(
+        self,
+        location_id: str,
+        query: str,
+        observed_at: float,
+        requested_id: Optional[str] = None
+    ):
+        """
+        Note a location's newest observation time
+
+        Args:
+            location_id: Location the observation was stored under
+            query: Location string to refresh it with
+            observed_at: Observation time (epoch seconds)
+            requested_id: ID the location was tracked under before the fetch
+                resolved it (its demand moves to ``location_id``)
+        """
+        entry = self._entry(location_id, query)
+        previous = self._entries.pop(requested_id, None) if requested_id and requested_id != location_id else None
+        if previous is not None:
+            merged_at = max(entry.demand_at, previous.demand_at)
+            entry.demand = self._decayed(entry, merged_at) + self._decayed(previous, merged_at)
+            entry.demand_at = merged_at
+            entry.floor = max(entry.floor, previous.floor)
+        if entry.observed_at is None or observed_at > entry.observed_at:
+            entry.observed_at = observed_at
+        entry.busy_until = 0.0
+
+    def record_failure(self, location_id: str, now: float):
+        """Back off a location whose refresh failed for ``min_age`` seconds"""
+        entry = self._entries.get(location_id)
+        if entry is not None:
+            entry.busy_until = now + self.min_age
+        self._counters["failures"] += 1
+
+    def take(self, now: float) -> Dict[str, str]:
+        """
+        Pick the locations to refresh now, spending budget on them
+
+        Returns:
+            Location ID -> query, highest score first
+        """
+        if self._tokens_at is None:
+            self._tokens_at = now
+        budget = self.budget_per_minute * (1.0 if self.partition is None else self.partition.share())
+        capacity = max(budget, self.requests_per_refresh)
+        self._tokens = min(capacity, self._tokens + (now - self._tokens_at) * budget / 60)
+        self._tokens_at = now
+        count = int(self._tokens // self.requests_per_refresh)
+
+        self._forget(now)
+        if count <= 0:
+            return {}
+        candidates = (
+            (self.score(entry, now), location_id)
+            for location_id, entry in self._entries.items()
+            if entry.busy_until <= now and self.staleness(entry, now) >= self.min_age
+            and (self.partition is None or self.partition.owns(location_id))
+        )
+        chosen = [(score, location_id) for score, location_id in heapq.nlargest(count, candidates) if score > 0]
+        for _, location_id in chosen:
+            # Not picked again until the refresh reports back (or times out)
+            self._entries[location_id].busy_until = now + self.min_age
+        spent = len(chosen) * self.requests_per_refresh
+        self._tokens -= spent
+        self._counters["refreshes"] += len(chosen)
+        self._counters["upstream_budget_used"] += spent
+        return {location_id: self._entries[location_id].query for _, location_id in chosen}
+
+    def _forget(self, now: float):
+        """Drop locations nobody asks for any more, and the least demanded beyond max_tracked"""
+        idle = [
+            location_id for location_id, entry in self._entries.items()
+            if entry.floor == 0 and self.demand(entry, now) < _FORGET_DEMAND
+        ]
+        for location_id in idle:
+            del self._entries[location_id]
+        excess = len(self._entries) - self.max_tracked
+        if excess > 0:
+            for _, location_id in heapq.nsmallest(
+                excess, ((self.demand(entry, now), location_id) for location_id, entry in self._entries.items())
+            ):
+                del self._entries[location_id]
+
+    def stats(self, now: Optional[float] = None, top: int = 10) -> Dict[str, Any]:
+        """Get planner counters and the highest-scoring locations"""
+        now = time.time() if now is None else now
+        ranked = heapq.nlargest(
+            top, ((self.score(entry, now), location_id, entry) for location_id, entry in self._entries.items()),
+            key=lambda item: item[0]
+        )
+        return {
+            **self._counters,
+            "tracked": len(self._entries),
+            "tokens": round(self._tokens, 2),
+            "budget_per_minute": self.budget_per_minute,
+            "budget_share": 1.0 if self.partition is None else round(self.partition.share(), 3),
+            "requests_per_refresh": self.requests_per_refresh,
+            "top": [
+                {
+                    "location_id": location_id,
+                    "query": entry.query,
+                    "score": round(score, 1),
+                    "demand": round(self.demand(entry, now), 3),
+                    "age_seconds": None if entry.observed_at is None else round(now - entry.observed_at, 1),
+                }
+                for score, location_id, entry in ranked
+            ],
+        }
+
+
+class RefreshScheduler:
+    """
+    Runs a RefreshPlanner on the event loop: every tick, refreshes the
+    locations it picks concurrently
+
+    Args:
+        planner: Planner to take locations from
+        refresh: Coroutine function refreshing one location by query; it is
+            expected to report the new observation to the planner
+        tick: Seconds between planning rounds
+    """
+
+    def __init__(
+        self,
+        planner: RefreshPlanner,
+        refresh: Callable[[str], Awaitable[Any]],
+        tick: float = REFRESH_TICK_SECONDS
+    ):
+        self.planner = planner
+        self.refresh = refresh
+        self.tick = tick
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+    def start(self):
+        """Start ticking on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop ticking and cancel refreshes in flight"""
+        tasks = [task for task in (self._task, *self._inflight) if task is not None]
+        self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            for location_id, query in self.planner.take(time.time()).items():
+                task = asyncio.create_task(self._refresh(location_id, query))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+            await asyncio.sleep(self.tick)
+
+    async def _refresh(self, location_id: str, query: str):
+        start = time.perf_counter()
+        outcome = "failure"
+        try:
+            await self.refresh(query)
+            outcome = "success"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            self.planner.record_failure(location_id, time.time())
+            print(f"✗ Refresh failed for {query}: {e}")
+        finally:
+            SCHEDULER_JOB_LATENCY.labels("refresh", outcome).observe(time.perf_counter() - start)
+            if outcome != "cancelled":
+                SCHEDULER_CITIES.labels(outcome).inc()
+
+
+# Shared planner fed by /api/weather traffic
+refresh_planner = RefreshPlanner()
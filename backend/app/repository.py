@@ -0,0 +1,175 @@
+"""
+Async data access for stored weather
+Reads go through Motor, so API requests wait on MongoDB without holding one
+of the application's worker threads. Connection errors mark the database
+unavailable until the next health probe succeeds.
+"""
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from contextlib import nullcontext
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.database import WEATHER_PROJECTION, DatabaseHealth, db_health, get_async_db
+from app.executor import ConcurrencyLimiter, db_read_limiter
+from app.metrics import MONGO_LATENCY, stage
+from app.rollups import ROLLUP_COLLECTIONS, rollup_filter, rollup_point
+from app.forecast import FORECAST_COLLECTION
+
+T = TypeVar("T")
+
+# Position of an observation in history order: (timestamp, _id)
+HistoryKey = Tuple[datetime, ObjectId]
+
+# Newest first; _id breaks ties between observations with the same timestamp
+HISTORY_SORT = [("timestamp", -1), ("_id", -1)]
+HISTORY_PROJECTION = {**WEATHER_PROJECTION, "_id": 1}
+
+# Smallest ObjectId: a cursor without one pages strictly before its timestamp
+_MIN_OBJECT_ID = ObjectId("0" * 24)
+
+
+def encode_history_cursor(doc: Dict[str, Any]) -> str:
+    """Keyset cursor pointing after an observation (``<ISO timestamp>_<_id>``)"""
+    return f"{doc['timestamp'].isoformat()}_{doc['_id']}"
+
+
+def parse_history_cursor(cursor: str) -> HistoryKey:
+    """
+    Parse a cursor from encode_history_cursor
+
+    A bare ISO timestamp (the cursor format before ties were broken by _id)
+    is accepted and pages strictly before that timestamp.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    timestamp, _, object_id = cursor.partition("_")
+    try:
+        return datetime.fromisoformat(timestamp), ObjectId(object_id) if object_id else _MIN_OBJECT_ID
+    except InvalidId as e:
+        raise ValueError(str(e)) from e
+
+
+def history_filter(location_id: str, since: datetime, before: Optional[HistoryKey] = None) -> Dict[str, Any]:
+    """Mongo filter for a location's observations from ``since`` (and after ``before`` in history order)"""
+    query: Dict[str, Any] = {"location_id": location_id, "timestamp": {"$gte": since}}
+    if before is not None:
+        timestamp, object_id = before
+        query["timestamp"]["$lte"] = timestamp
+        query["$or"] = [{"timestamp": {"$lt": timestamp}}, {"_id": {"$lt": object_id}}]
+    return query
+
+
+class WeatherRepository:
+    """
+    Reads of observations and rollups
+
+    Args:
+        health: Database health, probed by ``available()`` and updated on errors
+        limiter: Optional bound on concurrent reads (raises ExecutorSaturated when full)
+        database: Returns the Motor database to query
+    """
+
+    def __init__(
+        self,
+        health: DatabaseHealth = db_health,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        database: Callable[[], AsyncIOMotorDatabase] = get_async_db
+    ):
+        self.health = health
+        self.limiter = limiter
+        self._database = database
+
+    async def available(self) -> bool:
+        """Whether the database is usable (probes it if it was down and a probe is due)"""
+        return await self.health.check_async()
+
+    async def _run(self, operation: str, query: Callable[[AsyncIOMotorDatabase], Awaitable[T]]) -> T:
+        async with self.limiter.slot() if self.limiter else nullcontext():
+            try:
+                with stage(f"mongo.{operation}", MONGO_LATENCY, operation=operation):
+                    return await query(self._database())
+            except Exception as e:
+                self.health.record_error(e)
+                raise
+
+    async def latest(self, location_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Most recent observation for a location
+
+        Args:
+            location_id: Location ID (see app.locations)
+
+        Returns:
+            Projected observation document, or None if nothing is stored
+        """
+        return await self._run("find_latest", lambda db: db.weather_data.find_one(
+            {"location_id": location_id},
+            WEATHER_PROJECTION,
+            sort=[("timestamp", -1)]
+        ))
+
+    async def history(
+        self,
+        location_id: str,
+        since: datetime,
+        before: Optional[HistoryKey] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Observations for a location, newest first (served by the location/timestamp index)
+
+        Args:
+            location_id: Location ID
+            since: Earliest timestamp to include
+            before: Only include observations after this (timestamp, _id) in history order
+            limit: Maximum number of observations (all if omitted)
+
+        Returns:
+            Projected observation documents, with _id for encode_history_cursor
+        """
+        return await self._run("history", lambda db: db.weather_data.find(
+            history_filter(location_id, since, before),
+            HISTORY_PROJECTION,
+            sort=HISTORY_SORT,
+            limit=limit or 0
+        ).to_list(None))
+
+    async def rollups(self, location_id: str, since: datetime, resolution: str) -> List[Dict[str, Any]]:
+        """
+        Rollup points for a location, newest first
+
+        Args:
+            location_id: Location ID
+            since: Earliest time to include
+            resolution: "hour" or "day"
+
+        Returns:
+            List of dicts with timestamp (bucket start), samples and
+            min/max/mean per field
+        """
+        docs = await self._run("rollups", lambda db: db[ROLLUP_COLLECTIONS[resolution]].find(
+            rollup_filter(location_id, since, resolution),
+            {"_id": 0},
+            sort=[("bucket", -1)]
+        ).to_list(None))
+        return [rollup_point(doc) for doc in docs]
+
+    async def forecast(self, location_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Latest stored forecast for a location
+
+        Args:
+            location_id: Location ID
+
+        Returns:
+            Document with location_id, city, issued_at and the columnar
+            daily/hourly series, or None if no forecast is stored
+        """
+        return await self._run("find_forecast", lambda db: db[FORECAST_COLLECTION].find_one(
+            {"location_id": location_id}, {"_id": 0}
+        ))
+
+
+weather_repository = WeatherRepository(limiter=db_read_limiter)
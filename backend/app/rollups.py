@@ -0,0 +1,165 @@
+"""
+Time-bucketed rollups of weather observations
+Maintains hourly and daily min/max/sum/count aggregates per location so
+long history ranges can be served without scanning raw observations
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.database import Database
+from app.metrics import MONGO_LATENCY, stage
+
+# Aggregated observation fields
+ROLLUP_FIELDS = ["temperature", "humidity", "wind_speed", "aqi"]
+
+# Resolution name -> collection name
+ROLLUP_COLLECTIONS = {
+    "hour": "weather_rollups_hour",
+    "day": "weather_rollups_day",
+}
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Truncate a timestamp to the start of its hour or day bucket"""
+    if resolution == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+def ensure_rollup_indexes(db: Database):
+    """
+    Create the unique (location_id, bucket) index on every rollup collection
+    Rollups keyed by city (before location IDs) are dropped; rebuild them with
+    ``python -m app.locations``
+    """
+    for collection_name in ROLLUP_COLLECTIONS.values():
+        collection = db[collection_name]
+        if "city_bucket" in collection.index_information():
+            collection.drop_index("city_bucket")
+            collection.delete_many({"location_id": {"$exists": False}})
+            print(f"⚠️  Dropped city-keyed rollups in {collection_name}; run python -m app.locations to rebuild")
+        collection.create_index(
+            [("location_id", ASCENDING), ("bucket", DESCENDING)], name="location_bucket", unique=True
+        )
+
+
+def _aggregate(docs: Iterable[Dict[str, Any]], resolution: str) -> Dict[tuple, Dict[str, Dict[str, float]]]:
+    """Combine observations into per-(location, bucket) partial aggregates"""
+    buckets: Dict[tuple, Dict[str, Dict[str, float]]] = defaultdict(dict)
+    for doc in docs:
+        partial = buckets[(doc["location_id"], bucket_start(doc["timestamp"], resolution))]
+        for field in ROLLUP_FIELDS:
+            value = doc.get(field)
+            if value is None:
+                continue
+            stats = partial.get(field)
+            if stats is None:
+                partial[field] = {"min": value, "max": value, "sum": value, "count": 1}
+            else:
+                stats["min"] = min(stats["min"], value)
+                stats["max"] = max(stats["max"], value)
+                stats["sum"] += value
+                stats["count"] += 1
+        partial.setdefault("_samples", {"count": 0})["count"] += 1
+        partial["_city"] = doc["city"]
+    return buckets
+
+
+def apply_rollups(db: Database, docs: List[Dict[str, Any]]):
+    """
+    Fold newly inserted observations into the hourly and daily rollups
+    Observations are pre-aggregated per bucket so each bucket costs one upsert
+    """
+    if not docs:
+        return
+    for resolution, collection_name in ROLLUP_COLLECTIONS.items():
+        operations = []
+        for (location_id, bucket), partial in _aggregate(docs, resolution).items():
+            update: Dict[str, Dict[str, Any]] = {
+                "$set": {"city": partial.pop("_city")},
+                "$min": {}, "$max": {}, "$inc": {"samples": partial.pop("_samples")["count"]}
+            }
+            for field, stats in partial.items():
+                update["$min"][f"{field}.min"] = stats["min"]
+                update["$max"][f"{field}.max"] = stats["max"]
+                update["$inc"][f"{field}.sum"] = stats["sum"]
+                update["$inc"][f"{field}.count"] = stats["count"]
+            update = {op: fields for op, fields in update.items() if fields}
+            operations.append(UpdateOne({"location_id": location_id, "bucket": bucket}, update, upsert=True))
+        with stage("mongo.rollup_upsert", MONGO_LATENCY, operation="rollup_upsert"):
+            db[collection_name].bulk_write(operations, ordered=False)
+
+
+def rebuild_rollups(db: Database, location_id: Optional[str] = None):
+    """
+    Recompute rollups from raw observations (e.g. after enabling rollups on
+    an existing database)
+
+    Args:
+        db: Database
+        location_id: Only rebuild this location; all locations if omitted
+    """
+    match = {"location_id": location_id} if location_id else {"location_id": {"$exists": True}}
+    for resolution, collection_name in ROLLUP_COLLECTIONS.items():
+        db[collection_name].delete_many(match)
+        group: Dict[str, Any] = {
+            "_id": {
+                "location_id": "$location_id",
+                "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": resolution}},
+            },
+            "city": {"$last": "$city"},
+            "samples": {"$sum": 1},
+        }
+        project: Dict[str, Any] = {
+            "_id": 0, "location_id": "$_id.location_id", "bucket": "$_id.bucket", "city": 1, "samples": 1
+        }
+        for field in ROLLUP_FIELDS:
+            group[f"{field}_min"] = {"$min": f"${field}"}
+            group[f"{field}_max"] = {"$max": f"${field}"}
+            group[f"{field}_sum"] = {"$sum": f"${field}"}
+            group[f"{field}_count"] = {"$sum": {"$cond": [{"$isNumber": f"${field}"}, 1, 0]}}
+            project[field] = {
+                "min": f"${field}_min", "max": f"${field}_max",
+                "sum": f"${field}_sum", "count": f"${field}_count",
+            }
+        db.weather_data.aggregate([
+            {"$match": match},
+            {"$group": group},
+            {"$project": project},
+            {"$merge": {"into": collection_name, "on": ["location_id", "bucket"], "whenMatched": "replace"}},
+        ])
+
+
+def _field_summary(stats: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+    if not stats or not stats.get("count"):
+        return None
+    return {
+        "min": stats["min"],
+        "max": stats["max"],
+        "mean": round(stats["sum"] / stats["count"], 2),
+    }
+
+
+def rollup_filter(location_id: str, since: datetime, resolution: str) -> Dict[str, Any]:
+    """Mongo filter for a location's rollup buckets starting at or after ``since``"""
+    return {"location_id": location_id, "bucket": {"$gte": bucket_start(since, resolution)}}
+
+
+def rollup_point(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """API representation of a stored rollup bucket"""
+    return {
+        "timestamp": doc["bucket"],
+        "samples": doc.get("samples", 0),
+        **{field: _field_summary(doc.get(field)) for field in ROLLUP_FIELDS},
+    }
+
+
+if __name__ == "__main__":
+    # Backfill rollups from existing raw observations: python -m app.rollups
+    from app.database import get_db
+
+    rebuild_rollups(get_db())
+    print("✓ Rollups rebuilt from raw observations")
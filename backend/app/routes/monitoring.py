@@ -0,0 +1,158 @@
+"""
+Monitoring API routes
+"""
+from fastapi import APIRouter
+from app.scraper import async_scraper
+from app.locations import locations
+from app.refresh import refresh_planner
+from app.scheduler import refresh_shards, scheduler_leases
+from app.services import weather_writer, weather_spool
+from app.executor import db_executor, db_read_limiter, scrape_limiter
+from app.database import (
+    db_health, MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE, MONGODB_READ_PREFERENCE,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS, MONGODB_SOCKET_TIMEOUT_MS, MONGODB_WAIT_QUEUE_TIMEOUT_MS
+)
+
+router = APIRouter()
+
+@router.get("/monitoring/providers")
+async def get_provider_stats():
+    """
+    Get per-provider call counts and latency percentiles
+    
+    Returns:
+        Stats for every upstream provider the scraper has called,
+        the current provider order per kind, and the AQI latency budget
+    """
+    return {
+        "aqi_budget_seconds": async_scraper.aqi_budget,
+        "aqi_hedge_seconds": async_scraper.aqi_hedge_delay,
+        "providers": async_scraper.stats.snapshot(),
+        "order": async_scraper.providers.snapshot()
+    }
+
+@router.get("/monitoring/breakers")
+async def get_breaker_states():
+    """
+    Get upstream circuit breaker states
+    
+    Returns:
+        State, consecutive failures and transition counts per upstream host,
+        plus the timeout currently applied to each provider
+    """
+    return async_scraper.health.snapshot()
+
+@router.get("/monitoring/cache")
+async def get_cache_stats():
+    """
+    Get response cache counters
+    
+    Returns:
+        Hit/miss/coalesced/eviction counters, entry count and TTLs
+    """
+    return async_scraper.cache.stats()
+
+@router.get("/monitoring/http-cache")
+async def get_http_cache_stats():
+    """
+    Get upstream HTTP cache counters
+    
+    Returns:
+        Fresh hits, revalidations (304s) and misses, bytes downloaded and
+        saved, hit and revalidation rates, and size on disk
+    """
+    return async_scraper.http_cache.stats()
+
+@router.get("/monitoring/locations")
+async def get_location_stats():
+    """
+    Get location resolution counters
+    
+    Returns:
+        Name lookups resolved from the cache vs not yet resolved, coordinate
+        lookups, learned and evicted entries, and the grid size
+    """
+    return locations.stats()
+
+@router.get("/monitoring/refresh")
+async def get_refresh_stats():
+    """
+    Get refresh scheduler state
+    
+    Returns:
+        Requests counted, refreshes and failures, budget and remaining
+        tokens, and the highest-scoring (demand x staleness) locations
+    """
+    return refresh_planner.stats()
+
+@router.get("/monitoring/leases")
+async def get_lease_stats():
+    """
+    Get this process's scheduler leases
+    
+    Returns:
+        Worker ID, held leases and acquire/takeover/renewal counters, plus
+        the refresh shards this process owns out of how many, and the
+        number of live workers sharing them
+    """
+    return {
+        **scheduler_leases.stats(),
+        "refresh": refresh_shards.stats() if refresh_shards is not None else None
+    }
+
+@router.get("/monitoring/writer")
+async def get_writer_stats():
+    """
+    Get buffered database writer counters
+    
+    Returns:
+        Flush/insert/failure counts, pending documents and flush latencies
+    """
+    return weather_writer.stats()
+
+@router.get("/monitoring/spool")
+async def get_spool_stats():
+    """
+    Get write-ahead spool state
+    
+    Returns:
+        Documents waiting for replay, segment count and size on disk, and
+        appended/duplicate/dropped/replayed counters
+    """
+    return weather_spool.stats()
+
+@router.get("/monitoring/executors")
+async def get_executor_stats():
+    """
+    Get bounded executor load
+    
+    Returns:
+        Admitted/rejected counts and current in-flight and queued calls
+        for the database pool, the database read limiter and the scrape limiter
+    """
+    return {
+        "db": db_executor.stats(),
+        "db_read": db_read_limiter.stats(),
+        "scrape": scrape_limiter.stats()
+    }
+
+@router.get("/monitoring/database")
+async def get_database_health():
+    """
+    Get MongoDB availability and connection settings
+    
+    Returns:
+        Health probe state (availability, last error, probe/failure/recovery
+        counts) and the configured pool, timeouts and read preference
+    """
+    return {
+        "health": db_health.snapshot(),
+        "settings": {
+            "max_pool_size": MONGODB_MAX_POOL_SIZE,
+            "min_pool_size": MONGODB_MIN_POOL_SIZE,
+            "server_selection_timeout_ms": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            "socket_timeout_ms": MONGODB_SOCKET_TIMEOUT_MS,
+            "wait_queue_timeout_ms": MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            "read_preference": MONGODB_READ_PREFERENCE,
+        }
+    }
@@ -1,54 +1,230 @@
 """
 Weather API routes
 """
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
-from app.services import get_current_weather, get_weather_history
-from app.models import WeatherResponse, HistoricalWeatherResponse
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Literal, Optional, Tuple, Union
+import asyncio
+import contextlib
+import json
+from pymongo.errors import PyMongoError
+from app.services import (
+    get_current_weather, get_current_weather_swr, get_weather_history, get_weather_rollups,
+    get_weather_forecast, iter_weather_history, record_demand, WEATHER_FRESHNESS_MODE
+)
+from app.export import EXPORT_MEDIA_TYPES, EXPORT_SERIALIZERS, parquet_available
+from app.database import db_health
+from app.executor import ExecutorSaturated, db_executor
+from app.locations import locations, parse_coordinates
+from app.repository import encode_history_cursor, parse_history_cursor
+from app.serialization import (
+    ARROW_STREAM_MEDIA_TYPE, arrow_available, dumps, history_arrow, history_columnar, history_json
+)
+from app.models import (
+    CurrentWeatherResponse, HistoricalWeatherResponse, HistoricalColumnarResponse, HistoricalRollupResponse,
+    BatchWeatherRequest, ForecastResponse
+)
 
 router = APIRouter()
 
-@router.get("/weather", response_model=WeatherResponse)
-async def get_weather(city: str = Query(..., description="City name")):
+# Longest ranges served from raw observations and from rollups
+MAX_RAW_HISTORY_DAYS = 30
+MAX_ROLLUP_HISTORY_DAYS = 365
+
+# Largest page of raw history
+MAX_HISTORY_PAGE_SIZE = 1000
+
+# Most cities accepted by one batch request
+MAX_BATCH_CITIES = 50
+
+# Days in the wttr.in forecast
+MAX_FORECAST_DAYS = 3
+
+@router.get("/weather", response_model=CurrentWeatherResponse)
+async def get_weather(
+    city: str = Query(..., description="City name"),
+    mode: Literal["fresh", "swr"] = Query(
+        WEATHER_FRESHNESS_MODE,
+        description="fresh: scrape (or use the short-lived response cache); "
+                    "swr: serve stored data immediately and refresh it in the background when stale"
+    )
+):
     """
     Get current weather for a city
     
     Args:
         city: City name to get weather for
+        mode: Freshness policy ("fresh" or "swr")
         
     Returns:
-        Current weather data
+        Current weather data, with its age and whether a refresh was triggered
         
     Raises:
-        HTTPException: If city is invalid or scraping fails
+        HTTPException: If city is invalid or scraping fails, or 503 with
+            Retry-After if the server is saturated
     """
     try:
         if not city or not city.strip():
             raise HTTPException(status_code=400, detail="City name is required")
         
-        weather = get_current_weather(city.strip(), fetch_fresh=True)
+        if mode == "swr":
+            weather = await get_current_weather_swr(city.strip())
+        else:
+            weather = await get_current_weather(city.strip(), fetch_fresh=True)
+        record_demand(city.strip(), weather)
         return weather
         
+    except HTTPException:
+        raise
+    except ExecutorSaturated as e:
+        raise _busy(e)
     except Exception as e:
-        error_message = str(e)
-        if "not found" in error_message.lower() or "invalid" in error_message.lower():
-            raise HTTPException(status_code=404, detail=f"City '{city}' not found")
-        elif "network" in error_message.lower() or "connection" in error_message.lower():
-            raise HTTPException(status_code=503, detail="Weather service unavailable. Please try again later.")
-        else:
-            raise HTTPException(status_code=500, detail=f"Error fetching weather: {error_message}")
+        status_code, detail = _weather_error(city, e)
+        raise HTTPException(status_code=status_code, detail=detail)
+
+def _weather_error(city: str, error: Exception) -> Tuple[int, str]:
+    """Map a weather fetch failure to an HTTP status code and message"""
+    error_message = str(error)
+    if isinstance(error, ExecutorSaturated):
+        return 503, "Server busy. Please try again later."
+    elif "not found" in error_message.lower() or "invalid" in error_message.lower():
+        return 404, f"City '{city}' not found"
+    elif "network" in error_message.lower() or "connection" in error_message.lower():
+        return 503, "Weather service unavailable. Please try again later."
+    else:
+        return 500, f"Error fetching weather: {error_message}"
 
-@router.get("/weather/history", response_model=HistoricalWeatherResponse)
+def _busy(error: ExecutorSaturated) -> HTTPException:
+    """503 response asking the client to retry after the executor's backoff"""
+    return HTTPException(
+        status_code=503,
+        detail="Server busy. Please try again later.",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def _database_unavailable() -> HTTPException:
+    """503 response asking the client to retry once the database may be back"""
+    return HTTPException(
+        status_code=503,
+        detail="Database unavailable. Please try again later.",
+        headers={"Retry-After": str(max(1, round(db_health.retry_seconds)))}
+    )
+
+async def _executor_chunks(first: Optional[bytes], chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Yield a blocking chunk iterator, advancing it on the database executor"""
+    try:
+        chunk = first
+        while chunk is not None:
+            yield chunk
+            chunk = await db_executor.run(next, chunks, None)
+    finally:
+        # Also closes the database cursor; if a chunk is still being read on
+        # the executor (client gone mid-read), garbage collection closes it
+        with contextlib.suppress(ValueError):
+            chunks.close()
+
+async def _batch_results(cities: List[str]) -> AsyncIterator[bytes]:
+    """Resolve cities concurrently and yield one NDJSON line per city as each completes"""
+    async def resolve(city: str) -> Dict[str, Any]:
+        try:
+            weather = await get_current_weather(city, fetch_fresh=True)
+            record_demand(city, weather)
+            return {"city": city, "status": 200, "weather": weather.model_dump(mode="json")}
+        except Exception as e:
+            status_code, detail = _weather_error(city, e)
+            return {"city": city, "status": status_code, "error": detail}
+    
+    tasks = [asyncio.ensure_future(resolve(city)) for city in cities]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield (json.dumps(await next_result) + "\n").encode()
+    finally:
+        # Client disconnected: stop fetching the remaining cities
+        for task in tasks:
+            task.cancel()
+
+def _parse_batch_cities(cities: List[str]) -> List[str]:
+    """
+    Split, trim and de-duplicate requested cities (by location ID), keeping order
+    An entry that is a single "lat,lon" pair is kept whole
+    """
+    seen = set()
+    result = []
+    for entry in cities:
+        for city in [entry] if parse_coordinates(entry) else entry.split(","):
+            city = city.strip()
+            if not city:
+                continue
+            location_id = locations.resolve(city).id
+            if location_id not in seen:
+                seen.add(location_id)
+                result.append(city)
+    if not result:
+        raise HTTPException(status_code=400, detail="At least one city is required")
+    if len(result) > MAX_BATCH_CITIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CITIES} cities per batch")
+    return result
+
+@router.get("/weather/batch")
+async def get_weather_batch(cities: str = Query(..., description="Comma-separated city names")):
+    """
+    Get current weather for several cities at once
+    
+    Cities are resolved concurrently (sharing the response cache) and the
+    response is streamed as NDJSON, one line per city in completion order:
+    ``{"city", "status": 200, "weather": {...}}`` or ``{"city", "status", "error"}``
+    
+    Args:
+        cities: Comma-separated city names
+        
+    Returns:
+        Streaming NDJSON response
+    """
+    return StreamingResponse(_batch_results(_parse_batch_cities([cities])), media_type="application/x-ndjson")
+
+@router.post("/weather/batch")
+async def post_weather_batch(request: BatchWeatherRequest):
+    """
+    Get current weather for several cities at once (cities in the request body)
+    
+    Same streaming NDJSON response as GET /weather/batch
+    """
+    return StreamingResponse(_batch_results(_parse_batch_cities(request.cities)), media_type="application/x-ndjson")
+
+@router.get(
+    "/weather/history",
+    response_model=Union[HistoricalWeatherResponse, HistoricalColumnarResponse, HistoricalRollupResponse],
+    responses={200: {"content": {ARROW_STREAM_MEDIA_TYPE: {}}}}
+)
 async def get_weather_history_endpoint(
     city: str = Query(..., description="City name"),
-    days: int = Query(7, ge=1, le=30, description="Number of days of history")
+    days: int = Query(7, ge=1, le=MAX_ROLLUP_HISTORY_DAYS, description="Number of days of history"),
+    resolution: Optional[Literal["hour", "day"]] = Query(
+        None, description="Serve hourly or daily aggregates instead of raw observations"
+    ),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_HISTORY_PAGE_SIZE, description="Page size for raw history"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    format: Literal["json", "columnar", "arrow"] = Query(
+        "json", description="Raw history as row objects, one list per field, or an Arrow IPC stream"
+    )
 ):
     """
     Get historical weather data for a city
     
+    Raw history can be requested in a compact form for charts:
+    format=columnar returns one list per field with delta-encoded
+    timestamps and dictionary-encoded condition/aqi_level, and format=arrow
+    the same columns as an Arrow IPC stream (requires pyarrow). Paging works
+    the same way; with arrow the next cursor is in the X-Next-Cursor header.
+    
     Args:
         city: City name to get history for
-        days: Number of days of history (1-30)
+        days: Number of days of history (1-30 for raw data, up to 365 with a resolution)
+        resolution: Optional "hour" or "day" to get min/max/mean aggregates
+        limit: Optional page size; raw history is then paged by timestamp
+        cursor: Keyset cursor returned as next_cursor by the previous page
+        format: json, columnar or arrow (raw history only)
         
     Returns:
         Historical weather data
@@ -57,13 +233,139 @@ async def get_weather_history_endpoint(
         if not city or not city.strip():
             raise HTTPException(status_code=400, detail="City name is required")
         
-        history = get_weather_history(city.strip(), days=days)
+        if resolution is not None and format != "json":
+            raise HTTPException(status_code=400, detail="format is only supported for raw history")
+        if format == "arrow" and not arrow_available():
+            raise HTTPException(status_code=400, detail="Arrow responses are not available on this server")
+        
+        if resolution is not None:
+            points = await get_weather_rollups(city.strip(), days, resolution)
+            return HistoricalRollupResponse(
+                city=locations.resolve(city).name,
+                resolution=resolution,
+                data=points
+            )
+        
+        if days > MAX_RAW_HISTORY_DAYS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Raw history is limited to {MAX_RAW_HISTORY_DAYS} days; use resolution=hour or resolution=day"
+            )
+        
+        try:
+            before = parse_history_cursor(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
         
-        return HistoricalWeatherResponse(
-            city=city.title(),
-            data=history
-        )
+        history = await get_weather_history(city.strip(), days=days, limit=limit, before=before)
+        location = locations.resolve(city)
+        next_cursor = encode_history_cursor(history[-1]) if limit and len(history) == limit else None
         
+        # Encoded straight from the projected rows; response_model only documents the schema
+        if format == "arrow":
+            headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+            return Response(history_arrow(history), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
+        if format == "columnar":
+            return Response(
+                dumps(history_columnar(location.name, location.id, history, next_cursor=next_cursor)),
+                media_type="application/json"
+            )
+        return Response(history_json(location.name, history, next_cursor=next_cursor), media_type="application/json")
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturated as e:
+        raise _busy(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching weather history: {str(e)}")
 
+@router.get("/weather/forecast", response_model=ForecastResponse)
+async def get_weather_forecast_endpoint(
+    city: str = Query(..., description="City name"),
+    days: int = Query(MAX_FORECAST_DAYS, ge=1, le=MAX_FORECAST_DAYS, description="Number of forecast days")
+):
+    """
+    Get the forecast for a city
+    
+    Served from the forecast stored with the city's latest scrape, so it
+    never triggers an upstream request. Series are columnar: one list per
+    field, aligned by index.
+    
+    Args:
+        city: City name to get the forecast for
+        days: Number of forecast days (1-3)
+        
+    Returns:
+        Daily and 3-hourly forecast series with the time they were fetched
+        
+    Raises:
+        HTTPException: 404 if no forecast is stored for the city, or 503
+            with Retry-After if the server is saturated
+    """
+    try:
+        if not city or not city.strip():
+            raise HTTPException(status_code=400, detail="City name is required")
+        
+        forecast = await get_weather_forecast(city.strip(), days)
+        if forecast is None:
+            raise HTTPException(status_code=404, detail=f"No forecast stored for '{city.strip()}'")
+        
+        age = (datetime.utcnow() - forecast["issued_at"]).total_seconds()
+        return ForecastResponse(**forecast, age_seconds=max(age, 0.0))
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturated as e:
+        raise _busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching forecast: {str(e)}")
+
+@router.get("/weather/export")
+async def export_weather_history(
+    city: str = Query(..., description="City name"),
+    days: int = Query(30, ge=1, le=MAX_ROLLUP_HISTORY_DAYS, description="Number of days of history"),
+    format: Literal["csv", "ndjson", "parquet"] = Query("csv", description="Export format")
+):
+    """
+    Export historical weather data for a city as a file download
+    
+    Rows are streamed from the database cursor, oldest first, so large
+    ranges are never held in memory. Reading and serializing run on the
+    bounded database executor; the first chunk is read before the response
+    starts, so an unreachable database or a saturated executor is a 503
+    rather than an empty file.
+    
+    Args:
+        city: City name to export
+        days: Number of days of history (1-365)
+        format: csv, ndjson or parquet (parquet requires pyarrow)
+        
+    Returns:
+        Streaming file response
+        
+    Raises:
+        HTTPException: 503 with Retry-After if the database is unavailable
+            or the server is saturated
+    """
+    if not city or not city.strip():
+        raise HTTPException(status_code=400, detail="City name is required")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export is not available on this server")
+    if not await db_health.check_async():
+        raise _database_unavailable()
+    
+    chunks = EXPORT_SERIALIZERS[format](iter_weather_history(city.strip(), days))
+    try:
+        first = await db_executor.run(next, chunks, None)
+    except ExecutorSaturated as e:
+        chunks.close()
+        raise _busy(e)
+    except PyMongoError:
+        raise _database_unavailable()
+    
+    filename = f"weather_{city.strip().title().replace(' ', '_')}_{days}d.{format}"
+    return StreamingResponse(
+        _executor_chunks(first, chunks),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,10 +1,29 @@
 """
-Scheduled tasks for daily weather scraping
+Scheduled weather scraping
+By default locations are refreshed continuously by demand and staleness
+(see app.refresh) within REFRESH_BUDGET_PER_MINUTE upstream requests; with
+a budget of 0 the configured cities are scraped once a day instead.
+
+Every process (uvicorn worker or replica) runs the scheduler, so the work
+is split into SCHEDULER_SHARDS shards claimed through MongoDB leases (see
+app.leases): each process refreshes only the locations in its shards, with
+its share of the budget, and each shard of the daily scrape runs once.
 """
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from app.services import scrape_and_save_weather
+from app.batch import scrape_cities, format_summary
+from app.services import save_weather_data, weather_writer, refresh_weather
+from app.metrics import SCHEDULER_CITIES, SCHEDULER_JOB_LATENCY
+from app.database import get_db
+from app.leases import (
+    LEASE_HEARTBEAT_SECONDS, SCHEDULER_SHARDS, LeaseTable, ShardOwnership, run_sharded_cycle, shard_of
+)
+from app.locations import locations, normalize_name
+from app.refresh import REFRESH_BUDGET_PER_MINUTE, RefreshScheduler, refresh_planner
+from datetime import datetime
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,24 +32,75 @@ load_dotenv()
 DEFAULT_CITIES = ["Delhi", "Mumbai", "Bangalore", "Kolkata", "Chennai"]
 
 scheduler = BackgroundScheduler()
+refresh_scheduler = RefreshScheduler(refresh_planner, refresh_weather)
+scheduler_leases = LeaseTable(get_db)
+refresh_shards = ShardOwnership(scheduler_leases, "refresh", SCHEDULER_SHARDS) if SCHEDULER_SHARDS > 0 else None
+
+def configured_cities():
+    return os.getenv("SCRAPE_CITIES", ",".join(DEFAULT_CITIES)).split(",")
+
+def scrape_batch(cities, label="Daily weather scrape"):
+    """Scrape and store a list of cities, recording scheduler metrics"""
+    start = time.perf_counter()
+    outcome = "failure"
+    try:
+        # Runs in the scheduler's worker thread, so it gets its own event loop
+        summary = asyncio.run(scrape_cities(cities, save=save_weather_data))
+        weather_writer.flush()
+        outcome = "success"
+    finally:
+        SCHEDULER_JOB_LATENCY.labels("daily_weather_scrape", outcome).observe(time.perf_counter() - start)
+    SCHEDULER_CITIES.labels("success").inc(summary["successes"])
+    SCHEDULER_CITIES.labels("failure").inc(summary["failures"])
+
+    for city, error in summary["failed_cities"].items():
+        print(f"✗ Failed to scrape weather for {city}: {error}")
+    print(f"✓ {label} finished: {format_summary(summary)}")
+    return summary
 
 def daily_weather_scrape():
-    """Scheduled task to scrape weather for default cities"""
+    """Scheduled task to scrape weather for default cities (this process's claimed shards of them)"""
     print("Running daily weather scrape...")
-    cities = os.getenv("SCRAPE_CITIES", ",".join(DEFAULT_CITIES)).split(",")
-    
+    cities = [city for city in configured_cities() if city.strip()]
+    if SCHEDULER_SHARDS <= 0:
+        return scrape_batch(cities)
+
+    # Shard by name (not location ID) so every process splits the list the same way
+    by_shard = {}
     for city in cities:
-        city = city.strip()
-        if city:
-            print(f"Scraping weather for {city}...")
-            success = scrape_and_save_weather(city)
-            if success:
-                print(f"✓ Successfully scraped weather for {city}")
-            else:
-                print(f"✗ Failed to scrape weather for {city}")
+        by_shard.setdefault(shard_of(normalize_name(city), SCHEDULER_SHARDS), []).append(city)
+    ran = []
+
+    def scrape_shard(shard):
+        if shard in by_shard:
+            scrape_batch(by_shard[shard], f"Daily weather scrape shard {shard}")
+        ran.append(shard)
+
+    cycle = datetime.utcnow().strftime("%Y-%m-%d")
+    try:
+        run_sharded_cycle(scheduler_leases, "daily", cycle, SCHEDULER_SHARDS, scrape_shard)
+    except Exception as e:
+        # Lease collection unreachable: scrape the rest here rather than skip the day
+        print(f"⚠️  Scheduler leases unavailable - scraping remaining shards locally: {e}")
+        remaining = [city for shard, shard_cities in by_shard.items() if shard not in ran for city in shard_cities]
+        if remaining:
+            scrape_batch(remaining)
+    print(f"✓ Daily weather scrape {cycle} complete - {len(ran)}/{SCHEDULER_SHARDS} shards ran in this process")
 
 def start_scheduler():
-    """Start the background scheduler"""
+    """Start the refresh scheduler (or the daily scrape if the refresh budget is 0) and the lease heartbeat"""
+    if REFRESH_BUDGET_PER_MINUTE > 0:
+        if refresh_shards is not None:
+            refresh_planner.partition = refresh_shards
+            scheduler_leases.start(LEASE_HEARTBEAT_SECONDS, on_heartbeat=refresh_shards.rebalance)
+        # Configured cities are tracked with a demand floor so they are refreshed without traffic
+        refresh_planner.seed(configured_cities(), lambda city: locations.resolve(city).id)
+        refresh_scheduler.start()
+        print(f"✓ Refresh scheduler started - {REFRESH_BUDGET_PER_MINUTE:g} upstream requests/min by demand and staleness")
+        return
+
+    if SCHEDULER_SHARDS > 0:
+        scheduler_leases.start(LEASE_HEARTBEAT_SECONDS)
     # Schedule daily scrape at 6 AM UTC (adjust timezone as needed)
     scheduler.add_job(
         daily_weather_scrape,
@@ -39,7 +109,14 @@ def start_scheduler():
         name="Daily Weather Scrape",
         replace_existing=True
     )
-    
+
     scheduler.start()
     print("✓ Scheduler started - Daily weather scrape scheduled at 6 AM UTC")
 
+async def stop_scheduler():
+    """Stop the refresh scheduler and the background scheduler, then release this process's leases"""
+    await refresh_scheduler.stop()
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    if SCHEDULER_SHARDS > 0:
+        await asyncio.to_thread(scheduler_leases.stop)
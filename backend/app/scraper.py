@@ -1,248 +1,503 @@
 """
-Weather data scraper using BeautifulSoup
-Scrapes weather data from a public weather website
+Async weather data scraper
+Fetches current conditions (wttr.in JSON, with its HTML page parsed by
+app.wttr_html as a fallback) and AQI (WAQI) over one pooled httpx client,
+trying the providers registered in app.providers in runtime order
 """
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import httpx
 import os
-import re
+import time
+from contextvars import ContextVar
 from dotenv import load_dotenv
-from typing import Dict, Optional, Any
+from typing import Awaitable, Dict, List, Optional, Any
 from datetime import datetime
+from urllib.parse import urlsplit
+from app.cache import ResponseCache
+from app.forecast import parse_j1_forecast
+from app.health import CircuitOpenError, UpstreamHealth
+from app.http_cache import ACCEPT_ENCODING, HttpCache, http_cache as shared_http_cache
+from app.locations import Location, LocationResolver, area_from_j1, locations as shared_locations
+from app.metrics import PARSE_LATENCY, UPSTREAM_LATENCY, record_stage, stage
+from app.providers import AQI, WEATHER, Getter, Provider, ProviderRegistry
+from app.wttr_html import parse_wttr_html
 
 load_dotenv()
 
-class WeatherScraper:
-    """Scraper for weather data using BeautifulSoup for HTML parsing"""
-    
-    def __init__(self):
-        self.user_agent = os.getenv(
-            "SCRAPER_USER_AGENT",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+# Upstream endpoints (overridable so the scraper can be pointed at a local stub)
+WTTR_BASE_URL = os.getenv("WTTR_BASE_URL", "https://wttr.in")
+WAQI_BASE_URL = os.getenv("WAQI_BASE_URL", "https://api.waqi.info")
+
+# Connection pool settings for the async scraper
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+
+# Overall latency budget for AQI lookups in the async scraper (seconds)
+AQI_BUDGET_SECONDS = float(os.getenv("AQI_BUDGET_SECONDS", 3))
+# Start the next AQI provider if the current one hasn't answered after this long
+AQI_HEDGE_SECONDS = float(os.getenv("AQI_HEDGE_SECONDS", 0.5))
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# Set when a provider call was answered from the HTTP cache without a request
+_served_from_cache: ContextVar[bool] = ContextVar("served_from_cache", default=False)
+
+
+def aqi_level(aqi_value: float) -> str:
+    """Determine AQI level based on US AQI scale"""
+    if aqi_value <= 50:
+        return "Good"
+    elif aqi_value <= 100:
+        return "Moderate"
+    elif aqi_value <= 150:
+        return "Unhealthy for Sensitive Groups"
+    elif aqi_value <= 200:
+        return "Unhealthy"
+    elif aqi_value <= 300:
+        return "Very Unhealthy"
+    return "Hazardous"
+
+
+def _parse_aqi_value(aqi_value: Any) -> Optional[Dict[str, Any]]:
+    """Build an AQI result from a raw value, or None if the value is unusable"""
+    if isinstance(aqi_value, str):
+        # WAQI search returns station AQIs as strings ("-" when a station has no reading)
+        try:
+            aqi_value = float(aqi_value)
+        except ValueError:
+            return None
+    if aqi_value and isinstance(aqi_value, (int, float)) and aqi_value > 0:
+        return {"aqi": int(aqi_value), "level": aqi_level(aqi_value)}
+    return None
+
+
+def parse_waqi_feed(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Extract AQI from a WAQI feed response"""
+    if data.get("status") == "ok" and data.get("data"):
+        return _parse_aqi_value(data["data"].get("aqi"))
+    return None
+
+
+def parse_waqi_search(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Extract AQI from the first station of a WAQI search response"""
+    if data.get("status") == "ok" and data.get("data") and len(data["data"]) > 0:
+        return _parse_aqi_value(data["data"][0].get("aqi"))
+    return None
+
+
+def parse_json_weather(data: Dict[str, Any], city: str) -> Dict[str, Any]:
+    """
+    Extract current conditions from a wttr.in ``format=j1`` payload
+
+    Raises:
+        Exception: If the payload has no current conditions
+    """
+    current = data.get("current_condition", [{}])[0]
+
+    if not current:
+        raise Exception(f"Weather data not found for city: {city}")
+
+    return {
+        "city": city.title(),
+        "temperature": float(current.get("temp_C", 0)),
+        "humidity": float(current.get("humidity", 0)),
+        "wind_speed": float(current.get("windspeedKmph", 0)),
+        "condition": current.get("weatherDesc", [{}])[0].get("value", "Unknown"),
+    }
+
+
+def parse_html_weather(html: str, city: str) -> Dict[str, Any]:
+    """
+    Extract current conditions from a wttr.in HTML page
+    (see app.wttr_html for the extractor backends)
+
+    Raises:
+        Exception: If the page does not contain parseable weather data
+    """
+    return parse_wttr_html(html, city)
+
+
+def _locate(weather_data: Dict[str, Any], location: Location) -> Dict[str, Any]:
+    """Key parsed weather fields by the canonical location"""
+    weather_data.pop("area", None)
+    weather_data["city"] = location.name
+    weather_data["location_id"] = location.id
+    return weather_data
+
+
+class WttrJsonProvider(Provider):
+    """
+    Current conditions from the wttr.in JSON API
+    The forecast and the reported area that come in the same payload are
+    returned under "forecast" and "area"
+    """
+
+    name = "wttr_json"
+    kind = WEATHER
+    priority = 10
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.host = urlsplit(base_url).netloc
+
+    async def fetch(self, get: Getter, city: str) -> Dict[str, Any]:
+        url = f"{self.base_url}/{city.strip()}?format=j1"
+        response = await get(url, self.name, headers={"Accept": "application/json"})
+        response.raise_for_status()
+        with stage("parse.json", PARSE_LATENCY, format="json"):
+            data = response.json()
+            weather_data = parse_json_weather(data, city)
+            weather_data["area"] = area_from_j1(data)
+            forecast = parse_j1_forecast(data)
+            if forecast:
+                weather_data["forecast"] = forecast
+            return weather_data
+
+
+class WttrHtmlProvider(Provider):
+    """Current conditions parsed from the wttr.in HTML page"""
+
+    name = "wttr_html"
+    kind = WEATHER
+    priority = 20
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.host = urlsplit(base_url).netloc
+
+    async def fetch(self, get: Getter, city: str) -> Dict[str, Any]:
+        headers = {"Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"}
+        response = await get(f"{self.base_url}/{city}", self.name, headers=headers)
+        response.raise_for_status()
+        with stage("parse.html", PARSE_LATENCY, format="html"):
+            return parse_html_weather(response.text, city)
+
+
+class WaqiFeedProvider(Provider):
+    """AQI from the WAQI city feed (demo token)"""
+
+    name = "waqi_feed"
+    kind = AQI
+    priority = 10
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.host = urlsplit(base_url).netloc
+
+    async def fetch(self, get: Getter, city: str) -> Optional[Dict[str, Any]]:
+        response = await get(f"{self.base_url}/feed/{city}/?token=demo", self.name)
+        response.raise_for_status()
+        return parse_waqi_feed(response.json())
+
+
+class WaqiSearchProvider(Provider):
+    """AQI from the first station returned by WAQI search (demo token)"""
+
+    name = "waqi_search"
+    kind = AQI
+    priority = 20
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.host = urlsplit(base_url).netloc
+
+    async def fetch(self, get: Getter, city: str) -> Optional[Dict[str, Any]]:
+        response = await get(f"{self.base_url}/search/?token=demo&keyword={city}", self.name)
+        response.raise_for_status()
+        return parse_waqi_search(response.json())
+
+
+def default_providers(base_url: str, waqi_base_url: str) -> List[Provider]:
+    """The built-in weather and AQI providers"""
+    return [
+        WttrJsonProvider(base_url),
+        WttrHtmlProvider(base_url),
+        WaqiFeedProvider(waqi_base_url),
+        WaqiSearchProvider(waqi_base_url),
+    ]
+
+
+class AsyncWeatherScraper:
+    """
+    Asyncio-native weather scraper
+    All upstream calls share one keep-alive connection pool, with a cap on
+    concurrent connections per upstream host. Per-provider latencies are
+    recorded in ``stats``; ``health`` turns them into per-provider timeouts
+    and keeps a circuit breaker per upstream host, so calls to a host that
+    keeps failing are rejected immediately instead of waiting out a timeout.
+    Weather and AQI sources come from the ``providers`` registry. Requests
+    go through ``http_cache``, so responses that are still fresh are not
+    fetched again and stale ones are revalidated with conditional requests.
+    Cached conditions are keyed by location ID (see app.locations), so
+    spellings of a city and nearby coordinates share one fetch.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        waqi_base_url: Optional[str] = None,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_connections_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        aqi_budget: float = AQI_BUDGET_SECONDS,
+        cache: Optional[ResponseCache] = None,
+        aqi_hedge_delay: float = AQI_HEDGE_SECONDS,
+        http_cache: Optional[HttpCache] = None,
+        locations: Optional[LocationResolver] = None
+    ):
+        self.user_agent = os.getenv("SCRAPER_USER_AGENT", DEFAULT_USER_AGENT)
+        self.base_url = base_url or WTTR_BASE_URL
+        self.waqi_base_url = waqi_base_url or WAQI_BASE_URL
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.aqi_budget = aqi_budget
+        self.aqi_hedge_delay = aqi_hedge_delay
+        self.health = UpstreamHealth()
+        self.stats = self.health.stats
+        self.providers = ProviderRegistry(self.health)
+        for provider in default_providers(self.base_url, self.waqi_base_url):
+            self.providers.register(provider)
+        self.cache = cache if cache is not None else ResponseCache()
+        self.http_cache = http_cache if http_cache is not None else shared_http_cache
+        self.locations = locations if locations is not None else shared_locations
+        # Optional limiter with an ``async acquire(host)`` method (see app.batch.RateLimiter)
+        self.rate_limiter = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": self.user_agent, "Accept-Encoding": ACCEPT_ENCODING},
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                follow_redirects=True
+            )
+        return self._client
+
+    async def _get(self, url: str, provider: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """
+        GET a URL through the HTTP cache; requests that have to go upstream
+        are sent by ``_send``
+
+        Raises:
+            CircuitOpenError: If a request is needed and the host's breaker is open
+        """
+        response = await self.http_cache.fetch(
+            url, headers or {}, lambda request_headers: self._send(url, provider, request_headers)
         )
-        self.base_url = "https://wttr.in"
-    
-    def scrape_weather(self, city: str) -> Dict[str, Any]:
+        if response.extensions.get("http_cache") == "hit":
+            _served_from_cache.set(True)
+        return response
+
+    async def _send(self, url: str, provider: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """
+        GET a URL through the shared pool, respecting per-host connection and
+        rate limits and the host's circuit breaker
+
+        Transport errors and 5xx responses count against the breaker; other
+        responses (including 4xx for unknown cities) show the host is up.
+
+        Raises:
+            CircuitOpenError: If the host's breaker is open
+        """
+        host = urlsplit(url).netloc
+        breaker = self.health.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(
+                f"Circuit open for {host} after repeated connection failures, "
+                f"retrying in {breaker.retry_after():.0f}s"
+            )
+
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.max_connections_per_host))
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(host)
+            async with slots:
+                response = await self._get_client().get(
+                    url, headers=headers, timeout=self.health.timeout(provider)
+                )
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def close(self):
+        """Close the shared connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_slots.clear()
+
+    async def scrape_weather(self, city: str, refresh: bool = False) -> Dict[str, Any]:
         """
         Scrape weather data for a given city
-        Tries JSON API first (faster), then HTML parsing with BeautifulSoup
-        
+        Weather and AQI are fetched concurrently through the response cache;
+        the weather fetch tries the registered weather providers in order
+
         Args:
             city: City name to scrape weather for
-            
+            refresh: Fetch current conditions even if they are cached
+
         Returns:
-            Dictionary containing weather data
-            
+            Dictionary containing weather data (aqi is None if no AQI provider
+            answered within the AQI budget), keyed by the canonical location.
+            ``cached`` is True when the conditions came from the cache or from
+            another caller's fetch.
+
         Raises:
             Exception: If scraping fails or city is invalid
         """
-        # Try JSON API first (more reliable and faster)
+        location = self.locations.resolve(city)
+        key = location.id
+        aqi_task = asyncio.create_task(self.cache.get_or_fetch(
+            "aqi", key, lambda: self._get_aqi(location.query),
+            cache_if=lambda result: result.get("aqi") is not None
+        ))
         try:
-            return self._json_scrape(city)
-        except Exception as json_error:
-            # If JSON fails, try HTML parsing with BeautifulSoup
-            try:
-                return self._html_scrape(city)
-            except Exception as html_error:
-                # If both fail, raise the original JSON error
-                raise Exception(f"Failed to scrape weather for {city}. JSON error: {str(json_error)}")
-    
-    def _json_scrape(self, city: str) -> Dict[str, Any]:
-        """
-        Scrape weather using JSON API (primary method - faster and more reliable)
-        Supports both city names and coordinates (lat,lon format)
-        """
-        # Handle coordinates format (e.g., "28.6139,77.2090" or "28.6139,77.2090")
-        city_param = city.strip()
-        
-        url = f"{self.base_url}/{city_param}?format=j1"
-        headers = {
-            "User-Agent": self.user_agent,
-            "Accept": "application/json"
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)  # Increased timeout
-        response.raise_for_status()
-        
-        data = response.json()
-        current = data.get("current_condition", [{}])[0]
-        
-        if not current:
-            raise Exception(f"Weather data not found for city: {city}")
-        
-        # Try to get AQI data
-        aqi_data = self._get_aqi(city)
-        
-        weather_data = {
-            "city": city.title(),
-            "temperature": float(current.get("temp_C", 0)),
-            "humidity": float(current.get("humidity", 0)),
-            "wind_speed": float(current.get("windspeedKmph", 0)),
-            "condition": current.get("weatherDesc", [{}])[0].get("value", "Unknown"),
+            weather_data, fetched = await self.cache.get_or_fetch(
+                "weather", key, lambda: self._scrape_conditions(city, location), refresh=refresh
+            )
+        except BaseException:
+            aqi_task.cancel()
+            raise
+
+        aqi_data, _ = await aqi_task
+        if fetched and weather_data["location_id"] != key:
+            # The fetch resolved the name: later lookups use the resolved ID
+            self.cache.set("weather", weather_data["location_id"], weather_data)
+            if aqi_data.get("aqi") is not None:
+                self.cache.set("aqi", weather_data["location_id"], aqi_data)
+        return {
+            **weather_data,
             "aqi": aqi_data.get("aqi"),
             "aqi_level": aqi_data.get("level"),
-            "timestamp": datetime.utcnow()
+            "cached": not fetched
         }
-        
-        return weather_data
-    
-    def _get_aqi(self, city: str) -> Dict[str, Optional[Any]]:
+
+    def cached_weather(self, city: str) -> Optional[Dict[str, Any]]:
+        """Get cached weather data for a city without fetching (None if not cached)"""
+        key = self.locations.resolve(city).id
+        found, weather_data = self.cache.get("weather", key)
+        if not found:
+            return None
+        _, aqi_data = self.cache.get("aqi", key)
+        aqi_data = aqi_data or {}
+        return {**weather_data, "aqi": aqi_data.get("aqi"), "aqi_level": aqi_data.get("level")}
+
+    async def _scrape_conditions(self, city: str, location: Location) -> Dict[str, Any]:
+        """Fetch current conditions from the weather providers, best first"""
+        first_error = None
+        for provider in self.providers.ordered(WEATHER):
+            try:
+                weather_data = await self._timed(provider.name, provider.fetch(self._get, location.query))
+            except Exception as e:
+                if first_error is None:
+                    first_error = (provider.name, e)
+                continue
+            _locate(weather_data, self.locations.learn(city, weather_data.get("area")))
+            weather_data["timestamp"] = datetime.utcnow()
+            return weather_data
+
+        if first_error is None:
+            raise Exception("No weather providers registered")
+        name, error = first_error
+        raise Exception(f"Failed to scrape weather for {city}. {name} error: {str(error)}")
+
+    async def _timed(self, provider: str, call: Awaitable[Any]) -> Any:
+        """Await a provider call, recording its latency and outcome"""
+        start = time.perf_counter()
+        outcome = "failure"
+        token = _served_from_cache.set(False)
+        try:
+            result = await call
+            outcome = "success" if result else "empty"
+            # Cache hits say nothing about the upstream's latency
+            if _served_from_cache.get():
+                outcome = "cached"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except CircuitOpenError:
+            outcome = "rejected"
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            self.stats.record(provider, latency, outcome)
+            UPSTREAM_LATENCY.labels(provider, outcome).observe(latency)
+            record_stage(f"upstream.{provider}", latency)
+            _served_from_cache.reset(token)
+
+    async def _get_aqi(self, city: str) -> Dict[str, Optional[Any]]:
         """
         Get Air Quality Index (AQI) for a city
-        Uses multiple free AQI APIs as fallback
-        
+        AQI providers are started best first; the next one is started as
+        soon as the current one fails or comes back empty, or once it has
+        taken longer than the hedge delay. The first valid answer wins and
+        the remaining requests are cancelled. Gives up once the AQI budget
+        is spent.
+
         Args:
             city: City name
-            
+
         Returns:
-            Dictionary with aqi and level
+            Dictionary with aqi and level (both None if no provider answered in time)
         """
+        candidates = self.providers.ordered(AQI)
+        pending: Dict[asyncio.Task, str] = {}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.aqi_budget
+        next_start = loop.time()
+
         try:
-            # Method 1: Try OpenAQ API (free, no API key)
-            try:
-                # OpenAQ uses coordinates, but we can try city name search
-                url = f"https://api.openaq.org/v2/locations?limit=1&city={city}"
-                response = requests.get(url, headers={"User-Agent": self.user_agent}, timeout=8)
-                
-                if response.ok:
-                    data = response.json()
-                    if data.get("results") and len(data["results"]) > 0:
-                        location = data["results"][0]
-                        # Get latest measurement
-                        if location.get("lastUpdated"):
-                            # Try to get AQI from parameters
-                            # OpenAQ provides PM2.5, PM10, etc. but not direct AQI
-                            # We'll calculate AQI from PM2.5 if available
-                            pass
-            except:
-                pass
-            
-            # Method 2: Try WAQI API with demo token (limited but works for some cities)
-            try:
-                url = f"https://api.waqi.info/feed/{city}/?token=demo"
-                response = requests.get(url, headers={"User-Agent": self.user_agent}, timeout=8)
-                
-                if response.ok:
-                    data = response.json()
-                    if data.get("status") == "ok" and data.get("data"):
-                        aqi_value = data["data"].get("aqi")
-                        
-                        if aqi_value and isinstance(aqi_value, (int, float)) and aqi_value > 0:
-                            # Determine AQI level based on US AQI scale
-                            if aqi_value <= 50:
-                                level = "Good"
-                            elif aqi_value <= 100:
-                                level = "Moderate"
-                            elif aqi_value <= 150:
-                                level = "Unhealthy for Sensitive Groups"
-                            elif aqi_value <= 200:
-                                level = "Unhealthy"
-                            elif aqi_value <= 300:
-                                level = "Very Unhealthy"
-                            else:
-                                level = "Hazardous"
-                            
-                            return {"aqi": int(aqi_value), "level": level}
-            except Exception as e:
-                print(f"WAQI API failed: {e}")
-            
-            # Method 3: Try aqicn.org search API
-            try:
-                url = f"https://api.waqi.info/search/?token=demo&keyword={city}"
-                response = requests.get(url, headers={"User-Agent": self.user_agent}, timeout=8)
-                
-                if response.ok:
-                    data = response.json()
-                    if data.get("status") == "ok" and data.get("data") and len(data["data"]) > 0:
-                        station = data["data"][0]
-                        aqi_value = station.get("aqi")
-                        
-                        if aqi_value and isinstance(aqi_value, (int, float)) and aqi_value > 0:
-                            if aqi_value <= 50:
-                                level = "Good"
-                            elif aqi_value <= 100:
-                                level = "Moderate"
-                            elif aqi_value <= 150:
-                                level = "Unhealthy for Sensitive Groups"
-                            elif aqi_value <= 200:
-                                level = "Unhealthy"
-                            elif aqi_value <= 300:
-                                level = "Very Unhealthy"
-                            else:
-                                level = "Hazardous"
-                            
-                            return {"aqi": int(aqi_value), "level": level}
-            except Exception as e:
-                print(f"AQICN search failed: {e}")
-                
-        except Exception as e:
-            print(f"Warning: Could not fetch AQI for {city}: {e}")
-        
+            while candidates or pending:
+                now = loop.time()
+                if now >= deadline:
+                    print(f"AQI budget of {self.aqi_budget}s exceeded for {city}")
+                    break
+                if candidates and now >= next_start:
+                    provider = candidates.pop(0)
+                    task = asyncio.create_task(self._timed(provider.name, provider.fetch(self._get, city)))
+                    pending[task] = provider.name
+                    next_start = now + self.aqi_hedge_delay
+
+                timeout = deadline - now
+                if candidates:
+                    timeout = min(timeout, next_start - now)
+                done, _ = await asyncio.wait(pending, timeout=max(0, timeout), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        print(f"AQI provider {name} failed: {e}")
+                        result = None
+                    if result:
+                        return result
+                    next_start = loop.time()
+        finally:
+            for task in pending:
+                task.cancel()
+
         return {"aqi": None, "level": None}
-    
-    def _html_scrape(self, city: str) -> Dict[str, Any]:
-        """
-        Scrape weather using HTML parsing with BeautifulSoup (fallback method)
-        """
-        url = f"{self.base_url}/{city}"
-        
-        headers = {
-            "User-Agent": self.user_agent,
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)  # Increased timeout
-        response.raise_for_status()
-        
-        # Parse HTML with BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract weather data from HTML
-        pre_tag = soup.find('pre')
-        
-        if not pre_tag:
-            raise Exception("Could not find weather data in HTML")
-        
-        text_content = pre_tag.get_text()
-        
-        # Parse temperature (look for patterns like "25°C" or "25 °C")
-        temp_match = re.search(r'(\+|-)?(\d+)\s*°C', text_content)
-        temp_c = float(temp_match.group(2)) if temp_match else 0
-        if temp_match and temp_match.group(1) == '-':
-            temp_c = -temp_c
-        
-        # Parse humidity (look for patterns like "Humidity: 65%")
-        humidity_match = re.search(r'Humidity[:\s]+(\d+)%', text_content, re.IGNORECASE)
-        humidity = float(humidity_match.group(1)) if humidity_match else 0
-        
-        # Parse wind speed (look for patterns like "Wind: 15 km/h")
-        wind_match = re.search(r'Wind[:\s]+(\d+)\s*km/h', text_content, re.IGNORECASE)
-        wind_speed_kmh = float(wind_match.group(1)) if wind_match else 0
-        
-        # Parse condition (look for weather description)
-        condition_match = re.search(r'(\w+(?:\s+\w+)*)', text_content)
-        condition = condition_match.group(1) if condition_match else "Unknown"
-        
-        if temp_c == 0 and humidity == 0:
-            raise Exception("Could not parse weather data from HTML")
-        
-        # Try to get AQI data
-        aqi_data = self._get_aqi(city)
-        
-        weather_data = {
-            "city": city.title(),
-            "temperature": temp_c,
-            "humidity": humidity,
-            "wind_speed": wind_speed_kmh,
-            "condition": condition,
-            "aqi": aqi_data.get("aqi"),
-            "aqi_level": aqi_data.get("level"),
-            "timestamp": datetime.utcnow()
-        }
-        
-        return weather_data
-    
 
-# Global scraper instance
-scraper = WeatherScraper()
 
+# Global scraper instance
+async_scraper = AsyncWeatherScraper()
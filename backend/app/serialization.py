@@ -0,0 +1,177 @@
+"""
+Fast encoding for large API responses
+History responses are built straight from projected database rows and
+encoded once, instead of validating a pydantic model per row and then the
+whole response again against the route's response_model. The wire schema is
+the one the response models document (HistoricalWeatherResponse).
+
+History can also be encoded column by column for charts: as JSON with
+delta-encoded timestamps and dictionary-encoded strings, or as an Arrow IPC
+stream.
+"""
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # Listed in requirements.txt; the json module is the fallback
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Listed in requirements.txt; format=arrow is refused without it
+    pa = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Numeric and dictionary-encoded columns of columnar history
+COLUMNAR_NUMBERS = ("temperature", "humidity", "wind_speed", "aqi")
+COLUMNAR_DICTIONARIES = ("condition", "aqi_level")
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def orjson_available() -> bool:
+    """Whether orjson is installed"""
+    return orjson is not None
+
+
+def arrow_available() -> bool:
+    """Whether pyarrow is installed"""
+    return pa is not None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode content as compact JSON, with datetimes as ISO 8601 strings
+
+    Naive (UTC) datetimes are written without an offset, as pydantic does.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode()
+
+
+def history_row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A WeatherResponse-shaped row from a projected observation document
+
+    Numbers are coerced the way the model would (floats for measurements,
+    an int AQI); fields missing from older documents are null.
+    """
+    aqi = doc.get("aqi")
+    return {
+        "city": doc["city"],
+        "location_id": doc.get("location_id"),
+        "temperature": float(doc["temperature"]),
+        "humidity": float(doc["humidity"]),
+        "wind_speed": float(doc["wind_speed"]),
+        "condition": doc["condition"],
+        "aqi": int(aqi) if aqi is not None else None,
+        "aqi_level": doc.get("aqi_level"),
+        "timestamp": doc["timestamp"],
+    }
+
+
+def history_json(city: str, docs: Iterable[Dict[str, Any]], next_cursor: Optional[str] = None) -> bytes:
+    """
+    Encode a HistoricalWeatherResponse body from projected observation documents
+
+    Args:
+        city: Display name of the city
+        docs: Observations, in response order
+        next_cursor: Cursor for the next page, if any
+
+    Returns:
+        JSON body
+    """
+    return dumps({"city": city, "data": [history_row(doc) for doc in docs], "next_cursor": next_cursor})
+
+
+def _dictionary_encode(values: List[Optional[str]]) -> Dict[str, list]:
+    """Distinct values (in order of first use) and per-row codes into them (null stays null)"""
+    codes_by_value: Dict[str, int] = {}
+    codes = [
+        None if value is None else codes_by_value.setdefault(value, len(codes_by_value))
+        for value in values
+    ]
+    return {"values": list(codes_by_value), "codes": codes}
+
+
+def history_columnar(
+    city: str,
+    location_id: Optional[str],
+    docs: Iterable[Dict[str, Any]],
+    next_cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Columnar history: one array per field, aligned by index, rows in response order
+
+    - ``timestamps``: epoch milliseconds as ``{"first": t0, "deltas": [t1 - t0, t2 - t1, ...]}``
+    - ``temperature``, ``humidity``, ``wind_speed``, ``aqi``: plain arrays (aqi may hold nulls)
+    - ``condition``, ``aqi_level``: ``{"values": [...], "codes": [...]}``, codes indexing values
+    - city and location_id are given once rather than per row
+
+    Args:
+        city: Display name of the city
+        location_id: Location ID of the city
+        docs: Projected observation documents, in response order
+        next_cursor: Cursor for the next page, if any
+
+    Returns:
+        Response content (see dumps)
+    """
+    rows = [history_row(doc) for doc in docs]
+    timestamps = [(row["timestamp"] - _EPOCH) // _MILLISECOND for row in rows]
+    content: Dict[str, Any] = {
+        "city": city,
+        "location_id": location_id,
+        "count": len(rows),
+        "timestamps": {
+            "first": timestamps[0] if timestamps else None,
+            "deltas": [current - previous for previous, current in zip(timestamps, timestamps[1:])],
+        },
+    }
+    for field in COLUMNAR_NUMBERS:
+        content[field] = [row[field] for row in rows]
+    for field in COLUMNAR_DICTIONARIES:
+        content[field] = _dictionary_encode([row[field] for row in rows])
+    content["next_cursor"] = next_cursor
+    return content
+
+
+def history_arrow(docs: Iterable[Dict[str, Any]]) -> bytes:
+    """
+    History as an Arrow IPC stream (one record batch)
+
+    Columns: timestamp (ms, UTC), temperature, humidity, wind_speed, aqi,
+    and dictionary-encoded condition and aqi_level.
+
+    Raises:
+        RuntimeError: If pyarrow is not installed
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    rows = [history_row(doc) for doc in docs]
+    table = pa.table({
+        "timestamp": pa.array([row["timestamp"] for row in rows], pa.timestamp("ms", tz="UTC")),
+        "temperature": pa.array([row["temperature"] for row in rows], pa.float64()),
+        "humidity": pa.array([row["humidity"] for row in rows], pa.float64()),
+        "wind_speed": pa.array([row["wind_speed"] for row in rows], pa.float64()),
+        "aqi": pa.array([row["aqi"] for row in rows], pa.int32()),
+        "condition": pa.array([row["condition"] for row in rows], pa.string()).dictionary_encode(),
+        "aqi_level": pa.array([row["aqi_level"] for row in rows], pa.string()).dictionary_encode(),
+    })
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
@@ -1,67 +1,142 @@
 """
 Business logic services for weather data
 """
-from app.database import get_db
-from app.scraper import scraper
-from app.models import WeatherData, WeatherResponse
+from app.database import get_db, db_health, WEATHER_PROJECTION
+from app.repository import HistoryKey, history_filter, weather_repository
+from app.scraper import async_scraper
+from app.models import WeatherData, WeatherResponse, CurrentWeatherResponse
+from app.writer import BufferedWriter
+from app.spool import WriteAheadSpool
+from app.rollups import apply_rollups
+from app.forecast import ForecastBuffer, slice_forecast
+from app.locations import locations
+from app.refresh import epoch_seconds, refresh_planner
+from app.executor import ExecutorSaturated, db_executor, scrape_limiter
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 from bson import ObjectId
+from pymongo.errors import ConnectionFailure, PyMongoError
+from dotenv import load_dotenv
+import asyncio
+import os
+import time
 
-# Global flag to track MongoDB connection status
-_db_available = None
+load_dotenv()
 
-def _check_db_available():
-    """Check if MongoDB is available"""
-    global _db_available
-    if _db_available is None:
-        try:
-            db = get_db()
-            db.weather_data.find_one()  # Test query
-            _db_available = True
-        except Exception:
-            _db_available = False
-            print("⚠️  MongoDB not available - data will not be saved to database")
-    return _db_available
+# Freshness policy for current weather (seconds)
+# "swr" mode serves stored data younger than the hard max age immediately,
+# refreshing in the background once it is older than the soft max age
+WEATHER_FRESHNESS_MODE = os.getenv("WEATHER_FRESHNESS_MODE", "fresh")
+WEATHER_SOFT_MAX_AGE = float(os.getenv("WEATHER_SOFT_MAX_AGE", 600))
+WEATHER_HARD_MAX_AGE = float(os.getenv("WEATHER_HARD_MAX_AGE", 3600))
+
+# Background refreshes in flight, by location ID
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+
+def _observation_key(doc: Dict[str, Any]) -> tuple:
+    """Identity of an observation: location and timestamp (at MongoDB's millisecond precision)"""
+    timestamp = doc["timestamp"]
+    location_id = doc.get("location_id") or locations.resolve(doc["city"]).id
+    return location_id, timestamp.replace(microsecond=timestamp.microsecond // 1000 * 1000)
+
+def _spool_failed_insert(docs: List[Dict[str, Any]], error: Exception):
+    """Spool a chunk the writer could not insert because the database was unreachable"""
+    db_health.record_error(error)
+    if isinstance(error, ConnectionFailure):
+        weather_spool.extend(docs)
+
+# Latest scraped forecast per location, written alongside the observations
+weather_forecasts = ForecastBuffer()
+
+def _after_insert(docs: List[Dict[str, Any]]):
+    """Fold inserted observations into the rollups and store pending forecasts"""
+    db = get_db()
+    apply_rollups(db, docs)
+    weather_forecasts.flush(db)
+
+# Batches inserts of scraped observations, folds them into the rollups and
+# stores the forecasts that came with them
+weather_writer = BufferedWriter(
+    lambda: get_db().weather_data,
+    name="weather_data",
+    after_insert=_after_insert,
+    on_failure=_spool_failed_insert
+)
+
+# Holds observations on disk while MongoDB is unavailable
+weather_spool = WriteAheadSpool(key=_observation_key, name="weather_spool")
+
+def _replay_spooled(docs: List[Dict[str, Any]]):
+    """
+    Insert spooled observations, skipping any already stored (same location
+    and timestamp) or repeated within the batch
+    
+    Raises:
+        Exception: If the database is unreachable (the spool keeps the batch)
+    """
+    for doc in docs:
+        # Spooled before observations carried a location ID, or before the name was resolved
+        if doc.get("location_id", "name:").startswith("name:"):
+            doc["location_id"] = locations.resolve(doc["city"]).id
+    stored = {
+        _observation_key(doc)
+        for doc in get_db().weather_data.find(
+            {
+                "location_id": {"$in": list({doc["location_id"] for doc in docs})},
+                "timestamp": {"$in": [doc["timestamp"] for doc in docs]},
+            },
+            {"_id": 0, "location_id": 1, "timestamp": 1}
+        )
+    }
+    fresh = []
+    for doc in docs:
+        key = _observation_key(doc)
+        if key not in stored:
+            stored.add(key)
+            fresh.append(doc)
+    if fresh:
+        weather_writer.write(fresh)
+
+weather_spool.start_replay(_replay_spooled, ready=db_health.check)
 
 def save_weather_data(weather_data: dict) -> Optional[str]:
     """
-    Save weather data to MongoDB
+    Queue weather data for saving to MongoDB
+    Documents are written in batches by the buffered writer; while the
+    database is unavailable they are spooled to disk and replayed later.
+    A forecast in the data replaces the city's stored forecast with the
+    next write.
     
     Args:
         weather_data: Dictionary containing weather data
         
     Returns:
-        ID of the saved document, or None if database unavailable
+        ID of the queued or spooled document, or None if it was dropped
+        (already spooled, or the spool is full)
     """
-    if not _check_db_available():
-        return None
+    # Generate the ID client-side so it is known before the batch is flushed
+    doc = {
+        "_id": ObjectId(),
+        "location_id": weather_data.get("location_id") or locations.resolve(weather_data["city"]).id,
+        "city": weather_data["city"],
+        "temperature": weather_data["temperature"],
+        "humidity": weather_data["humidity"],
+        "wind_speed": weather_data["wind_speed"],
+        "condition": weather_data["condition"],
+        "aqi": weather_data.get("aqi"),
+        "aqi_level": weather_data.get("aqi_level"),
+        "timestamp": weather_data["timestamp"]
+    }
+    if weather_data.get("forecast"):
+        weather_forecasts.add(doc["location_id"], doc["city"], weather_data["forecast"], doc["timestamp"])
     
-    try:
-        db = get_db()
-        collection = db.weather_data
-        
-        # Convert datetime to string for MongoDB storage
-        doc = {
-            "city": weather_data["city"],
-            "temperature": weather_data["temperature"],
-            "humidity": weather_data["humidity"],
-            "wind_speed": weather_data["wind_speed"],
-            "condition": weather_data["condition"],
-            "aqi": weather_data.get("aqi"),
-            "aqi_level": weather_data.get("aqi_level"),
-            "timestamp": weather_data["timestamp"]
-        }
-        
-        result = collection.insert_one(doc)
-        return str(result.inserted_id)
-    except Exception as e:
-        global _db_available
-        _db_available = False
-        print(f"⚠️  Failed to save to database: {e}")
-        return None
+    if not db_health.check():
+        return str(doc["_id"]) if weather_spool.append(doc) else None
+    
+    weather_writer.add(doc)
+    return str(doc["_id"])
 
-def get_current_weather(city: str, fetch_fresh: bool = True) -> WeatherResponse:
+async def get_current_weather(city: str, fetch_fresh: bool = True) -> CurrentWeatherResponse:
     """
     Get current weather for a city
     Optionally fetches fresh data from scraper
@@ -71,101 +146,264 @@ def get_current_weather(city: str, fetch_fresh: bool = True) -> WeatherResponse:
         fetch_fresh: Whether to fetch fresh data from scraper
         
     Returns:
-        WeatherResponse object
+        CurrentWeatherResponse object
         
     Raises:
+        ExecutorSaturated: If too many scrapes or database calls are in flight
         Exception: If city is invalid or scraping fails
     """
     if fetch_fresh:
-        # Scrape fresh weather data
-        weather_data = scraper.scrape_weather(city)
-        
-        # Try to save to database (will fail silently if DB unavailable)
-        save_weather_data(weather_data)
-        
-        return WeatherResponse(**weather_data)
+        return await _scrape_current_weather(city)
     else:
         # Try to get from database
-        if _check_db_available():
-            try:
-                db = get_db()
-                collection = db.weather_data
-                
-                latest = collection.find_one(
-                    {"city": city.title()},
-                    sort=[("timestamp", -1)]
-                )
-                
-                if latest:
-                    # Convert ObjectId to string and datetime
-                    latest["id"] = str(latest["_id"])
-                    del latest["_id"]
-                    return WeatherResponse(**latest)
-            except Exception:
-                pass
+        latest = await _get_latest_weather(city)
+        if latest:
+            return _with_freshness(latest.model_dump())
         
         # If not in DB or DB unavailable, fetch fresh
-        return get_current_weather(city, fetch_fresh=True)
+        return await get_current_weather(city, fetch_fresh=True)
+
+async def get_current_weather_swr(city: str) -> CurrentWeatherResponse:
+    """
+    Get current weather for a city using stale-while-revalidate
+    
+    The newest cached or stored observation is served immediately if it is
+    younger than WEATHER_HARD_MAX_AGE; if it is also older than
+    WEATHER_SOFT_MAX_AGE a background refresh is started. Only when nothing
+    usable is stored does the request wait for the scraper.
+    
+    Args:
+        city: City name
+        
+    Returns:
+        CurrentWeatherResponse object with observation age and whether a
+        refresh was triggered
+        
+    Raises:
+        ExecutorSaturated: If the request has to scrape and too many scrapes are in flight
+        Exception: If nothing usable is stored and scraping fails
+    """
+    latest = async_scraper.cached_weather(city)
+    if latest is None or _age_seconds(latest) > WEATHER_SOFT_MAX_AGE:
+        stored = await _get_latest_weather(city)
+        if stored and (latest is None or stored.timestamp > latest["timestamp"]):
+            latest = stored.model_dump()
+    
+    if latest is None or _age_seconds(latest) > WEATHER_HARD_MAX_AGE:
+        return await _scrape_current_weather(city)
+    
+    refresh_triggered = _age_seconds(latest) > WEATHER_SOFT_MAX_AGE
+    if refresh_triggered:
+        _schedule_refresh(city)
+    
+    return _with_freshness(latest, refresh_triggered=refresh_triggered)
+
+async def _scrape_current_weather(city: str, refresh: bool = False) -> CurrentWeatherResponse:
+    """Scrape (or take from the response cache) and save current weather"""
+    requested_id = locations.resolve(city).id
+    # Scrape weather data without blocking the event loop; cache hits are
+    # served directly, upstream fetches need a scrape slot
+    if not refresh and async_scraper.cached_weather(city) is not None:
+        weather_data = await async_scraper.scrape_weather(city)
+    else:
+        async with scrape_limiter.slot():
+            weather_data = await async_scraper.scrape_weather(city, refresh=refresh)
+    
+    # Queue for saving to database (will fail silently if DB unavailable);
+    # cached observations were already saved when first fetched
+    if not weather_data.pop("cached", False):
+        try:
+            await db_executor.run(save_weather_data, weather_data)
+        except ExecutorSaturated:
+            print(f"⚠️  Database executor saturated - weather for {city} not saved")
+    
+    refresh_planner.record_observation(
+        weather_data["location_id"], city, epoch_seconds(weather_data["timestamp"]), requested_id=requested_id
+    )
+    return _with_freshness(weather_data)
+
+async def refresh_weather(city: str) -> CurrentWeatherResponse:
+    """Scrape and save current weather, bypassing the response cache (used by the refresh scheduler)"""
+    return await _scrape_current_weather(city, refresh=True)
+
+def record_demand(city: str, weather: CurrentWeatherResponse):
+    """Count a client request for current weather towards refresh priorities"""
+    location_id = weather.location_id or locations.resolve(city).id
+    refresh_planner.record_request(location_id, city, time.time())
+    refresh_planner.record_observation(location_id, city, epoch_seconds(weather.timestamp))
+
+def _schedule_refresh(city: str):
+    """Start a background refresh for a city unless one is already running"""
+    key = locations.resolve(city).id
+    if key not in _refresh_tasks:
+        task = asyncio.create_task(_scrape_current_weather(city, refresh=True))
+        _refresh_tasks[key] = task
+        
+        def _done(task: asyncio.Task):
+            _refresh_tasks.pop(key, None)
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Background refresh failed for {city}: {task.exception()}")
+        
+        task.add_done_callback(_done)
+
+def _age_seconds(weather_data: Dict[str, Any]) -> float:
+    return max(0.0, (datetime.utcnow() - weather_data["timestamp"]).total_seconds())
+
+def _with_freshness(weather_data: Dict[str, Any], refresh_triggered: bool = False) -> CurrentWeatherResponse:
+    return CurrentWeatherResponse(
+        **weather_data,
+        age_seconds=round(_age_seconds(weather_data), 1),
+        refresh_triggered=refresh_triggered
+    )
 
-def get_weather_history(city: str, days: int = 7) -> List[WeatherResponse]:
+async def _get_latest_weather(city: str) -> Optional[WeatherResponse]:
     """
-    Get historical weather data for a city
+    Get the most recent stored observation for a city, if any
+    
+    Raises:
+        ExecutorSaturated: If too many database reads are in flight
+    """
+    if not await weather_repository.available():
+        return None
+    
+    try:
+        latest = await weather_repository.latest(locations.resolve(city).id)
+        if latest:
+            return WeatherResponse(**latest)
+    except ExecutorSaturated:
+        raise
+    except Exception:
+        pass
+    
+    return None
+
+async def get_weather_history(
+    city: str,
+    days: int = 7,
+    limit: Optional[int] = None,
+    before: Optional[HistoryKey] = None
+) -> List[Dict[str, Any]]:
+    """
+    Get historical weather data for a city, newest first
     
     Args:
         city: City name
         days: Number of days of history to retrieve
+        limit: Maximum number of observations to return (all if omitted)
+        before: Only return observations after this (timestamp, _id) in
+            history order (keyset pagination: pass the key of the last
+            observation of the previous page, see parse_history_cursor)
         
     Returns:
-        List of WeatherResponse objects (empty if database unavailable)
+        Projected observation documents, ready for app.serialization.history_json
+        (empty if database unavailable)
+        
+    Raises:
+        ExecutorSaturated: If too many database reads are in flight
     """
-    if not _check_db_available():
+    if not await weather_repository.available():
         return []
     
     try:
-        db = get_db()
-        collection = db.weather_data
+        return await weather_repository.history(
+            locations.resolve(city).id, datetime.utcnow() - timedelta(days=days), before=before, limit=limit
+        )
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        print(f"⚠️  Failed to fetch history from database: {e}")
+        return []
+
+def iter_weather_history(city: str, days: int, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream historical weather documents for a city, oldest first
+    Documents are read from the cursor in batches, so memory use does not
+    grow with the size of the range
+    
+    Args:
+        city: City name
+        days: Number of days of history to retrieve
+        batch_size: Documents fetched per cursor round-trip
         
-        # Calculate date threshold
-        threshold_date = datetime.utcnow() - timedelta(days=days)
+    Yields:
+        Projected observation documents
         
-        # Query database
-        cursor = collection.find(
-            {
-                "city": city.title(),
-                "timestamp": {"$gte": threshold_date}
-            },
-            sort=[("timestamp", -1)]
+    Raises:
+        PyMongoError: If the database cannot be read (an outage must not
+            look like an empty export)
+    """
+    try:
+        cursor = get_db().weather_data.find(
+            history_filter(locations.resolve(city).id, datetime.utcnow() - timedelta(days=days)),
+            WEATHER_PROJECTION,
+            sort=[("timestamp", 1), ("_id", 1)],
+            batch_size=batch_size
         )
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+    except PyMongoError as e:
+        db_health.record_error(e)
+        raise
+
+async def get_weather_rollups(city: str, days: int, resolution: str) -> List[Dict[str, Any]]:
+    """
+    Get pre-aggregated historical weather for a city
+    
+    Args:
+        city: City name
+        days: Number of days of history to retrieve
+        resolution: Bucket size, "hour" or "day"
         
-        results = []
-        for doc in cursor:
-            doc["id"] = str(doc["_id"])
-            del doc["_id"]
-            results.append(WeatherResponse(**doc))
+    Returns:
+        List of rollup points, newest first (empty if database unavailable)
         
-        return results
+    Raises:
+        ExecutorSaturated: If too many database reads are in flight
+    """
+    if not await weather_repository.available():
+        return []
+    
+    try:
+        threshold_date = datetime.utcnow() - timedelta(days=days)
+        return await weather_repository.rollups(locations.resolve(city).id, threshold_date, resolution)
+    except ExecutorSaturated:
+        raise
     except Exception as e:
-        global _db_available
-        _db_available = False
-        print(f"⚠️  Failed to fetch history from database: {e}")
+        print(f"⚠️  Failed to fetch rollups from database: {e}")
         return []
 
-def scrape_and_save_weather(city: str) -> bool:
+async def get_weather_forecast(city: str, days: int) -> Optional[Dict[str, Any]]:
     """
-    Scrape weather data and save to database
-    Used by scheduled tasks
+    Get the stored forecast for a city (never contacts the upstream)
     
     Args:
-        city: City name to scrape
+        city: City name
+        days: Number of forecast days to return
         
     Returns:
-        True if successful, False otherwise
+        Dict with city, issued_at and the columnar daily/hourly series, or
+        None if no forecast is stored or the database is unavailable
+        
+    Raises:
+        ExecutorSaturated: If too many database reads are in flight
     """
+    if not await weather_repository.available():
+        return None
+    
     try:
-        weather_data = scraper.scrape_weather(city)
-        save_weather_data(weather_data)
-        return True
+        doc = await weather_repository.forecast(locations.resolve(city).id)
+    except ExecutorSaturated:
+        raise
     except Exception as e:
-        print(f"Error scraping weather for {city}: {e}")
-        return False
-
+        print(f"⚠️  Failed to fetch forecast from database: {e}")
+        return None
+    if not doc:
+        return None
+    return {
+        "city": doc["city"],
+        "location_id": doc["location_id"],
+        "issued_at": doc["issued_at"],
+        **slice_forecast(doc, days)
+    }
@@ -0,0 +1,331 @@
+"""
+On-disk write-ahead spool
+Documents that could not be written to MongoDB are appended to segmented,
+append-only files and replayed in batches once the database is reachable
+again. Each record is a BSON document framed with its length and CRC32, so a
+write torn by a crash is detected and cut off when the spool is reopened.
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, BinaryIO, Callable, Dict, Hashable, List, Optional, Set, Tuple
+import bson
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+SPOOL_SEGMENT_BYTES = int(os.getenv("SPOOL_SEGMENT_BYTES", 4 * 1024 * 1024))
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", 256 * 1024 * 1024))
+# always: fsync every append; interval: at most every SPOOL_FSYNC_INTERVAL
+# seconds; never: leave it to the OS (a process crash still loses nothing)
+SPOOL_FSYNC = os.getenv("SPOOL_FSYNC", "interval")
+SPOOL_FSYNC_INTERVAL = float(os.getenv("SPOOL_FSYNC_INTERVAL", 1))
+SPOOL_REPLAY_INTERVAL = float(os.getenv("SPOOL_REPLAY_INTERVAL", 5))  # seconds
+SPOOL_REPLAY_BATCH = int(os.getenv("SPOOL_REPLAY_BATCH", 1000))
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+# Record header: payload length, CRC32 of the payload
+_HEADER = struct.Struct("<II")
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".spool"
+
+
+class WriteAheadSpool:
+    """
+    Segmented append-only spool with bounded disk usage
+
+    ``append``/``extend`` write records to the active segment, which is
+    sealed once it reaches ``segment_bytes``. Records whose ``key`` is
+    already spooled are skipped, and records that would take the spool past
+    ``max_bytes`` are dropped (newest first, so replay order is kept).
+    ``replay`` hands sealed segments to a write function in batches, oldest
+    first, and deletes each segment once all of it was written; a segment
+    whose write fails is kept and retried whole, so the write function must
+    tolerate documents it has already stored. ``start_replay`` runs replay
+    in a background thread whenever ``ready()`` says the target is back.
+
+    Args:
+        directory: Directory holding the segment files (created on first append)
+        key: Returns a document's dedup key (no deduplication if omitted)
+        segment_bytes: Size at which the active segment is sealed
+        max_bytes: Upper bound on the total size of all segments
+        fsync: "always", "interval" or "never"
+        fsync_interval: Seconds between fsyncs with the "interval" policy
+        name: Name used in log messages
+    """
+
+    def __init__(
+        self,
+        directory: str = SPOOL_DIR,
+        key: Optional[Callable[[Dict[str, Any]], Hashable]] = None,
+        segment_bytes: int = SPOOL_SEGMENT_BYTES,
+        max_bytes: int = SPOOL_MAX_BYTES,
+        fsync: str = SPOOL_FSYNC,
+        fsync_interval: float = SPOOL_FSYNC_INTERVAL,
+        name: str = "spool"
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync} (expected one of {', '.join(FSYNC_POLICIES)})")
+        self.directory = directory
+        self.key = key
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        # Segment id -> size in bytes, and the dedup keys each segment holds
+        self._sizes: Dict[int, int] = {}
+        self._segment_keys: Dict[int, List[Hashable]] = {}
+        self._keys: Set[Hashable] = set()
+        self._records = 0
+        self._active: Optional[BinaryIO] = None
+        self._active_id = 0
+        self._dirty = False
+        self._synced_at = 0.0
+        self._full = False
+        self._counters = {"appended": 0, "duplicates": 0, "dropped": 0, "replayed": 0, "corrupt": 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._write: Optional[Callable[[List[Dict[str, Any]]], Any]] = None
+        self._ready: Optional[Callable[[], bool]] = None
+        self._replay_interval = SPOOL_REPLAY_INTERVAL
+        self._replay_batch = SPOOL_REPLAY_BATCH
+        self._recover()
+
+    def _path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{segment_id:08d}{_SEGMENT_SUFFIX}")
+
+    def _recover(self):
+        """Index segments left by a previous run, cutting off torn trailing records"""
+        if not os.path.isdir(self.directory):
+            return
+        for filename in sorted(os.listdir(self.directory)):
+            if not (filename.startswith(_SEGMENT_PREFIX) and filename.endswith(_SEGMENT_SUFFIX)):
+                continue
+            segment_id = int(filename[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+            docs, valid_bytes = self._read_segment(segment_id)
+            if valid_bytes < os.path.getsize(self._path(segment_id)):
+                self._counters["corrupt"] += 1
+                print(f"⚠️  {self.name}: truncating damaged tail of {filename} at byte {valid_bytes}")
+                os.truncate(self._path(segment_id), valid_bytes)
+            keys = [self.key(doc) for doc in docs] if self.key else []
+            self._sizes[segment_id] = valid_bytes
+            self._segment_keys[segment_id] = keys
+            self._keys.update(keys)
+            self._records += len(docs)
+            self._active_id = max(self._active_id, segment_id)
+        if self._records:
+            print(f"✓ {self.name}: {self._records} spooled documents waiting for replay")
+
+    def _read_segment(self, segment_id: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Decode a segment's records; returns them and the length of the intact prefix"""
+        with open(self._path(segment_id), "rb") as f:
+            data = f.read()
+        docs = []
+        offset = 0
+        while offset + _HEADER.size <= len(data):
+            length, checksum = _HEADER.unpack_from(data, offset)
+            start = offset + _HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            docs.append(bson.decode(payload))
+            offset = start + length
+        return docs, offset
+
+    def append(self, doc: Dict[str, Any]) -> bool:
+        """
+        Spool one document
+
+        Returns:
+            True if it was written, False if it was a duplicate or the spool is full
+        """
+        return self.extend([doc]) == 1
+
+    def extend(self, docs: List[Dict[str, Any]]) -> int:
+        """
+        Spool several documents with a single flush (and fsync, per policy)
+
+        Returns:
+            Number of documents written (duplicates and overflow are skipped)
+        """
+        records = []
+        for doc in docs:
+            payload = bson.encode(doc)
+            key = self.key(doc) if self.key else None
+            records.append((key, _HEADER.pack(len(payload), zlib.crc32(payload)) + payload))
+
+        written = 0
+        with self._lock:
+            for key, record in records:
+                if key is not None and key in self._keys:
+                    self._counters["duplicates"] += 1
+                    continue
+                if sum(self._sizes.values()) + len(record) > self.max_bytes:
+                    self._counters["dropped"] += 1
+                    if not self._full:
+                        self._full = True
+                        print(f"⚠️  {self.name}: spool full ({self.max_bytes} bytes) - dropping documents")
+                    continue
+                if self._active is None or self._sizes[self._active_id] + len(record) > self.segment_bytes:
+                    self._open_segment()
+                self._active.write(record)
+                self._sizes[self._active_id] += len(record)
+                if key is not None:
+                    self._keys.add(key)
+                    self._segment_keys[self._active_id].append(key)
+                self._records += 1
+                self._counters["appended"] += 1
+                written += 1
+            if written:
+                self._active.flush()
+                self._dirty = True
+                if self.fsync == "always" or (
+                    self.fsync == "interval" and time.monotonic() - self._synced_at >= self.fsync_interval
+                ):
+                    self._sync_active()
+        if written:
+            self._ensure_started()
+        return written
+
+    def _open_segment(self):
+        """Seal the active segment (if any) and start a new one"""
+        self._close_active()
+        os.makedirs(self.directory, exist_ok=True)
+        self._active_id += 1
+        self._active = open(self._path(self._active_id), "ab")
+        self._sizes[self._active_id] = 0
+        self._segment_keys[self._active_id] = []
+
+    def _close_active(self):
+        if self._active is None:
+            return
+        if self.fsync != "never":
+            self._sync_active()
+        self._active.close()
+        self._active = None
+
+    def _sync_active(self):
+        if self._dirty and self._active is not None:
+            os.fsync(self._active.fileno())
+            self._dirty = False
+        self._synced_at = time.monotonic()
+
+    def sync(self):
+        """fsync pending appends now (no-op with the "never" policy)"""
+        if self.fsync != "never":
+            with self._lock:
+                self._sync_active()
+
+    def pending(self) -> int:
+        """Number of spooled documents not yet replayed"""
+        with self._lock:
+            return self._records
+
+    def replay(self, write: Callable[[List[Dict[str, Any]]], Any], batch_size: int = SPOOL_REPLAY_BATCH) -> int:
+        """
+        Write spooled documents, oldest first, deleting each segment once written
+
+        Args:
+            write: Stores a batch of documents; raises if the batch could not be stored
+            batch_size: Documents per write call
+
+        Returns:
+            Number of documents replayed
+
+        Raises:
+            Exception: Whatever ``write`` raised; the failing segment is kept
+        """
+        with self._replay_lock:
+            with self._lock:
+                if self._active is not None and self._sizes[self._active_id]:
+                    self._close_active()
+                segment_ids = sorted(
+                    segment_id for segment_id in self._sizes
+                    if self._active is None or segment_id != self._active_id
+                )
+
+            replayed = 0
+            for segment_id in segment_ids:
+                docs, _ = self._read_segment(segment_id)
+                for offset in range(0, len(docs), batch_size):
+                    write(docs[offset:offset + batch_size])
+                os.remove(self._path(segment_id))
+                with self._lock:
+                    del self._sizes[segment_id]
+                    self._keys.difference_update(self._segment_keys.pop(segment_id))
+                    self._records -= len(docs)
+                    self._counters["replayed"] += len(docs)
+                    self._full = False
+                replayed += len(docs)
+            return replayed
+
+    def start_replay(
+        self,
+        write: Callable[[List[Dict[str, Any]]], Any],
+        ready: Callable[[], bool],
+        interval: float = SPOOL_REPLAY_INTERVAL,
+        batch_size: int = SPOOL_REPLAY_BATCH
+    ):
+        """
+        Replay in a background thread every ``interval`` seconds while
+        documents are waiting and ``ready()`` returns True
+
+        The thread starts now if documents are already spooled, otherwise on
+        the first append.
+        """
+        self._write = write
+        self._ready = ready
+        self._replay_interval = interval
+        self._replay_batch = batch_size
+        if self.pending():
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self._write is None:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name=f"{self.name}-replay", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._replay_interval):
+            self.sync()
+            if not self.pending() or not self._ready():
+                continue
+            try:
+                replayed = self.replay(self._write, self._replay_batch)
+                if replayed:
+                    print(f"✓ {self.name}: replayed {replayed} spooled documents")
+            except Exception as e:
+                print(f"⚠️  {self.name}: replay interrupted, will retry: {e}")
+
+    def close(self):
+        """Stop the replay thread and seal the active segment"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._close_active()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get spool size, segment count and append/replay counters"""
+        with self._lock:
+            return {
+                **self._counters,
+                "pending": self._records,
+                "segments": len(self._sizes),
+                "bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "fsync": self.fsync,
+            }
@@ -0,0 +1,88 @@
+"""
+Latency and outcome tracking for upstream providers
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Number of recent latency samples kept per provider
+LATENCY_WINDOW = 200
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of samples (None if empty)"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ProviderStats:
+    """Per-provider call outcomes and a sliding window of latencies"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._outcomes: Dict[str, Deque[bool]] = {}
+
+    def record(self, provider: str, latency: float, outcome: str = "success"):
+        """
+        Record one call to a provider
+
+        Args:
+            provider: Provider name
+            latency: Call duration in seconds
+            outcome: "success", "empty" (answered without usable data),
+                "failure", "rejected" (circuit open, never sent), "cached"
+                (answered from the HTTP cache, never sent) or "cancelled"
+        """
+        with self._lock:
+            counts = self._counts.setdefault(
+                provider, {"success": 0, "empty": 0, "failure": 0, "rejected": 0, "cached": 0, "cancelled": 0}
+            )
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if outcome not in ("cancelled", "rejected", "cached"):
+                self._latencies.setdefault(provider, deque(maxlen=self.window)).append(latency)
+                self._outcomes.setdefault(provider, deque(maxlen=self.window)).append(outcome != "failure")
+
+    def samples(self, provider: str) -> List[float]:
+        """Recent latencies (seconds) recorded for a provider"""
+        with self._lock:
+            return list(self._latencies.get(provider, ()))
+
+    def success_rate(self, provider: str) -> Optional[float]:
+        """Share of recent calls that did not fail (None if never called)"""
+        with self._lock:
+            outcomes = self._outcomes.get(provider)
+            if not outcomes:
+                return None
+            return sum(outcomes) / len(outcomes)
+
+    def call_count(self, provider: str) -> int:
+        """Number of recent calls in the sliding window"""
+        with self._lock:
+            return len(self._outcomes.get(provider, ()))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get counts and latency percentiles (milliseconds) for every provider"""
+        with self._lock:
+            result = {}
+            for provider, counts in self._counts.items():
+                samples = list(self._latencies.get(provider, ()))
+                result[provider] = {
+                    **counts,
+                    "latency_ms": {
+                        "p50": _ms(percentile(samples, 50)),
+                        "p95": _ms(percentile(samples, 95)),
+                        "max": _ms(max(samples) if samples else None),
+                    },
+                }
+            return result
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
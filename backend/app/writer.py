@@ -0,0 +1,181 @@
+"""
+Buffered MongoDB writer
+Accumulates documents and writes them with unordered insert_many once a
+size or time threshold is reached
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+from app.metrics import MONGO_LATENCY, stage
+from app.stats import percentile
+
+load_dotenv()
+
+WRITER_BATCH_SIZE = int(os.getenv("WRITER_BATCH_SIZE", 500))
+WRITER_FLUSH_INTERVAL = float(os.getenv("WRITER_FLUSH_INTERVAL", 2))  # seconds
+
+# Number of recent flush latencies kept for percentiles
+FLUSH_WINDOW = 200
+
+
+class BufferedWriter:
+    """
+    Thread-safe document buffer flushed by a background thread
+
+    ``add`` never performs I/O: the flusher thread writes the buffer every
+    ``flush_interval`` seconds, or as soon as ``batch_size`` documents are
+    waiting. ``close`` flushes whatever is left. ``after_insert`` is called
+    with the documents each flush inserted successfully, and ``on_failure``
+    with the documents and error of each chunk that could not be written at
+    all (e.g. database unreachable).
+    """
+
+    def __init__(
+        self,
+        get_collection: Callable[[], Collection],
+        batch_size: int = WRITER_BATCH_SIZE,
+        flush_interval: float = WRITER_FLUSH_INTERVAL,
+        name: str = "writer",
+        after_insert: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        on_failure: Optional[Callable[[List[Dict[str, Any]], Exception], Any]] = None
+    ):
+        self.get_collection = get_collection
+        self.after_insert = after_insert
+        self.on_failure = on_failure
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._latencies: Deque[float] = deque(maxlen=FLUSH_WINDOW)
+        self._counters = {"flushes": 0, "inserted": 0, "failed": 0}
+
+    def add(self, doc: Dict[str, Any]):
+        """Queue one document for insertion"""
+        with self._lock:
+            self._buffer.append(doc)
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._closed.clear()
+                    self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> Dict[str, Any]:
+        """
+        Write all buffered documents now
+
+        Returns:
+            Flush result with inserted and failed counts and latency (seconds)
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return {"inserted": 0, "failed": 0, "latency": 0.0}
+
+            start = time.perf_counter()
+            inserted, failed = 0, 0
+            for offset in range(0, len(batch), self.batch_size):
+                chunk = batch[offset:offset + self.batch_size]
+                try:
+                    chunk_inserted, chunk_failed = self.write(chunk)
+                    inserted += chunk_inserted
+                    failed += chunk_failed
+                except Exception as e:
+                    failed += len(chunk)
+                    print(f"⚠️  {self.name}: failed to save {len(chunk)} documents to database: {e}")
+                    self._on_failure(chunk, e)
+            latency = time.perf_counter() - start
+
+            with self._lock:
+                self._latencies.append(latency)
+                self._counters["flushes"] += 1
+                self._counters["inserted"] += inserted
+                self._counters["failed"] += failed
+            return {"inserted": inserted, "failed": failed, "latency": latency}
+
+    def write(self, docs: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Insert documents now, bypassing the buffer
+
+        Returns:
+            (inserted, failed) counts; failed documents are individual
+            write errors such as duplicate keys
+
+        Raises:
+            Exception: If the insert failed as a whole (e.g. database unreachable)
+        """
+        try:
+            with stage("mongo.insert_many", MONGO_LATENCY, operation="insert_many"):
+                result = self.get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            print(f"⚠️  {self.name}: {len(write_errors)} documents failed to insert")
+            failed_indexes = {error["index"] for error in write_errors}
+            self._after_insert([doc for i, doc in enumerate(docs) if i not in failed_indexes])
+            return e.details.get("nInserted", 0), len(write_errors)
+        self._after_insert(docs)
+        return len(result.inserted_ids), 0
+
+    def _on_failure(self, docs: List[Dict[str, Any]], error: Exception):
+        if self.on_failure is None:
+            return
+        try:
+            self.on_failure(docs, error)
+        except Exception as e:
+            print(f"⚠️  {self.name}: failure hook failed: {e}")
+
+    def _after_insert(self, docs: List[Dict[str, Any]]):
+        if self.after_insert is None or not docs:
+            return
+        try:
+            self.after_insert(docs)
+        except Exception as e:
+            print(f"⚠️  {self.name}: post-insert hook failed: {e}")
+
+    def close(self):
+        """Stop the flusher thread and flush remaining documents"""
+        self._closed.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get flush counters and per-flush latency percentiles (milliseconds)"""
+        with self._lock:
+            samples = list(self._latencies)
+            return {
+                **self._counters,
+                "pending": len(self._buffer),
+                "batch_size": self.batch_size,
+                "flush_interval_seconds": self.flush_interval,
+                "flush_latency_ms": {
+                    "last": round(samples[-1] * 1000, 1) if samples else None,
+                    "p50": round(percentile(samples, 50) * 1000, 1) if samples else None,
+                    "p95": round(percentile(samples, 95) * 1000, 1) if samples else None,
+                },
+            }
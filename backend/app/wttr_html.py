@@ -0,0 +1,132 @@
+"""
+Lightweight wttr.in HTML extractor
+Finds the <pre> weather block with a targeted scan instead of building a
+full document tree, then pulls every field out in a single regex pass
+"""
+import html as html_lib
+import os
+import re
+from typing import Callable, Dict, Optional, Any
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+
+try:
+    import lxml.html
+except ImportError:  # optional backend
+    lxml = None
+
+load_dotenv()
+
+# How the <pre> block is located: scan (default), lxml or bs4
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "scan")
+
+_PRE_OPEN = re.compile(r"<pre(?:\s[^>]*)?>", re.IGNORECASE)
+_PRE_CLOSE = re.compile(r"</pre\s*>", re.IGNORECASE)
+_MARKUP = re.compile(r"<!--.*?-->|<[^>]*>", re.DOTALL)
+
+# Same patterns as the original per-field searches, combined into one pass.
+# Only the keywords are case-insensitive, as before ("°C" stays exact).
+_FIELDS = re.compile(
+    r"(?P<sign>[+-])?(?P<temp>\d+)\s*°C"
+    r"|(?i:humidity)[:\s]+(?P<humidity>\d+)%"
+    r"|(?i:wind)[:\s]+(?P<wind>\d+)\s*(?i:km/h)"
+)
+_CONDITION = re.compile(r"\w+(?:\s+\w+)*")
+
+
+def _scan_pre_text(html: str) -> Optional[str]:
+    """Text of the first <pre> block, found by scanning for the tag"""
+    opening = _PRE_OPEN.search(html)
+    if not opening:
+        return None
+    closing = _PRE_CLOSE.search(html, opening.end())
+    block = html[opening.end():closing.start() if closing else len(html)]
+    if "<" in block:
+        block = _MARKUP.sub("", block)
+    return html_lib.unescape(block) if "&" in block else block
+
+
+def _lxml_pre_text(html: str) -> Optional[str]:
+    """Text of the first <pre> block, using lxml's HTML parser"""
+    pre_tag = lxml.html.fromstring(html).find(".//pre")
+    return pre_tag.text_content() if pre_tag is not None else None
+
+
+def _bs4_pre_text(html: str) -> Optional[str]:
+    """Text of the first <pre> block, using a full BeautifulSoup tree"""
+    pre_tag = BeautifulSoup(html, "html.parser").find("pre")
+    return pre_tag.get_text() if pre_tag else None
+
+
+PRE_EXTRACTORS: Dict[str, Callable[[str], Optional[str]]] = {
+    "scan": _scan_pre_text,
+    "bs4": _bs4_pre_text,
+}
+if lxml is not None:
+    PRE_EXTRACTORS["lxml"] = _lxml_pre_text
+
+
+def _default_backend() -> str:
+    if HTML_PARSER_BACKEND in PRE_EXTRACTORS:
+        return HTML_PARSER_BACKEND
+    print(f"⚠️  HTML parser backend '{HTML_PARSER_BACKEND}' not available, using scan")
+    return "scan"
+
+
+DEFAULT_BACKEND = _default_backend()
+
+
+def parse_weather_text(text: str, city: str) -> Dict[str, Any]:
+    """
+    Extract current conditions from the text of a wttr.in <pre> block
+
+    Raises:
+        Exception: If neither temperature nor humidity could be parsed
+    """
+    found: Dict[str, re.Match] = {}
+    for match in _FIELDS.finditer(text):
+        group = match.lastgroup
+        if group not in found:
+            found[group] = match
+            if len(found) == 3:
+                break
+
+    temp_c = 0
+    if "temp" in found:
+        temp_c = float(found["temp"].group("temp"))
+        if found["temp"].group("sign") == "-":
+            temp_c = -temp_c
+    humidity = float(found["humidity"].group("humidity")) if "humidity" in found else 0
+    wind_speed_kmh = float(found["wind"].group("wind")) if "wind" in found else 0
+
+    condition_match = _CONDITION.search(text)
+    condition = condition_match.group(0) if condition_match else "Unknown"
+
+    if temp_c == 0 and humidity == 0:
+        raise Exception("Could not parse weather data from HTML")
+
+    return {
+        "city": city.title(),
+        "temperature": temp_c,
+        "humidity": humidity,
+        "wind_speed": wind_speed_kmh,
+        "condition": condition,
+    }
+
+
+def parse_wttr_html(html: str, city: str, backend: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extract current conditions from a wttr.in HTML page
+
+    Args:
+        html: Page source
+        city: City name for the result
+        backend: "scan", "bs4" or "lxml" (if installed); defaults to HTML_PARSER_BACKEND
+
+    Raises:
+        Exception: If the page does not contain parseable weather data
+    """
+    text = PRE_EXTRACTORS[backend or DEFAULT_BACKEND](html)
+    if text is None:
+        raise Exception("Could not find weather data in HTML")
+    return parse_weather_text(text, city)
@@ -0,0 +1 @@
+# Benchmarks for the Weather Data Scraper backend
@@ -0,0 +1,59 @@
+"""
+Benchmark: batch scrape engine scaling with worker count
+
+Scrapes a synthetic city list against a stub upstream (in a child process)
+at increasing worker counts, first with rate limits effectively disabled,
+then with a binding global rate limit, and prints the batch summaries.
+
+Usage (from backend/):
+    python -m benchmarks.bench_batch [--cities 200] [--latency 0.25] [--rate 90]
+"""
+import argparse
+import asyncio
+
+from app.batch import scrape_cities
+from app.cache import ResponseCache
+from app.scraper import AsyncWeatherScraper
+from benchmarks.stub_server import StubProcess
+
+WORKER_COUNTS = [1, 5, 10, 20]
+
+
+async def run(url: str, cities, workers: int, rate: float, per_host_rate: float):
+    scraper = AsyncWeatherScraper(
+        base_url=url, waqi_base_url=url, aqi_budget=10, cache=ResponseCache(max_entries=0),
+        max_connections_per_host=60
+    )
+    try:
+        return await scrape_cities(
+            cities, workers=workers, rate=rate, per_host_rate=per_host_rate, scraper=scraper
+        )
+    finally:
+        await scraper.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.25, help="Stub latency per upstream call (s)")
+    parser.add_argument("--rate", type=float, default=90, help="Binding global rate limit (requests/s)")
+    args = parser.parse_args()
+
+    cities = [f"City{i}" for i in range(args.cities)]
+    # Each city costs 2 upstream requests (wttr.in + the first AQI provider) unless
+    # the AQI lookup is slower than AQI_HEDGE_SECONDS and a second provider is started
+    print(f"{args.cities} cities, stub latency {args.latency * 1000:.0f} ms, 2 upstream requests per city")
+    print(f"{'limit':>10} {'workers':>8} {'cities/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'wall s':>7} {'ok':>5}")
+    with StubProcess(latency=args.latency) as stub:
+        for label, rate in (("none", 0), (f"{args.rate:g}/s", args.rate)):
+            for workers in WORKER_COUNTS:
+                summary = asyncio.run(run(stub.url, cities, workers, rate, 0))
+                print(
+                    f"{label:>10} {workers:>8} {summary['cities_per_second']:>9.1f} "
+                    f"{summary['latency_p50'] * 1000:>8.0f} {summary['latency_p95'] * 1000:>8.0f} "
+                    f"{summary['wall_clock']:>7.1f} {summary['successes']:>5}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark: bytes on the wire and decode time of /api/weather/history formats
+
+Encodes synthetic projected observation rows of one city as:
+
+- json: the row format (app.serialization.history_json)
+- columnar: format=columnar (history_columnar), delta-encoded timestamps and
+  dictionary-encoded condition/aqi_level
+- arrow: format=arrow (history_arrow), skipped if pyarrow is not installed
+
+and reports the body size, raw and gzipped (as served behind a compressing
+proxy), and the best of --repeat decode times:
+
+- py: json.loads of the body; for columnar also expanding timestamps and
+  dictionaries into plain lists; for arrow reading the IPC stream into a table
+- js: if node is on the PATH, JSON.parse in node; for columnar also
+  decodeColumnarHistory from frontend/src/services/columnar.js, i.e. what
+  the dashboard does before charting
+
+Checks that the columnar and arrow bodies decode to the same rows as json.
+
+Usage (from backend/):
+    python -m benchmarks.bench_history_columnar [--rows 1000,10000,100000] [--repeat 5]
+"""
+import argparse
+import gzip
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app import serialization
+from benchmarks.bench_history_serialization import projected_rows
+
+CITY = "Delhi"
+LOCATION_ID = "name:delhi"
+DECODER = Path(__file__).resolve().parents[2] / "frontend" / "src" / "services" / "columnar.js"
+
+# Times JSON.parse (and the frontend decoder for columnar) over a body file; prints the best ms
+NODE_SCRIPT = """
+import { readFileSync } from 'node:fs'
+const [decoderUrl, path, format, repeat] = process.argv.slice(1)
+const { decodeColumnarHistory } = await import(decoderUrl)
+const text = readFileSync(path, 'utf8')
+const decode = format === 'columnar' ? () => decodeColumnarHistory(JSON.parse(text)) : () => JSON.parse(text)
+let best = Infinity
+for (let i = 0; i < Number(repeat); i++) {
+  const start = performance.now()
+  decode()
+  best = Math.min(best, performance.now() - start)
+}
+console.log(best)
+"""
+
+
+def city_rows(count: int) -> List[Dict[str, Any]]:
+    """Projected rows (newest first) of a single city, as one history query returns them"""
+    rows = projected_rows(count)
+    for row in rows:
+        row["city"] = CITY
+        row["location_id"] = LOCATION_ID
+    return rows
+
+
+def decode_columnar(body: bytes) -> Dict[str, Any]:
+    """Columnar body to plain per-field lists (epoch ms timestamps, expanded strings)"""
+    content = json.loads(body)
+    first = content["timestamps"]["first"]
+    columns = {"timestamp": list(accumulate(content["timestamps"]["deltas"], initial=first)) if first is not None else []}
+    for field in serialization.COLUMNAR_NUMBERS:
+        columns[field] = content[field]
+    for field in serialization.COLUMNAR_DICTIONARIES:
+        values = content[field]["values"]
+        columns[field] = [None if code is None else values[code] for code in content[field]["codes"]]
+    return columns
+
+
+def decode_arrow(body: bytes):
+    return serialization.pa.ipc.open_stream(body).read_all()
+
+
+def check(bodies: Dict[str, bytes], rows: List[Dict[str, Any]]):
+    """Every format must carry the same observations"""
+    expected = [serialization.history_row(row) for row in rows]
+    epoch = datetime(1970, 1, 1)
+    columns = decode_columnar(bodies["columnar"])
+    decoded = [
+        {
+            **{field: columns[field][i] for field in columns if field != "timestamp"},
+            "timestamp": epoch + timedelta(milliseconds=columns["timestamp"][i]),
+        }
+        for i in range(len(expected))
+    ]
+    if decoded != [{field: row[field] for field in decoded[0]} for row in expected]:
+        raise SystemExit("✗ columnar body differs from the json rows")
+    if "arrow" in bodies:
+        table = decode_arrow(bodies["arrow"]).to_pylist()
+        for row in table:
+            row["timestamp"] = row["timestamp"].replace(tzinfo=None)
+        if table != [{field: row[field] for field in table[0]} for row in expected]:
+            raise SystemExit("✗ arrow body differs from the json rows")
+
+
+def best_of(run: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def node_decode_ms(node: str, body: bytes, format: str, repeat: int) -> Optional[float]:
+    """Best decode time in node, in ms (None for binary bodies)"""
+    if format == "arrow":
+        return None
+    with tempfile.NamedTemporaryFile(suffix=".json") as file:
+        file.write(body)
+        file.flush()
+        output = subprocess.run(
+            [node, "--input-type=module", "-e", NODE_SCRIPT, DECODER.as_uri(), file.name, format, str(repeat)],
+            capture_output=True, text=True, check=True
+        ).stdout
+    return float(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encoders = {
+        "json": lambda rows: serialization.history_json(CITY, rows),
+        "columnar": lambda rows: serialization.dumps(serialization.history_columnar(CITY, LOCATION_ID, rows)),
+    }
+    decoders = {"json": json.loads, "columnar": decode_columnar}
+    if serialization.arrow_available():
+        encoders["arrow"] = serialization.history_arrow
+        decoders["arrow"] = decode_arrow
+    else:
+        print("pyarrow not installed - skipping arrow")
+    node = shutil.which("node")
+    if node is None:
+        print("node not found - skipping js decode times")
+
+    print(f"{'rows':>8} {'format':>9} {'KiB':>8} {'gzip KiB':>9} {'py ms':>8} {'js ms':>8} {'size':>6} {'gzip':>6}")
+    for count in (int(rows) for rows in args.rows.split(",") if rows):
+        rows = city_rows(count)
+        bodies = {name: encode(rows) for name, encode in encoders.items()}
+        check(bodies, rows)
+        baseline = None
+        for name, body in bodies.items():
+            compressed = len(gzip.compress(body, 6))
+            baseline = baseline or (len(body), compressed)
+            python_ms = best_of(lambda: decoders[name](body), args.repeat) * 1000
+            js_ms = node_decode_ms(node, body, name, args.repeat) if node else None
+            print(
+                f"{count:>8} {name:>9} {len(body) / 1024:>8.0f} {compressed / 1024:>9.0f} {python_ms:>8.1f} "
+                f"{'-' if js_ms is None else f'{js_ms:.1f}':>8} "
+                f"{baseline[0] / len(body):>5.1f}x {baseline[1] / compressed:>5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: history query latency with and without the location/timestamp index
+
+Loads synthetic observations into a scratch collection on a local mongod at
+several sizes and times the history query used by get_weather_history,
+first with only the default _id index, then after ensure_indexes().
+
+Usage (from backend/, with mongod running):
+    python -m benchmarks.bench_history_index [--sizes 10000,100000,1000000] [--uri mongodb://localhost:27017/]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from app.database import WEATHER_PROJECTION, ensure_indexes
+from benchmarks.bench_mongo_ingest import BENCH_DB, synthetic_observations
+
+QUERIES = 50
+
+
+def load(collection, count: int):
+    batch = []
+    for doc in synthetic_observations(count):
+        batch.append(doc)
+        if len(batch) == 10000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+def time_history_queries(collection) -> float:
+    """Median latency (ms) of 7-day history queries over several cities"""
+    threshold = datetime.utcnow() - timedelta(days=7)
+    samples = []
+    for i in range(QUERIES):
+        start = time.perf_counter()
+        list(collection.find(
+            {"location_id": f"name:city{i % 100}", "timestamp": {"$gte": threshold}},
+            WEATHER_PROJECTION,
+            sort=[("timestamp", -1)]
+        ))
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    db = client[BENCH_DB]
+    print(f"{'documents':>10} {'no index ms':>12} {'indexed ms':>11} {'plan':>8}")
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            db.weather_data.drop()
+            load(db.weather_data, size)
+            unindexed = time_history_queries(db.weather_data)
+            ensure_indexes(db)
+            indexed = time_history_queries(db.weather_data)
+            plan = db.weather_data.find(
+                {"location_id": "name:city1", "timestamp": {"$gte": datetime.utcnow() - timedelta(days=7)}},
+                WEATHER_PROJECTION
+            ).sort("timestamp", -1).explain()
+            stages = str(plan["queryPlanner"]["winningPlan"])
+            scan = "ixscan" if "IXSCAN" in stages else "collscan"
+            print(f"{size:>10} {unindexed:>12.2f} {indexed:>11.2f} {scan:>8}")
+    finally:
+        client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: concurrent history reads, threadpool + pymongo vs Motor repository
+
+Loads synthetic observations into a scratch database on a local mongod and
+keeps a fixed number of 7-day history reads in flight:
+
+- threadpool: the previous path, blocking pymongo queries on a fixed
+  DB_EXECUTOR_WORKERS-thread pool (unbounded queue, so nothing is rejected)
+- motor: WeatherRepository.history() on an AsyncIOMotorClient
+
+Both clients use the same pool settings (client_options()). Reports
+throughput and latency percentiles per concurrency level. MOTOR_MAX_WORKERS
+sets Motor's own thread pool (default CPU count x 5).
+
+Usage (from backend/, with mongod running):
+    python -m benchmarks.bench_history_reads [--concurrency 50,100,250,500] [--requests 2000]
+        [--docs 100000] [--uri mongodb://localhost:27017/]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+from app.database import WEATHER_PROJECTION, DatabaseHealth, client_options, ensure_indexes
+from app.executor import DB_EXECUTOR_WORKERS
+from app.repository import WeatherRepository, history_filter
+from app.stats import percentile
+from benchmarks.bench_history_index import load
+from benchmarks.bench_mongo_ingest import BENCH_DB
+
+CITIES = 100
+
+
+async def drive(read: Callable[[str], Awaitable[object]], concurrency: int, requests: int) -> List[float]:
+    """Issue ``requests`` reads with ``concurrency`` in flight; returns latencies (seconds)"""
+    latencies: List[float] = []
+    next_request = 0
+
+    async def worker():
+        nonlocal next_request
+        while next_request < requests:
+            location_id = f"name:city{next_request % CITIES}"
+            next_request += 1
+            start = time.perf_counter()
+            await read(location_id)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def report(name: str, concurrency: int, latencies: List[float], elapsed: float):
+    p50, p95, p99 = (percentile(latencies, p) * 1000 for p in (50, 95, 99))
+    print(
+        f"{name:>10} {concurrency:>6} {len(latencies) / elapsed:>9.0f} "
+        f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f}"
+    )
+
+
+async def run(args, sync_db, motor_db):
+    since = datetime.utcnow() - timedelta(days=7)
+    pool = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS)
+    repository = WeatherRepository(health=DatabaseHealth(), database=lambda: motor_db)
+
+    def sync_history(location_id: str):
+        return list(sync_db.weather_data.find(
+            history_filter(location_id, since), WEATHER_PROJECTION, sort=[("timestamp", -1)]
+        ))
+
+    async def threadpool_read(location_id: str):
+        return await asyncio.get_running_loop().run_in_executor(pool, sync_history, location_id)
+
+    async def motor_read(location_id: str):
+        return await repository.history(location_id, since)
+
+    # Warm both connection pools
+    await drive(threadpool_read, 10, 100)
+    await drive(motor_read, 10, 100)
+
+    print(f"{'path':>10} {'in-flight':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            for name, read in (("threadpool", threadpool_read), ("motor", motor_read)):
+                start = time.perf_counter()
+                latencies = await drive(read, concurrency, args.requests)
+                report(name, concurrency, latencies, time.perf_counter() - start)
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="50,100,250,500")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    args = parser.parse_args()
+
+    options = client_options()
+    client = MongoClient(args.uri, **options)
+    db = client[BENCH_DB]
+    try:
+        db.weather_data.drop()
+        load(db.weather_data, args.docs)
+        ensure_indexes(db)
+
+        async def bench():
+            motor_client = AsyncIOMotorClient(args.uri, **options)
+            try:
+                await run(args, db, motor_client[BENCH_DB])
+            finally:
+                motor_client.close()
+
+        asyncio.run(bench())
+    finally:
+        client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: encoding /api/weather/history responses
+
+Encodes synthetic projected observation rows into a response body three ways:
+
+- pydantic: the previous path, a WeatherResponse per row wrapped in a
+  HistoricalWeatherResponse, then validated and encoded by FastAPI against the
+  route's response_model (serialize_response + JSONResponse)
+- fast-json: app.serialization.history_json with the json module
+- fast-orjson: the same with orjson (skipped if orjson is not installed)
+
+Checks that all bodies decode to the same JSON, then reports the best of
+--repeat runs per row count, in ms and rows/s.
+
+Usage (from backend/):
+    python -m benchmarks.bench_history_serialization [--rows 1000,10000,100000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import serialization
+from app.database import WEATHER_PROJECTION
+from app.models import HistoricalWeatherResponse, WeatherResponse
+from benchmarks.bench_mongo_ingest import synthetic_observations
+
+CITY = "City0"
+
+
+def projected_rows(count: int) -> List[Dict[str, Any]]:
+    """Rows as the history query returns them (projection applied, newest first)"""
+    fields = [field for field, include in WEATHER_PROJECTION.items() if include]
+    rows = [{field: doc[field] for field in fields} for doc in synthetic_observations(count)]
+    for row in rows:
+        # Mongo stores milliseconds
+        row["timestamp"] = row["timestamp"].replace(microsecond=row["timestamp"].microsecond // 1000 * 1000)
+    rows.reverse()
+    return rows
+
+
+response_field = create_response_field(name=f"Response_{HistoricalWeatherResponse.__name__}", type_=HistoricalWeatherResponse)
+
+
+def pydantic_body(rows: List[Dict[str, Any]]) -> bytes:
+    history = [WeatherResponse(**row) for row in rows]
+    content = asyncio.run(serialize_response(
+        field=response_field,
+        response_content=HistoricalWeatherResponse(city=CITY, data=history, next_cursor=None)
+    ))
+    return JSONResponse(content).body
+
+
+def fast_json_body(rows: List[Dict[str, Any]]) -> bytes:
+    encoder, serialization.orjson = serialization.orjson, None
+    try:
+        return serialization.history_json(CITY, rows)
+    finally:
+        serialization.orjson = encoder
+
+
+def fast_orjson_body(rows: List[Dict[str, Any]]) -> bytes:
+    return serialization.history_json(CITY, rows)
+
+
+def best_of(encode: Callable[[List[Dict[str, Any]]], bytes], rows: List[Dict[str, Any]], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encoders = {"pydantic": pydantic_body, "fast-json": fast_json_body}
+    if serialization.orjson_available():
+        encoders["fast-orjson"] = fast_orjson_body
+    else:
+        print("orjson not installed - skipping fast-orjson")
+
+    print(f"{'rows':>8} {'encoder':>12} {'ms':>9} {'rows/s':>11} {'speedup':>8} {'KiB':>8}")
+    for count in (int(rows) for rows in args.rows.split(",") if rows):
+        rows = projected_rows(count)
+        bodies = {name: encode(rows) for name, encode in encoders.items()}
+        expected = json.loads(bodies["pydantic"])
+        for name, body in bodies.items():
+            if json.loads(body) != expected:
+                raise SystemExit(f"✗ {name} body differs from the pydantic body")
+        baseline = None
+        for name, encode in encoders.items():
+            seconds = best_of(encode, rows, args.repeat)
+            baseline = baseline or seconds
+            print(
+                f"{count:>8} {name:>12} {seconds * 1000:>9.1f} {count / seconds:>11.0f} "
+                f"{baseline / seconds:>7.1f}x {len(bodies[name]) / 1024:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
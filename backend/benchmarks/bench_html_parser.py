@@ -0,0 +1,110 @@
+"""
+Benchmark: wttr.in HTML parser throughput and correctness
+
+Runs the original BeautifulSoup parser and every extractor backend in
+app.wttr_html over the saved pages in benchmarks/fixtures/wttr_html,
+checks that each backend returns exactly what the original returns (or
+fails with the same error), and prints pages parsed per second.
+
+Usage (from backend/):
+    python -m benchmarks.bench_html_parser [--seconds 2]
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from bs4 import BeautifulSoup
+
+from app.wttr_html import PRE_EXTRACTORS, parse_wttr_html
+
+FIXTURES = Path(__file__).parent / "fixtures" / "wttr_html"
+
+
+def original_parse_html_weather(html: str, city: str) -> Dict[str, Any]:
+    """The BeautifulSoup parser the scraper used before app.wttr_html (baseline)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    pre_tag = soup.find('pre')
+
+    if not pre_tag:
+        raise Exception("Could not find weather data in HTML")
+
+    text_content = pre_tag.get_text()
+
+    temp_match = re.search(r'(\+|-)?(\d+)\s*°C', text_content)
+    temp_c = float(temp_match.group(2)) if temp_match else 0
+    if temp_match and temp_match.group(1) == '-':
+        temp_c = -temp_c
+
+    humidity_match = re.search(r'Humidity[:\s]+(\d+)%', text_content, re.IGNORECASE)
+    humidity = float(humidity_match.group(1)) if humidity_match else 0
+
+    wind_match = re.search(r'Wind[:\s]+(\d+)\s*km/h', text_content, re.IGNORECASE)
+    wind_speed_kmh = float(wind_match.group(1)) if wind_match else 0
+
+    condition_match = re.search(r'(\w+(?:\s+\w+)*)', text_content)
+    condition = condition_match.group(1) if condition_match else "Unknown"
+
+    if temp_c == 0 and humidity == 0:
+        raise Exception("Could not parse weather data from HTML")
+
+    return {
+        "city": city.title(),
+        "temperature": temp_c,
+        "humidity": humidity,
+        "wind_speed": wind_speed_kmh,
+        "condition": condition,
+    }
+
+
+def outcome(parse, html: str):
+    """Parsed fields, or the error message if parsing failed"""
+    try:
+        return parse(html, "test city")
+    except Exception as e:
+        return f"error: {e}"
+
+
+def throughput(parse, pages, seconds: float) -> float:
+    """Pages parsed per second, cycling through the corpus"""
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for html in pages:
+            outcome(parse, html)
+        count += len(pages)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2, help="Time spent timing each parser")
+    args = parser.parse_args()
+
+    corpus = {path.name: path.read_text(encoding="utf-8") for path in sorted(FIXTURES.glob("*.html"))}
+    parsers = {"original": original_parse_html_weather}
+    for backend in PRE_EXTRACTORS:
+        parsers[backend] = lambda html, city, backend=backend: parse_wttr_html(html, city, backend=backend)
+
+    print(f"{len(corpus)} pages, {sum(len(html) for html in corpus.values()) / 1024:.0f} KiB")
+    mismatches = 0
+    for name, html in corpus.items():
+        expected = outcome(original_parse_html_weather, html)
+        for label, parse in parsers.items():
+            actual = outcome(parse, html)
+            if actual != expected:
+                mismatches += 1
+                print(f"✗ {name} [{label}]: {actual!r} != {expected!r}")
+    print(f"{'✓' if not mismatches else '✗'} correctness: {mismatches} mismatches against the original parser")
+
+    baseline = None
+    print(f"{'parser':<10} {'pages/s':>10} {'speedup':>8}")
+    for label, parse in parsers.items():
+        rate = throughput(parse, list(corpus.values()), args.seconds)
+        baseline = baseline or rate
+        print(f"{label:<10} {rate:>10.0f} {rate / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
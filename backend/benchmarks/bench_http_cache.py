@@ -0,0 +1,87 @@
+"""
+Benchmark: HTTP cache for repeated scrapes of the same cities
+
+Scrapes a set of cities several rounds in a row (as repeated scheduled runs
+do) against the local stub upstream, with the in-process response cache
+disabled so every round reaches the HTTP layer and provider order fixed
+so every round requests the same URLs, and compares:
+
+- no-cache: HTTP cache disabled (every round downloads full bodies)
+- etag: upstream sends ETags; stale entries are revalidated (304s)
+- max-age: upstream sends Cache-Control max-age; rounds after the first
+  are answered from disk without a request
+
+Reports bytes downloaded, mean round time and the cache's hit and
+revalidation rates.
+
+Usage (from backend/):
+    python -m benchmarks.bench_http_cache [--cities 50] [--rounds 5] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+
+from app.cache import ResponseCache
+from app.http_cache import HttpCache
+from app.scraper import AsyncWeatherScraper
+from benchmarks.stub_server import StubProcess
+
+SCENARIOS = [
+    ("no-cache", {}, 0),
+    ("etag", {"etag": True}, None),
+    ("max-age", {"max_age": 3600}, None),
+]
+
+
+async def run_rounds(url: str, http_cache: HttpCache, cities: int, rounds: int):
+    scraper = AsyncWeatherScraper(
+        base_url=url, waqi_base_url=url, cache=ResponseCache(ttls={}), http_cache=http_cache
+    )
+    # Fixed provider order, so every round requests the same URLs
+    scraper.providers.adaptive = False
+    names = [f"City{i}" for i in range(cities)]
+    round_times = []
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await asyncio.gather(*(scraper.scrape_weather(name) for name in names))
+            round_times.append(time.perf_counter() - start)
+    finally:
+        await scraper.close()
+    return round_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub response latency (seconds)")
+    args = parser.parse_args()
+
+    print(
+        f"{'scenario':>9} {'KB down':>9} {'first s':>8} {'repeat s':>9} "
+        f"{'hits':>6} {'304s':>6} {'reval rate':>10} {'KB saved':>9}"
+    )
+    for name, stub_options, max_bytes in SCENARIOS:
+        directory = tempfile.mkdtemp(prefix="bench_http_cache_")
+        try:
+            kwargs = {"max_bytes": max_bytes} if max_bytes is not None else {}
+            http_cache = HttpCache(directory, **kwargs)
+            with StubProcess(latency=args.latency, **stub_options) as stub:
+                round_times = asyncio.run(run_rounds(stub.url, http_cache, args.cities, args.rounds))
+            stats = http_cache.stats()
+            repeat = sum(round_times[1:]) / max(1, len(round_times) - 1)
+            rate = stats["revalidation_hit_rate"]
+            print(
+                f"{name:>9} {stats['bytes_downloaded'] / 1024:>9.1f} {round_times[0]:>8.3f} {repeat:>9.3f} "
+                f"{stats['hits']:>6} {stats['revalidated']:>6} {rate if rate is not None else '-':>10} "
+                f"{stats['bytes_saved'] / 1024:>9.1f}"
+            )
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
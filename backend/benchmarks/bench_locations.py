@@ -0,0 +1,126 @@
+"""
+Benchmark: upstream fetches and storage keys with location canonicalization
+
+Replays a request mix in which every place is asked for in several forms
+(case, spacing and trailing-whitespace variants of a city name; GPS fixes
+jittered around a point, at varying precision) against the local stub
+upstream, with a response cache that never expires, and compares:
+
+- title-case: keys as before location IDs (``city.strip().title()``)
+- location-id: keys from app.locations (names resolved to grid cells,
+  coordinates snapped to the grid)
+
+Reports upstream weather fetches and distinct storage keys, i.e. index
+ranges a history query for one place has to cover.
+
+Usage (from backend/):
+    python -m benchmarks.bench_locations [--places 20] [--requests 2000] [--grid 0.1]
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.cache import ResponseCache
+from app.http_cache import HttpCache
+from app.locations import Location, LocationResolver
+from app.scraper import AsyncWeatherScraper
+from benchmarks.stub_server import StubServer
+
+
+class TitleCaseKeys(LocationResolver):
+    """Keys as before location IDs: the stripped, title-cased query"""
+
+    def resolve(self, query: str, refresh: bool = False) -> Location:
+        key = query.strip().title()
+        return Location(key, key, query.strip())
+
+    def learn(self, query: str, area: Optional[Dict[str, Any]]) -> Location:
+        return self.resolve(query)
+
+
+def spellings(name: str) -> List[str]:
+    return [name, name.lower(), name.upper(), f" {name} ", name.replace(" ", "  ")]
+
+
+def workload(places: int, requests: int, seed: int = 7) -> List[Tuple[int, str]]:
+    """(place index, query) pairs: half named places, half GPS points"""
+    rng = random.Random(seed)
+    named = [f"Stub City {i}" for i in range(places // 2)]
+    points = [(rng.uniform(-60, 60), rng.uniform(-170, 170)) for _ in range(places - len(named))]
+    mix = []
+    for _ in range(requests):
+        place = rng.randrange(places)
+        if place < len(named):
+            query = rng.choice(spellings(named[place]))
+        else:
+            latitude, longitude = points[place - len(named)]
+            # Fixes scattered within ~1 km, reported at 2-6 decimals
+            decimals = rng.randint(2, 6)
+            query = (
+                f"{latitude + rng.uniform(-0.004, 0.004):.{decimals}f},"
+                f"{longitude + rng.uniform(-0.004, 0.004):.{decimals}f}"
+            )
+        mix.append((place, query))
+    return mix
+
+
+async def replay(url: str, resolver: LocationResolver, mix: List[Tuple[int, str]], cache_dir: str):
+    scraper = AsyncWeatherScraper(
+        base_url=url, waqi_base_url=url,
+        cache=ResponseCache(ttls={"weather": 1e9, "aqi": 1e9}),
+        http_cache=HttpCache(directory=cache_dir, max_bytes=0),
+        locations=resolver
+    )
+    scraper.providers.adaptive = False
+    fetches = 0
+    send = scraper._send
+
+    async def counting_send(request_url: str, provider: str, headers=None):
+        nonlocal fetches
+        if provider.startswith("wttr"):
+            fetches += 1
+        return await send(request_url, provider, headers)
+
+    scraper._send = counting_send
+    keys: Dict[int, set] = {}
+    try:
+        for place, query in mix:
+            weather = await scraper.scrape_weather(query)
+            keys.setdefault(place, set()).add(weather.get("location_id") or weather["city"])
+    finally:
+        await scraper.close()
+    return fetches, keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--grid", type=float, default=0.1, help="Grid cell size in degrees")
+    args = parser.parse_args()
+
+    mix = workload(args.places, args.requests)
+    cache_dir = tempfile.mkdtemp(prefix="bench_locations_")
+    print(f"{args.requests} requests for {args.places} places, grid {args.grid} degrees")
+    print(f"{'keys':>12} {'fetches':>8} {'keys':>6} {'keys/place':>11} {'max/place':>10}")
+    try:
+        with StubServer(latency=0) as stub:
+            for name, resolver in (
+                ("title-case", TitleCaseKeys()),
+                ("location-id", LocationResolver(grid=args.grid)),
+            ):
+                fetches, keys = asyncio.run(replay(stub.url, resolver, mix, cache_dir))
+                total = sum(len(place_keys) for place_keys in keys.values())
+                print(
+                    f"{name:>12} {fetches:>8} {total:>6} {total / len(keys):>11.1f} "
+                    f"{max(len(place_keys) for place_keys in keys.values()):>10}"
+                )
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
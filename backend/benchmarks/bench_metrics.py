@@ -0,0 +1,106 @@
+"""
+Benchmark: instrumentation overhead
+
+Measures the per-call cost of the metrics primitives used on the hot path,
+then the per-request cost of MetricsMiddleware on a minimal FastAPI app
+(in-process ASGI transport, no network).
+
+Usage (from backend/):
+    python -m benchmarks.bench_metrics [--calls 200000] [--requests 2000] [--rounds 5]
+
+Request costs are the median of several interleaved rounds, since a single
+run is dominated by scheduling noise.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.metrics import MONGO_LATENCY, MetricsMiddleware, Trace, current_trace, record_stage, stage
+
+
+def per_call(fn, calls: int) -> float:
+    """Average cost of fn() in microseconds"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def with_stage():
+    with stage("bench", MONGO_LATENCY, operation="bench"):
+        pass
+
+
+def primitives(calls: int):
+    child = MONGO_LATENCY.labels(operation="bench")
+    rows = [
+        ("baseline (empty call)", per_call(lambda: None, calls)),
+        ("histogram observe", per_call(lambda: child.observe(0.001), calls)),
+        ("record_stage, no trace", per_call(lambda: record_stage("bench", 0.001), calls)),
+        ("stage(), no trace", per_call(with_stage, calls)),
+    ]
+    token = current_trace.set(Trace())
+    rows.append(("stage(), traced", per_call(with_stage, calls)))
+    current_trace.reset(token)
+    return rows
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+async def request_costs(requests: int, rounds: int):
+    """Median request latency in microseconds, (plain, instrumented)"""
+    costs = {False: [], True: []}
+    clients = {
+        instrumented: httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=build_app(instrumented)), base_url="http://bench"
+        )
+        for instrumented in costs
+    }
+    for client in clients.values():
+        for _ in range(200):  # warm up
+            await client.get("/ping")
+    for _ in range(rounds):
+        for instrumented, client in clients.items():
+            start = time.perf_counter()
+            for _ in range(requests):
+                await client.get("/ping")
+            costs[instrumented].append((time.perf_counter() - start) / requests * 1e6)
+    for client in clients.values():
+        await client.aclose()
+    return statistics.median(costs[False]), statistics.median(costs[True])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'primitive':<26} {'us/call':>8}")
+    for label, cost in primitives(args.calls):
+        print(f"{label:<26} {cost:>8.2f}")
+
+    plain, instrumented = asyncio.run(request_costs(args.requests, args.rounds))
+    print(f"\n{'request':<26} {'us/req':>8}")
+    print(f"{'without middleware':<26} {plain:>8.1f}")
+    print(f"{'with MetricsMiddleware':<26} {instrumented:>8.1f}")
+    print(f"{'overhead':<26} {instrumented - plain:>8.1f}  ({(instrumented - plain) / plain * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
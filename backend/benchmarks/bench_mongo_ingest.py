@@ -0,0 +1,86 @@
+"""
+Benchmark: per-document insert_one vs BufferedWriter batches
+
+Ingests synthetic observations into a scratch collection on a local mongod
+and reports documents/sec for both strategies.
+
+Usage (from backend/, with mongod running):
+    python -m benchmarks.bench_mongo_ingest [--docs 10000] [--uri mongodb://localhost:27017/]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from app.writer import BufferedWriter
+
+BENCH_DB = "weather_bench"
+
+
+def synthetic_observations(count: int):
+    start = datetime.utcnow() - timedelta(days=30)
+    cities = [f"City{i}" for i in range(100)]
+    for i in range(count):
+        yield {
+            "_id": ObjectId(),
+            "location_id": f"name:{cities[i % len(cities)].lower()}",
+            "city": cities[i % len(cities)],
+            "temperature": round(random.uniform(-10, 45), 1),
+            "humidity": float(random.randint(10, 100)),
+            "wind_speed": float(random.randint(0, 60)),
+            "condition": random.choice(["Sunny", "Partly cloudy", "Mist", "Light rain"]),
+            "aqi": random.randint(10, 400),
+            "aqi_level": "Moderate",
+            "timestamp": start + timedelta(minutes=i),
+        }
+
+
+def bench_insert_one(collection, docs) -> float:
+    start = time.perf_counter()
+    for doc in docs:
+        collection.insert_one(doc)
+    return time.perf_counter() - start
+
+
+def bench_buffered(collection, docs, batch_size: int) -> float:
+    writer = BufferedWriter(lambda: collection, batch_size=batch_size, flush_interval=1, name="bench")
+    start = time.perf_counter()
+    for doc in docs:
+        writer.add(doc)
+    writer.close()
+    elapsed = time.perf_counter() - start
+    stats = writer.stats()
+    print(f"    {stats['flushes']} flushes, {stats['failed']} failed, "
+          f"flush p50 {stats['flush_latency_ms']['p50']}ms p95 {stats['flush_latency_ms']['p95']}ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    db = client[BENCH_DB]
+    try:
+        db.ingest.drop()
+        docs = list(synthetic_observations(args.docs))
+        elapsed = bench_insert_one(db.ingest, docs)
+        print(f"insert_one per document:  {args.docs / elapsed:>10.0f} docs/s ({elapsed:.2f}s)")
+
+        for batch_size in (100, 500, 1000):
+            db.ingest.drop()
+            docs = list(synthetic_observations(args.docs))
+            elapsed = bench_buffered(db.ingest, docs, batch_size)
+            print(f"buffered, batch {batch_size:>5}:  {args.docs / elapsed:>10.0f} docs/s ({elapsed:.2f}s)")
+    finally:
+        client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: end-to-end scrape latency as providers are added, removed or slowed
+
+Runs sequential scrapes against fake providers (no network) for a set of
+scenarios, once with static priority ordering and once with the adaptive
+registry ordering, and prints latency percentiles and the final order.
+
+Usage (from backend/):
+    python -m benchmarks.bench_providers [--requests 60] [--explore-rate 0.2]
+
+The explore rate is raised from the production default so the short runs
+give fallbacks enough samples to be ranked.
+"""
+import argparse
+import asyncio
+import time
+
+from app.providers import AQI, WEATHER
+from app.stats import percentile
+from benchmarks.fake_providers import FakeProvider, fake_scraper
+
+
+def baseline(**overrides):
+    """Two weather and two AQI providers; keyword args replace providers by name"""
+    providers = {
+        "weather_a": FakeProvider("weather_a", WEATHER, priority=10, latency=0.05),
+        "weather_b": FakeProvider("weather_b", WEATHER, priority=20, latency=0.08),
+        "aqi_a": FakeProvider("aqi_a", AQI, priority=10, latency=0.04),
+        "aqi_b": FakeProvider("aqi_b", AQI, priority=20, latency=0.06),
+    }
+    providers.update(overrides)
+    return [provider for provider in providers.values() if provider is not None]
+
+
+SCENARIOS = {
+    "baseline": lambda: baseline(),
+    "weather_a slowed": lambda: baseline(weather_a=FakeProvider("weather_a", WEATHER, priority=10, latency=0.6)),
+    "weather_a failing": lambda: baseline(
+        weather_a=FakeProvider("weather_a", WEATHER, priority=10, latency=0.05, failure_rate=1.0)
+    ),
+    "aqi_a slowed": lambda: baseline(aqi_a=FakeProvider("aqi_a", AQI, priority=10, latency=1.5)),
+    "weather_c added": lambda: baseline(weather_c=FakeProvider("weather_c", WEATHER, priority=30, latency=0.02)),
+    "weather_a removed": lambda: baseline(weather_a=None),
+}
+
+
+async def run(providers, adaptive: bool, requests: int, explore_rate: float):
+    scraper = fake_scraper(providers, adaptive=adaptive)
+    scraper.providers.explore_rate = explore_rate
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        await scraper.scrape_weather(f"City{i}")
+        latencies.append(time.perf_counter() - start)
+    order = {kind: [p.name for p in scraper.providers.ordered(kind, explore=False)] for kind in (WEATHER, AQI)}
+    calls = sum(p.calls for p in providers)
+    await scraper.close()
+    return latencies, order, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--explore-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.requests} sequential scrapes per run")
+    print(f"{'scenario':<20} {'ordering':<9} {'p50 ms':>8} {'p95 ms':>8} {'calls':>6}  final order (weather | aqi)")
+    for name, build in SCENARIOS.items():
+        for adaptive in (False, True):
+            latencies, order, calls = asyncio.run(run(build(), adaptive, args.requests, args.explore_rate))
+            print(
+                f"{name:<20} {'adaptive' if adaptive else 'static':<9} "
+                f"{percentile(latencies, 50) * 1000:>8.0f} {percentile(latencies, 95) * 1000:>8.0f} {calls:>6}  "
+                f"{', '.join(order[WEATHER])} | {', '.join(order[AQI])}"
+            )
+
+
+if __name__ == "__main__":
+    main()
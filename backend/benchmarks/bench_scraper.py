@@ -0,0 +1,133 @@
+"""
+Benchmark: blocking scraper (before) vs AsyncWeatherScraper
+
+Both scrapers are driven by N concurrent asyncio clients, mirroring how the
+FastAPI route calls them, against a stub upstream with fixed latency. The
+blocking baseline runs on the event loop (as the route did before), so its
+clients serialize; the async scraper overlaps them on pooled keep-alive
+connections, so its throughput should grow with concurrency until the
+connection limits are reached.
+
+The async scraper gets its own in-memory location resolver and a temporary,
+disabled HTTP cache, so results depend neither on MongoDB nor on cache state
+left by earlier runs.
+
+Usage (from backend/):
+    python -m benchmarks.bench_scraper [--latency 0.02] [--requests 200]
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.http_cache import HttpCache
+from app.locations import LocationResolver
+from app.scraper import DEFAULT_USER_AGENT, AsyncWeatherScraper, parse_json_weather, parse_waqi_feed, parse_waqi_search
+from benchmarks.stub_server import StubServer
+
+CONCURRENCY_LEVELS = [1, 10, 100]
+
+
+class BlockingWeatherScraper:
+    """
+    The scraper before app.scraper went async (baseline): one blocking
+    request per upstream call on a fresh connection, weather then AQI in
+    sequence. httpx.get stands in for requests.get, with the same behaviour.
+    """
+
+    def __init__(self, base_url: str, waqi_base_url: str):
+        self.base_url = base_url
+        self.openaq_base_url = base_url
+        self.waqi_base_url = waqi_base_url
+        self.headers = {"User-Agent": DEFAULT_USER_AGENT}
+
+    def scrape_weather(self, city: str) -> Dict[str, Any]:
+        response = httpx.get(
+            f"{self.base_url}/{city.strip()}?format=j1",
+            headers={**self.headers, "Accept": "application/json"}, timeout=30
+        )
+        response.raise_for_status()
+        weather_data = parse_json_weather(response.json(), city)
+        aqi_data = self._get_aqi(city)
+        return {**weather_data, "aqi": aqi_data.get("aqi"), "aqi_level": aqi_data.get("level")}
+
+    def _get_aqi(self, city: str) -> Dict[str, Optional[Any]]:
+        # OpenAQ was queried first, though its answer was never used
+        try:
+            httpx.get(f"{self.openaq_base_url}/v2/locations?limit=1&city={city}", headers=self.headers, timeout=8)
+        except Exception:
+            pass
+        for url, parse in (
+            (f"{self.waqi_base_url}/feed/{city}/?token=demo", parse_waqi_feed),
+            (f"{self.waqi_base_url}/search/?token=demo&keyword={city}", parse_waqi_search),
+        ):
+            try:
+                response = httpx.get(url, headers=self.headers, timeout=8)
+                result = parse(response.json()) if response.is_success else None
+            except Exception:
+                continue
+            if result:
+                return result
+        return {"aqi": None, "level": None}
+
+
+async def _drive(call, concurrency: int, total: int) -> float:
+    """Issue ``total`` scrapes from ``concurrency`` clients, return requests/sec"""
+    remaining = iter(range(total))
+
+    async def client(client_id: int):
+        for i in remaining:
+            await call(f"City{client_id}-{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def bench_old(url: str, concurrency: int, total: int) -> float:
+    scraper = BlockingWeatherScraper(base_url=url, waqi_base_url=url)
+
+    async def call(city):
+        scraper.scrape_weather(city)
+
+    return await _drive(call, concurrency, total)
+
+
+async def bench_new(url: str, concurrency: int, total: int, cache_dir: str) -> float:
+    scraper = AsyncWeatherScraper(
+        base_url=url, waqi_base_url=url,
+        http_cache=HttpCache(directory=cache_dir, max_bytes=0),
+        locations=LocationResolver()
+    )
+    try:
+        return await _drive(scraper.scrape_weather, concurrency, total)
+    finally:
+        await scraper.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub latency per upstream call (s)")
+    parser.add_argument("--requests", type=int, default=200, help="Scrapes per run")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="bench_scraper_")
+    try:
+        with StubServer(latency=args.latency) as stub:
+            print(f"Stub upstream at {stub.url}, latency {args.latency * 1000:.0f} ms/call")
+            print(f"{'clients':>8} {'old req/s':>12} {'new req/s':>12} {'speedup':>9}")
+            for concurrency in CONCURRENCY_LEVELS:
+                total = max(args.requests, concurrency)
+                old = asyncio.run(bench_old(stub.url, concurrency, min(total, 50)))
+                new = asyncio.run(bench_new(stub.url, concurrency, total, cache_dir))
+                print(f"{concurrency:>8} {old:>12.1f} {new:>12.1f} {new / old:>8.1f}x")
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
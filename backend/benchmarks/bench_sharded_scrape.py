@@ -0,0 +1,152 @@
+"""
+Benchmark: sharded daily scrape across worker processes (needs a MongoDB server)
+
+Runs app.leases.run_sharded_cycle in 1, 2, 4, ... worker processes against
+a real MongoDB, with a simulated scrape (a fixed delay per city, recorded in
+a collection), and checks that:
+
+- every city is scraped exactly once per cycle
+- wall-clock time falls near-linearly with the number of workers
+  (efficiency = speedup / workers, at least --min-efficiency)
+
+With --crash, one worker dies (no release, no heartbeat) halfway through its
+first shard: the other workers must take the shard over once its lease
+expires, so every city is still scraped, and only that shard's cities may be
+scraped twice.
+
+Uses (and drops) the database given by --db. Exits non-zero if a check fails.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sharded_scrape [--uri mongodb://localhost:27017] [--workers 1,2,4,8]
+        [--cities 640] [--shards 64] [--latency 0.02] [--crash]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+from pymongo import MongoClient
+
+from app.leases import LeaseTable, run_sharded_cycle, shard_of
+
+CYCLE = "bench"
+
+
+def city_name(index: int) -> str:
+    return f"city {index}"
+
+
+def worker(uri: str, db_name: str, name: str, cities: int, shards: int, latency: float,
+           ttl: float, start_at: float, crash: bool):
+    client = MongoClient(uri)
+    db = client[db_name]
+    by_shard = defaultdict(list)
+    for index in range(cities):
+        by_shard[shard_of(city_name(index), shards)].append(city_name(index))
+    leases = LeaseTable(lambda: db, ttl=ttl, worker_id=name)
+    leases.start(ttl / 3)
+
+    def scrape_shard(shard: int):
+        for position, city in enumerate(by_shard.get(shard, [])):
+            if crash and position >= len(by_shard[shard]) // 2:
+                # Die holding the lease: no release, no more heartbeats
+                os._exit(1)
+            time.sleep(latency)
+            db.scrapes.insert_one({"city": city, "shard": shard, "worker": name})
+
+    time.sleep(max(0.0, start_at - time.time()))
+    ran = run_sharded_cycle(leases, "daily", CYCLE, shards, scrape_shard, poll_interval=0.2)
+    db.workers_done.insert_one({"worker": name, "shards": len(ran), "finished_at": time.time()})
+    leases.stop()
+    client.close()
+
+
+def run(args, workers: int, crash: bool):
+    """Run one cycle with ``workers`` processes; returns (seconds, scrapes per city, crashed shards, incomplete shards)"""
+    client = MongoClient(args.uri)
+    client.drop_database(args.db)
+    context = multiprocessing.get_context("spawn")
+    # Give every process time to start before the cycle begins
+    start_at = time.time() + 2 + 0.2 * workers
+    processes = [
+        context.Process(target=worker, args=(
+            args.uri, args.db, f"worker-{i}", args.cities, args.shards, args.latency,
+            args.ttl, start_at, crash and i == 0
+        ))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    db = client[args.db]
+    finished = [doc["finished_at"] for doc in db.workers_done.find()]
+    seconds = max(finished) - start_at if finished else float("nan")
+    counts = Counter({city_name(index): 0 for index in range(args.cities)})
+    crashed_shards = set()
+    for doc in db.scrapes.find({}, {"city": 1, "worker": 1, "shard": 1}):
+        counts[doc["city"]] += 1
+        if doc["worker"] == "worker-0" and crash:
+            crashed_shards.add(doc["shard"])
+    incomplete = db.scheduler_leases.count_documents({"cycle": {"$ne": CYCLE}})
+    client.drop_database(args.db)
+    client.close()
+    return seconds, counts, crashed_shards, incomplete
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="bench_sharded_scrape")
+    parser.add_argument("--workers", default="1,2,4,8", help="Worker process counts to try")
+    parser.add_argument("--cities", type=int, default=640)
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated seconds per city scrape")
+    parser.add_argument("--ttl", type=float, default=3, help="Lease TTL in seconds")
+    parser.add_argument("--min-efficiency", type=float, default=0.7)
+    parser.add_argument("--crash", action="store_true", help="Also run a cycle in which one worker dies")
+    args = parser.parse_args()
+
+    failures = []
+    baseline = None
+    print(f"{args.cities} cities in {args.shards} shards, {args.latency * 1000:.0f}ms per scrape")
+    print(f"{'workers':>8} {'seconds':>8} {'speedup':>8} {'efficiency':>11} {'once':>5}")
+    for workers in [int(count) for count in args.workers.split(",") if count]:
+        seconds, counts, _, incomplete = run(args, workers, crash=False)
+        # Relative to the first worker count, assuming it scales linearly
+        baseline = baseline or seconds * workers
+        speedup = baseline / seconds
+        once = all(count == 1 for count in counts.values()) and not incomplete
+        print(f"{workers:>8} {seconds:>8.2f} {speedup:>8.2f} {speedup / workers:>11.2f} {'yes' if once else 'NO':>5}")
+        if not once:
+            failures.append(f"{workers} workers: cities not scraped exactly once {sorted(set(counts.values()))}")
+        if speedup / workers < args.min_efficiency:
+            failures.append(f"{workers} workers: efficiency {speedup / workers:.2f} < {args.min_efficiency}")
+
+    if args.crash:
+        workers = 4
+        seconds, counts, crashed_shards, incomplete = run(args, workers, crash=True)
+        missed = [city for city, count in counts.items() if count == 0]
+        repeated = {city for city, count in counts.items() if count > 1}
+        outside = {city for city in repeated if shard_of(city, args.shards) not in crashed_shards}
+        print(
+            f"crash: {workers} workers, one died mid-shard; {seconds:.2f}s, {len(missed)} missed, "
+            f"{len(repeated)} scraped twice (crashed shard {sorted(crashed_shards)})"
+        )
+        if missed or incomplete:
+            failures.append(f"crash: {len(missed)} cities never scraped, {incomplete} shards incomplete")
+        if outside:
+            failures.append(f"crash: {len(outside)} cities outside the crashed shard scraped twice")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✓ Every city scraped exactly once per cycle")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: write-ahead spool overhead and replay throughput
+
+1. Append cost on the scrape path: per-document latency of
+   WriteAheadSpool.append under each fsync policy, next to
+   BufferedWriter.add (the in-memory path used while MongoDB is up).
+2. Replay throughput: documents per second read back from the spool and
+   handed to a write function in batches. Without --uri the sink discards
+   the batches (spool read + decode cost only); with --uri each batch is
+   deduplicated against stored (location_id, timestamp) and inserted into a
+   scratch collection, as services._replay_spooled does.
+
+Usage (from backend/):
+    python -m benchmarks.bench_spool [--appends 2000] [--replay 100000] [--batch 1000]
+        [--uri mongodb://localhost:27017/]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from app.spool import FSYNC_POLICIES, WriteAheadSpool
+from app.stats import percentile
+from app.writer import BufferedWriter
+from benchmarks.bench_mongo_ingest import BENCH_DB, synthetic_observations
+
+
+def observation_key(doc: Dict[str, Any]) -> tuple:
+    return doc["location_id"], doc["timestamp"]
+
+
+def bench_appends(directory: str, count: int):
+    print(f"{'path':>22} {'docs/s':>10} {'p50 us':>9} {'p99 us':>9}")
+
+    writer = BufferedWriter(lambda: None, batch_size=count + 1, flush_interval=3600)
+    samples = []
+    for doc in synthetic_observations(count):
+        start = time.perf_counter()
+        writer.add(doc)
+        samples.append(time.perf_counter() - start)
+    report("BufferedWriter.add", samples)
+
+    for policy in FSYNC_POLICIES:
+        spool = WriteAheadSpool(os.path.join(directory, policy), key=observation_key, fsync=policy)
+        samples = []
+        for doc in synthetic_observations(count):
+            start = time.perf_counter()
+            spool.append(doc)
+            samples.append(time.perf_counter() - start)
+        spool.close()
+        report(f"spool fsync={policy}", samples)
+
+
+def report(name: str, samples: List[float]):
+    total = sum(samples)
+    print(
+        f"{name:>22} {len(samples) / total:>10.0f} "
+        f"{percentile(samples, 50) * 1e6:>9.1f} {percentile(samples, 99) * 1e6:>9.1f}"
+    )
+
+
+def bench_replay(directory: str, count: int, batch_size: int, uri: str):
+    spool = WriteAheadSpool(os.path.join(directory, "replay"), key=observation_key, fsync="never")
+    docs = list(synthetic_observations(count))
+    start = time.perf_counter()
+    spool.extend(docs)
+    spool.close()
+    print(f"\nspooled {count} documents in {time.perf_counter() - start:.2f}s ({spool.stats()['segments']} segments)")
+
+    client = None
+    if uri:
+        from pymongo import MongoClient
+
+        client = MongoClient(uri)
+        collection = client[BENCH_DB].weather_data
+        collection.drop()
+        collection.create_index([("location_id", 1), ("timestamp", -1)])
+        writer = BufferedWriter(lambda: collection)
+
+        def write(batch: List[Dict[str, Any]]):
+            stored = {
+                (doc["location_id"], doc["timestamp"])
+                for doc in collection.find(
+                    {
+                        "location_id": {"$in": list({doc["location_id"] for doc in batch})},
+                        "timestamp": {"$in": [doc["timestamp"] for doc in batch]},
+                    },
+                    {"_id": 0, "location_id": 1, "timestamp": 1}
+                )
+            }
+            fresh = [doc for doc in batch if (doc["location_id"], doc["timestamp"]) not in stored]
+            if fresh:
+                writer.write(fresh)
+        sink = "mongod"
+    else:
+        def write(batch: List[Dict[str, Any]]):
+            pass
+        sink = "discard"
+
+    try:
+        start = time.perf_counter()
+        replayed = spool.replay(write, batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"replayed {replayed} documents into {sink} in {elapsed:.2f}s ({replayed / elapsed:.0f} docs/s)")
+    finally:
+        if client is not None:
+            client.drop_database(BENCH_DB)
+            client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appends", type=int, default=2000)
+    parser.add_argument("--replay", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--uri", default=None, help="Replay into this mongod instead of discarding")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_spool_")
+    try:
+        bench_appends(directory, args.appends)
+        bench_replay(directory, args.replay, args.batch, args.uri)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
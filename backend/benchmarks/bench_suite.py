@@ -0,0 +1,358 @@
+"""
+Offline end-to-end benchmark suite with JSON reports
+
+Runs each scenario against a fresh API process (uvicorn) whose upstreams
+point at a stub server replaying the recorded fixtures (wttr.in j1 and
+HTML, WAQI), with configurable latency, jitter and fault injection:
+
+- weather_hot: /api/weather for a small set of cities (response cache hits)
+- weather_cold: /api/weather for never-repeated cities (an upstream fetch each)
+- weather_faulty: as weather_cold, with upstream errors and dropped connections
+- history: /api/weather/history over synthetic observations (needs --mongodb-uri)
+- scheduler: the scheduled batch scrape (app.scheduler.scrape_batch) over
+  --scheduler-cities cities, in its own process
+
+HTTP scenarios keep --concurrency requests in flight for --duration seconds.
+Each scenario reports throughput, latency percentiles, the status mix and
+the memory of the process under test (resident at the end, and peak). The
+report is written as JSON, tagged with the git commit, so runs can be
+compared: --compare OLD.json prints the changes and exits non-zero if
+throughput dropped, or p95 latency or peak memory grew, by more than
+--tolerance.
+
+Without --mongodb-uri the API runs with MongoDB unreachable (observations
+are spooled) and the history scenario is skipped.
+
+Usage (from backend/):
+    python -m benchmarks.bench_suite [--scenarios weather_hot,weather_cold,...] [--duration 10]
+        [--concurrency 50] [--latency 0.05] [--jitter 0.05] [--error-rate 0.2] [--drop-rate 0.05]
+        [--mongodb-uri mongodb://localhost:27017] [--output report.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from app.stats import percentile
+from benchmarks.load_health import free_port
+from benchmarks.stub_server import StubProcess
+
+RESULTS = Path(__file__).parent / "results"
+SCENARIOS = ["weather_hot", "weather_cold", "weather_faulty", "history", "scheduler"]
+HOT_CITIES = 20
+HISTORY_DB = "weather_bench_suite"
+UNREACHABLE_MONGODB_URI = "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=300"
+
+
+def memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak resident memory of a process (Linux /proc; None elsewhere)"""
+    values: Dict[str, Optional[float]] = {"rss": None, "peak": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    values["rss"] = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    values["peak"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def api_env(upstream: str, mongodb_uri: Optional[str], scratch: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "WTTR_BASE_URL": upstream,
+        "WAQI_BASE_URL": upstream,
+        "MONGODB_URI": mongodb_uri or UNREACHABLE_MONGODB_URI,
+        "MONGODB_DB_NAME": HISTORY_DB,
+        "SPOOL_DIR": os.path.join(scratch, "spool"),
+        "HTTP_CACHE_DIR": os.path.join(scratch, "http_cache"),
+        # No background refreshes or leases adding load of their own
+        "REFRESH_BUDGET_PER_MINUTE": "0",
+        "SCHEDULER_SHARDS": "0",
+        # The stub serves wttr.in and WAQI from one host; allow what two hosts would get
+        "HTTP_MAX_CONNECTIONS_PER_HOST": "40",
+    }
+
+
+def start_api(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("API did not start")
+
+
+async def drive(url: str, request: Callable[[int], tuple], concurrency: int, duration: float, warmup: float):
+    """
+    Closed-loop load: ``concurrency`` clients issuing ``request(n)`` -> (path, params)
+
+    Returns:
+        (latencies of requests started after warm-up, status counts, measured seconds)
+    """
+    counter = itertools.count()
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    begin = time.perf_counter()
+    measure_from = begin + warmup
+    until = measure_from + duration
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        async def client_loop():
+            while (start := time.perf_counter()) < until:
+                path, params = request(next(counter))
+                try:
+                    status = (await client.get(path, params=params)).status_code
+                except httpx.HTTPError:
+                    status = "error"
+                if start >= measure_from:
+                    statuses[status] += 1
+                    latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - measure_from
+
+
+def summarize(latencies: List[float], statuses: Counter, seconds: float) -> Dict[str, Any]:
+    requests = sum(statuses.values())
+    errors = sum(count for status, count in statuses.items() if status == "error" or status >= 400)
+
+    def ms(pct):
+        value = percentile(latencies, pct)
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "requests": requests,
+        "seconds": round(seconds, 2),
+        "throughput_rps": round(requests / seconds, 1) if seconds > 0 else None,
+        "latency_ms": {
+            "p50": ms(50), "p90": ms(90), "p95": ms(95), "p99": ms(99),
+            "max": round(max(latencies) * 1000, 2) if latencies else None,
+        },
+        "status": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else None,
+    }
+
+
+def seed_history(mongodb_uri: str, docs: int):
+    """Load synthetic observations (location IDs name:city0..99) into the suite's database"""
+    from pymongo import MongoClient
+
+    from app.database import ensure_indexes
+    from benchmarks.bench_history_index import load
+
+    client = MongoClient(mongodb_uri)
+    client.drop_database(HISTORY_DB)
+    db = client[HISTORY_DB]
+    load(db.weather_data, docs)
+    ensure_indexes(db)
+    client.close()
+
+
+def run_http_scenario(name: str, args, scratch: str) -> Dict[str, Any]:
+    faulty = name == "weather_faulty"
+    stub = StubProcess(
+        latency=args.latency, recorded=True, jitter=args.jitter,
+        error_rate=args.error_rate if faulty else 0.0, drop_rate=args.drop_rate if faulty else 0.0
+    )
+    if name == "weather_hot":
+        def request(n):
+            return "/api/weather", {"city": f"Hot City {n % HOT_CITIES}"}
+    elif name == "history":
+        seed_history(args.mongodb_uri, args.history_docs)
+
+        def request(n):
+            return "/api/weather/history", {"city": f"City{n % 100}", "days": 7}
+    else:
+        def request(n):
+            return "/api/weather", {"city": f"{name} {n}"}
+
+    port = free_port()
+    with stub:
+        api = start_api(port, api_env(stub.url, args.mongodb_uri, os.path.join(scratch, name)))
+        try:
+            latencies, statuses, seconds = asyncio.run(
+                drive(f"http://127.0.0.1:{port}", request, args.concurrency, args.duration, args.warmup)
+            )
+            result = summarize(latencies, statuses, seconds)
+            memory = memory_mb(api.pid)
+        finally:
+            api.terminate()
+            api.wait()
+    result["memory_mb"] = {key: round(value, 1) if value is not None else None for key, value in memory.items()}
+    return result
+
+
+def scheduler_job(cities: int):
+    """Child process body: run the scheduled batch scrape and print its summary as JSON"""
+    from app.scheduler import scrape_batch
+
+    summary = scrape_batch([f"Scheduled City {i}" for i in range(cities)], "Benchmark scrape")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"summary": summary, "peak_mb": peak}))
+
+
+def run_scheduler_scenario(args, scratch: str) -> Dict[str, Any]:
+    with StubProcess(latency=args.latency, recorded=True, jitter=args.jitter) as stub:
+        env = api_env(stub.url, args.mongodb_uri, os.path.join(scratch, "scheduler"))
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_suite", "--scheduler-job", str(args.scheduler_cities)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+    report = json.loads(output.strip().splitlines()[-1])
+    summary = report["summary"]
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "requests": summary["total"],
+        "seconds": round(summary["wall_clock"], 2),
+        "throughput_rps": round(summary["cities_per_second"], 1) if summary["cities_per_second"] else None,
+        "latency_ms": {"p50": ms(summary["latency_p50"]), "p95": ms(summary["latency_p95"])},
+        "errors": summary["failures"],
+        "error_rate": round(summary["failures"] / summary["total"], 4) if summary["total"] else None,
+        "retries": summary["retries"],
+        "memory_mb": {"peak": round(report["peak_mb"], 1)},
+    }
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print per-scenario changes against a baseline report; returns the regressions"""
+    regressions = []
+    print(f"\nCompared with {(baseline.get('commit') or 'unknown')[:10]} (tolerance {tolerance:.0%}):")
+    print(f"{'scenario':<16} {'throughput':>11} {'p95 latency':>12} {'peak memory':>12}")
+    for name, result in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old or "skipped" in result or "skipped" in old:
+            continue
+        changes = {
+            "throughput": (old.get("throughput_rps"), result.get("throughput_rps"), -1),
+            "p95 latency": (old["latency_ms"].get("p95"), result["latency_ms"].get("p95"), 1),
+            "peak memory": (old["memory_mb"].get("peak"), result["memory_mb"].get("peak"), 1),
+        }
+        cells = []
+        for metric, (before, after, worse) in changes.items():
+            if not before or after is None:
+                cells.append("n/a")
+                continue
+            change = (after - before) / before
+            cells.append(f"{change:+.1%}")
+            if change * worse > tolerance:
+                regressions.append(f"{name}: {metric} {before:g} -> {after:g} ({change:+.1%})")
+        print(f"{name:<16} {cells[0]:>11} {cells[1]:>12} {cells[2]:>12}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds per HTTP scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub upstream latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Extra random upstream latency, up to (s)")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="Upstream 503 rate in weather_faulty")
+    parser.add_argument("--drop-rate", type=float, default=0.05, help="Upstream dropped-connection rate in weather_faulty")
+    parser.add_argument("--scheduler-cities", type=int, default=200)
+    parser.add_argument("--history-docs", type=int, default=43200, help="Synthetic observations for history")
+    parser.add_argument("--mongodb-uri", default=None, help="MongoDB to run against (unreachable if omitted)")
+    parser.add_argument("--output", default=None, help="Report path (default benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change counted as a regression")
+    parser.add_argument("--scheduler-job", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scheduler_job is not None:
+        scheduler_job(args.scheduler_job)
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = {
+        **git_commit(),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "scheduler_job")},
+        "scenarios": {},
+    }
+    scratch = tempfile.mkdtemp(prefix="bench_suite_")
+    print(f"{'scenario':<16} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'peak MB':>8}")
+    try:
+        for name in scenarios:
+            if name == "history" and not args.mongodb_uri:
+                report["scenarios"][name] = {"skipped": "needs --mongodb-uri"}
+                print(f"{name:<16} skipped (needs --mongodb-uri)")
+                continue
+            result = run_scheduler_scenario(args, scratch) if name == "scheduler" else run_http_scenario(name, args, scratch)
+            report["scenarios"][name] = result
+            latency = result["latency_ms"]
+
+            def cell(value, spec):
+                return format(value, spec) if value is not None else "n/a"
+
+            print(
+                f"{name:<16} {result['requests']:>9} {cell(result['throughput_rps'], '>8.1f')} "
+                f"{cell(latency.get('p50'), '>8.1f')} {cell(latency.get('p95'), '>8.1f')} "
+                f"{cell(latency.get('p99'), '>8.1f')} {result['errors']:>7} "
+                f"{cell(result['memory_mb'].get('peak'), '>8.1f')}"
+            )
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output = Path(args.output) if args.output else RESULTS / (
+        f"{(report['commit'] or 'unknown')[:10]}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"✓ Report written to {output}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"✗ Regression - {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Fake upstream providers for exercising the provider registry offline
+
+Fake providers never touch the network: each one sleeps for a configurable
+latency (with jitter), fails at a configurable rate, and otherwise returns
+a canned weather or AQI result. ``fake_scraper`` builds an
+AsyncWeatherScraper whose registry holds only the given providers.
+
+Usage:
+    scraper = fake_scraper([
+        FakeProvider("fast_weather", WEATHER, priority=10, latency=0.05),
+        FakeProvider("fake_aqi", AQI, priority=10, latency=0.03),
+    ])
+    await scraper.scrape_weather("London")
+"""
+import asyncio
+import random
+from typing import Any, Dict, Iterable, Optional
+
+from app.cache import ResponseCache
+from app.providers import AQI, WEATHER, Getter, Provider
+from app.scraper import AsyncWeatherScraper, aqi_level
+
+
+class FakeProvider(Provider):
+    """Provider with a simulated latency and failure rate"""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        priority: int = 100,
+        latency: float = 0.05,
+        jitter: float = 0.1,
+        failure_rate: float = 0.0,
+        aqi: int = 42,
+        seed: Optional[int] = None
+    ):
+        self.name = name
+        self.kind = kind
+        self.priority = priority
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.aqi = aqi
+        self.calls = 0
+        self._random = random.Random(seed if seed is not None else name)
+
+    async def fetch(self, get: Getter, city: str) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        spread = self.latency * self.jitter
+        await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-spread, spread)))
+        if self._random.random() < self.failure_rate:
+            raise Exception(f"{self.name}: connection failed (simulated)")
+        if self.kind == AQI:
+            return {"aqi": self.aqi, "level": aqi_level(self.aqi)}
+        return {
+            "city": city.title(),
+            "temperature": 21.0,
+            "humidity": 55.0,
+            "wind_speed": 12.0,
+            "condition": f"Clear ({self.name})",
+        }
+
+
+def fake_scraper(providers: Iterable[Provider], adaptive: bool = True, **kwargs) -> AsyncWeatherScraper:
+    """An uncached scraper whose registry holds only the given providers"""
+    kwargs.setdefault("cache", ResponseCache(max_entries=0))
+    scraper = AsyncWeatherScraper(**kwargs)
+    scraper.providers.adaptive = adaptive
+    for provider in scraper.providers.providers():
+        scraper.providers.unregister(provider.name)
+    for provider in providers:
+        scraper.providers.register(provider)
+    return scraper
+
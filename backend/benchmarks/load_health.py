@@ -0,0 +1,155 @@
+"""
+Load test: /health latency while /api/weather is saturated
+
+Starts the API under uvicorn in a child process, pointed at a slow stub
+upstream, then hammers /api/weather with uncached cities from many
+concurrent clients (which honour Retry-After) while probing /health. Prints /health latency idle and
+under load, and the /api/weather status mix (503s carry Retry-After once
+the scrape limiter's queue is full).
+
+Usage (from backend/):
+    python -m benchmarks.load_health [--concurrency 200] [--duration 10] [--latency 1.0]
+"""
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from app.stats import percentile
+from benchmarks.stub_server import StubProcess
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(port: int, upstream: str, max_scrapes: int, scrape_queue: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WTTR_BASE_URL": upstream,
+        "WAQI_BASE_URL": upstream,
+        "MONGODB_URI": "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=300",
+        "SCRAPE_MAX_CONCURRENCY": str(max_scrapes),
+        "SCRAPE_QUEUE_LIMIT": str(scrape_queue),
+        # The stub serves wttr.in and WAQI from one host; allow what two hosts would get
+        "HTTP_MAX_CONNECTIONS_PER_HOST": "40",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("API did not start")
+
+
+async def probe_health(url: str, until: float, interval: float = 0.02):
+    """Sequential /health requests until the deadline; returns latencies (s)"""
+    latencies = []
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        while time.perf_counter() < until:
+            start = time.perf_counter()
+            await client.get("/health")
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(interval)
+    return latencies
+
+
+async def hammer(url: str, until: float, concurrency: int):
+    """Concurrent /api/weather requests for never-repeated cities"""
+    statuses: Counter = Counter()
+    retry_after = set()
+    latencies = []
+    cities = itertools.count()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        async def worker():
+            while time.perf_counter() < until:
+                start = time.perf_counter()
+                try:
+                    response = await client.get("/api/weather", params={"city": f"Load{next(cities)}"})
+                except httpx.HTTPError:
+                    statuses["error"] += 1
+                    continue
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                elif response.status_code == 503 and "retry-after" in response.headers:
+                    # Back off like a well-behaved client
+                    retry_after.add(response.headers["retry-after"])
+                    await asyncio.sleep(float(response.headers["retry-after"]))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses, retry_after, latencies
+
+
+def hammer_process(url: str, duration: float, concurrency: int, results: multiprocessing.Queue):
+    results.put(asyncio.run(hammer(url, time.perf_counter() + duration, concurrency)))
+
+
+def run(url: str, concurrency: int, duration: float):
+    """
+    Probe /health idle, then again while a separate process generates load
+    (so the probe's latency isn't skewed by the load generator's own event loop)
+    """
+    idle = asyncio.run(probe_health(url, time.perf_counter() + 3))
+    results = multiprocessing.Queue()
+    load = multiprocessing.Process(target=hammer_process, args=(url, duration, concurrency, results))
+    load.start()
+    loaded = asyncio.run(probe_health(url, time.perf_counter() + duration))
+    statuses, retry_after, latencies = results.get()
+    load.join()
+    return idle, loaded, statuses, retry_after, latencies
+
+
+def ms(samples, pct):
+    return percentile(samples, pct) * 1000 if samples else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200, help="Concurrent /api/weather clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load")
+    parser.add_argument("--latency", type=float, default=1.0, help="Stub upstream latency (s)")
+    parser.add_argument("--max-scrapes", type=int, default=20, help="SCRAPE_MAX_CONCURRENCY for the API")
+    parser.add_argument("--scrape-queue", type=int, default=40, help="SCRAPE_QUEUE_LIMIT for the API")
+    args = parser.parse_args()
+
+    port = free_port()
+    with StubProcess(latency=args.latency) as stub:
+        api = start_api(port, stub.url, args.max_scrapes, args.scrape_queue)
+        try:
+            idle, loaded, statuses, retry_after, latencies = run(
+                f"http://127.0.0.1:{port}", args.concurrency, args.duration
+            )
+        finally:
+            api.terminate()
+            api.wait()
+
+    print(f"{args.concurrency} clients for {args.duration:g}s, upstream latency {args.latency * 1000:.0f} ms, "
+          f"{args.max_scrapes} scrape slots + {args.scrape_queue} queued")
+    print(f"{'/health':<14} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for label, samples in (("idle", idle), ("under load", loaded)):
+        print(f"{label:<14} {len(samples):>6} {ms(samples, 50):>8.1f} {ms(samples, 95):>8.1f} {max(samples) * 1000:>8.1f}")
+    print(f"/api/weather statuses: {dict(statuses)}; Retry-After values: {sorted(retry_after) or 'none'}")
+    print(f"/api/weather 200 latency: p50 {ms(latencies, 50):.0f} ms, p95 {ms(latencies, 95):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Re-record the upstream fixtures replayed by the stub server
+
+Fetches, for each city, the wttr.in j1 payload and HTML page and the WAQI
+feed and search responses, and saves them under benchmarks/fixtures
+(wttr_j1/<city>.json, wttr_html/<city>.html, waqi/<city>_feed.json and
+waqi/<city>_search.json). Needs network access; uses the same base URLs,
+user agent and demo token as the scraper.
+
+Usage (from backend/):
+    python -m benchmarks.record_fixtures [--cities delhi,london,moscow,reykjavik]
+"""
+import argparse
+import json
+import os
+
+import httpx
+
+from app.scraper import DEFAULT_USER_AGENT, WAQI_BASE_URL, WTTR_BASE_URL
+from benchmarks.stub_server import FIXTURES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", default="delhi,london,moscow,reykjavik")
+    args = parser.parse_args()
+
+    headers = {"User-Agent": os.getenv("SCRAPER_USER_AGENT", DEFAULT_USER_AGENT)}
+    with httpx.Client(headers=headers, timeout=20, follow_redirects=True) as client:
+        for city in [city.strip().lower() for city in args.cities.split(",") if city.strip()]:
+            targets = {
+                FIXTURES / "wttr_j1" / f"{city}.json": f"{WTTR_BASE_URL}/{city}?format=j1",
+                FIXTURES / "wttr_html" / f"{city}.html": f"{WTTR_BASE_URL}/{city}",
+                FIXTURES / "waqi" / f"{city}_feed.json": f"{WAQI_BASE_URL}/feed/{city}/?token=demo",
+                FIXTURES / "waqi" / f"{city}_search.json": f"{WAQI_BASE_URL}/search/?token=demo&keyword={city}",
+            }
+            for path, url in targets.items():
+                response = client.get(url)
+                response.raise_for_status()
+                if path.suffix == ".json":
+                    # Re-indent so fixture diffs stay readable
+                    path.write_text(json.dumps(response.json(), indent=1, ensure_ascii=False))
+                else:
+                    path.write_text(response.text)
+                print(f"✓ {url} -> {path.relative_to(FIXTURES)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Simulator: freshness per upstream call, refresh scheduler vs daily cron
+
+Replays a synthetic request trace (Zipf-distributed city popularity, a
+diurnal request rate) against refresh policies, assuming every request is
+served from stored data and refreshes complete instantly:
+
+- cron-static: the daily 06:00 job over a fixed list (the 5 most popular
+  cities, the best case for SCRAPE_CITIES)
+- cron-all: the daily 06:00 job over every city in the trace
+- priority@N: app.refresh.RefreshPlanner with a budget of N upstream
+  requests per minute (one budget matches cron-all's call count)
+
+Reports upstream calls, the age of the data each request was served
+(requests for cities never refreshed count as misses) and fresh responses
+(age <= --fresh minutes) per upstream call. The first simulated day is
+warm-up and not reported.
+
+Usage (from backend/):
+    python -m benchmarks.simulate_refresh [--cities 200] [--requests-per-day 20000] [--days 3]
+        [--budgets 2,10] [--fresh 60]
+"""
+import argparse
+import math
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.refresh import REFRESH_REQUESTS_PER_CITY, REFRESH_TICK_SECONDS, RefreshPlanner
+from app.stats import percentile
+
+DAY = 86400.0
+CRON_HOUR = 6
+
+
+def trace(cities: int, per_day: float, days: int, zipf: float, seed: int) -> List[Tuple[float, int]]:
+    """(time, city) requests: Poisson arrivals with a diurnal rate, Zipf popularity"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** zipf for rank in range(cities)]
+    peak = per_day / DAY * 1.6
+    requests = []
+    now = 0.0
+    while True:
+        now += rng.expovariate(peak)
+        if now >= days * DAY:
+            return requests
+        # Thinning: rate peaks at 18:00 and bottoms out at 06:00
+        rate = per_day / DAY * (1 + 0.6 * math.sin(2 * math.pi * (now / DAY - 0.5)))
+        if rng.random() < rate / peak:
+            requests.append((now, rng.choices(range(cities), weights)[0]))
+
+
+def simulate(
+    requests: List[Tuple[float, int]],
+    days: int,
+    plan: Callable[[float], List[int]],
+    on_request: Optional[Callable[[float, int], None]] = None,
+    tick: float = REFRESH_TICK_SECONDS
+):
+    """
+    Step through the trace tick by tick
+
+    Returns:
+        (refreshes after warm-up, served ages in seconds after warm-up, None
+        for requests of cities never refreshed)
+    """
+    refreshed_at: Dict[int, float] = {}
+    ages: List[Optional[float]] = []
+    refreshes = 0
+    index = 0
+    now = 0.0
+    while now < days * DAY:
+        for city in plan(now):
+            refreshed_at[city] = now
+            if now >= DAY:
+                refreshes += 1
+        now += tick
+        while index < len(requests) and requests[index][0] < now:
+            at, city = requests[index]
+            index += 1
+            if on_request is not None:
+                on_request(at, city)
+            if at >= DAY:
+                ages.append(at - refreshed_at[city] if city in refreshed_at else None)
+    return refreshes, ages
+
+
+def cron(cities: List[int], tick: float) -> Callable[[float], List[int]]:
+    def plan(now: float) -> List[int]:
+        offset = (now - CRON_HOUR * 3600) % DAY
+        return cities if offset < tick else []
+    return plan
+
+
+def priority(budget: float, tick: float):
+    planner = RefreshPlanner(budget_per_minute=budget)
+
+    def plan(now: float) -> List[int]:
+        chosen = planner.take(now)
+        for location_id, query in chosen.items():
+            planner.record_observation(location_id, query, now)
+        return [int(location_id) for location_id in chosen]
+
+    def on_request(at: float, city: int):
+        planner.record_request(str(city), str(city), at)
+
+    return plan, on_request
+
+
+def report(name: str, refreshes: int, ages: List[Optional[float]], fresh: float, days: int):
+    calls = refreshes * REFRESH_REQUESTS_PER_CITY
+    served = [age for age in ages if age is not None]
+    fresh_count = sum(1 for age in served if age <= fresh)
+    print(
+        f"{name:>14} {calls / (days - 1):>10.0f} "
+        f"{percentile(served, 50) / 60:>9.0f} {percentile(served, 95) / 60:>9.0f} "
+        f"{100 * (len(ages) - len(served)) / len(ages):>7.1f} "
+        f"{100 * fresh_count / len(ages):>7.1f} "
+        f"{fresh_count / calls if calls else 0:>11.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--requests-per-day", type=float, default=20000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Popularity skew")
+    parser.add_argument("--budgets", default="2,10", help="Refresh budgets to try (upstream requests/min)")
+    parser.add_argument("--fresh", type=float, default=60, help="Minutes within which data counts as fresh")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    tick = REFRESH_TICK_SECONDS
+    requests = trace(args.cities, args.requests_per_day, args.days, args.zipf, args.seed)
+    fresh = args.fresh * 60
+    print(
+        f"{len(requests)} requests over {args.days} days for {args.cities} cities "
+        f"(zipf {args.zipf}); stats exclude the first day"
+    )
+    print(
+        f"{'policy':>14} {'calls/day':>10} {'p50 min':>9} {'p95 min':>9} {'miss %':>7} "
+        f"{'fresh %':>7} {'fresh/call':>11}"
+    )
+
+    report("cron-static", *simulate(requests, args.days, cron(list(range(5)), tick), tick=tick), fresh, args.days)
+    report("cron-all", *simulate(requests, args.days, cron(list(range(args.cities)), tick), tick=tick), fresh, args.days)
+
+    matched = args.cities * REFRESH_REQUESTS_PER_CITY / (24 * 60)
+    budgets = [matched] + [float(budget) for budget in args.budgets.split(",") if budget]
+    for budget in budgets:
+        plan, on_request = priority(budget, tick)
+        refreshes, ages = simulate(requests, args.days, plan, on_request, tick=tick)
+        report(f"priority@{budget:.3g}", refreshes, ages, fresh, args.days)
+
+
+if __name__ == "__main__":
+    main()
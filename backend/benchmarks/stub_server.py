@@ -0,0 +1,383 @@
+"""
+Local stub of the upstream weather and AQI services
+Serves wttr.in-style JSON/HTML and WAQI-style responses on localhost so the
+scraper can be benchmarked without touching the network. Responses are
+gzipped when the client accepts it, and can carry an ETag (answering
+matching If-None-Match with 304) and a Cache-Control max-age.
+
+Responses are synthesized by default; with ``recorded=True`` the recorded
+payloads in benchmarks/fixtures (wttr.in j1 and HTML, WAQI feed and search)
+are replayed instead. Latency jitter, error responses (503) and dropped
+connections can be injected at given rates.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, unquote
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _hourly(hour: int) -> dict:
+    """One 3-hourly forecast slot, with the fields wttr.in returns"""
+    return {
+        "time": str(hour * 100),
+        "tempC": str(20 + hour // 3), "tempF": str(68 + hour // 2),
+        "FeelsLikeC": str(21 + hour // 3), "humidity": str(60 - hour),
+        "windspeedKmph": "11", "windspeedMiles": "7", "winddirDegree": "230", "winddir16Point": "SW",
+        "weatherCode": "116", "weatherDesc": [{"value": "Partly cloudy"}],
+        "weatherIconUrl": [{"value": ""}],
+        "precipMM": "0.0", "pressure": "1015", "cloudcover": "40", "visibility": "10", "uvIndex": "5",
+        "chanceofrain": "10", "chanceofsnow": "0", "chanceofthunder": "0", "chanceoffog": "0",
+        "DewPointC": "14", "HeatIndexC": "27", "WindChillC": "26", "WindGustKmph": "15",
+    }
+
+
+def nearest_area(query: str) -> dict:
+    """
+    wttr.in-style nearest_area for a query: coordinates are echoed, names get
+    stable pseudo-random coordinates (the same for any spelling of the name)
+    """
+    try:
+        latitude, longitude = (float(part) for part in query.split(","))
+        name = f"Near {latitude:.2f},{longitude:.2f}"
+    except ValueError:
+        digest = int(hashlib.sha1(" ".join(query.casefold().split()).encode()).hexdigest(), 16)
+        latitude = -60 + digest % 12000 / 100
+        longitude = -180 + digest // 12000 % 36000 / 100
+        name = query
+    return {
+        "areaName": [{"value": name}], "country": [{"value": "Stubland"}],
+        "latitude": f"{latitude:.3f}", "longitude": f"{longitude:.3f}",
+    }
+
+
+def j1_payload(city: str, days: int = 3) -> dict:
+    """Build a wttr.in format=j1 payload (current conditions plus a multi-day forecast)"""
+    today = date.today()
+    return {
+        "current_condition": [{
+            "temp_C": "27",
+            "humidity": "61",
+            "windspeedKmph": "11",
+            "weatherDesc": [{"value": "Partly cloudy"}],
+        }],
+        "nearest_area": [nearest_area(city)],
+        "weather": [
+            {
+                "date": (today + timedelta(days=day)).isoformat(),
+                "maxtempC": "29", "mintempC": "19", "avgtempC": "24",
+                "sunHour": "10.5", "totalSnow_cm": "0.0", "uvIndex": "6",
+                "astronomy": [{"sunrise": "06:12 AM", "sunset": "06:48 PM"}],
+                "hourly": [_hourly(hour) for hour in range(0, 24, 3)],
+            }
+            for day in range(days)
+        ],
+    }
+
+
+def html_page(city: str) -> str:
+    """Build a minimal wttr.in HTML page"""
+    return (
+        "<html><head><title>Weather report</title></head><body>"
+        f"<pre>Weather report: {city}\n\n"
+        "     \\  /       Partly cloudy\n"
+        "   _ /\"\".-.     +27 °C\n"
+        "     \\_(   ).   ↗ 11 km/h\n"
+        "</pre></body></html>"
+    )
+
+
+class RecordedResponses:
+    """
+    Recorded upstream payloads from benchmarks/fixtures, replayed per query
+
+    A query naming a recorded city gets that city's payloads; any other
+    query gets those of a recorded city picked by hash, with the j1
+    nearest_area replaced so distinct queries still resolve to distinct
+    locations. j1 forecast dates are shifted to start today.
+    """
+
+    def __init__(self, directory: Path = FIXTURES):
+        self.j1 = {path.stem: json.loads(path.read_text()) for path in sorted((directory / "wttr_j1").glob("*.json"))}
+        self.html = {path.stem: path.read_text() for path in sorted((directory / "wttr_html").glob("*.html"))}
+        self.waqi = {path.stem: path.read_text() for path in sorted((directory / "waqi").glob("*.json"))}
+        self.cities: List[str] = sorted(set(self.j1) & set(self.html))
+
+    def _city(self, query: str):
+        """(recorded city, whether the query names it)"""
+        key = " ".join(query.casefold().split())
+        if key in self.cities:
+            return key, True
+        return self.cities[int(hashlib.sha1(key.encode()).hexdigest(), 16) % len(self.cities)], False
+
+    def route(self, path: str, query: str):
+        if path.startswith("/feed/") or path.startswith("/search/"):
+            city, _ = self._city(path.split("/")[2] if path.startswith("/feed/") else query.rpartition("keyword=")[2])
+            kind = "feed" if path.startswith("/feed/") else "search"
+            return self.waqi[f"{city}_{kind}"].encode(), "application/json"
+        location = path.strip("/")
+        city, exact = self._city(location)
+        if "format=j1" not in query:
+            return self.html[city].encode(), "text/html; charset=utf-8"
+        payload = dict(self.j1[city])
+        if not exact:
+            payload["nearest_area"] = [nearest_area(location)]
+        today = date.today()
+        payload["weather"] = [
+            {**day, "date": (today + timedelta(days=offset)).isoformat()}
+            for offset, day in enumerate(payload["weather"])
+        ]
+        return json.dumps(payload).encode(), "application/json"
+
+
+def route(target: str, recorded: Optional[RecordedResponses] = None):
+    """
+    Resolve a request target to a response
+
+    Returns:
+        (body, content type) tuple
+    """
+    parts = urlsplit(target)
+    path = unquote(parts.path)
+
+    if recorded is not None and not path.startswith("/v2/locations"):
+        return recorded.route(path, unquote(parts.query))
+
+    if path.startswith("/feed/"):
+        return json.dumps({"status": "ok", "data": {"aqi": 87}}).encode(), "application/json"
+    if path.startswith("/search/"):
+        return json.dumps({"status": "ok", "data": [{"aqi": 87}]}).encode(), "application/json"
+    if path.startswith("/v2/locations"):
+        return json.dumps({"results": []}).encode(), "application/json"
+    if "format=j1" in parts.query:
+        return json.dumps(j1_payload(path.strip("/"))).encode(), "application/json"
+    return html_page(path.strip("/")).encode(), "text/html; charset=utf-8"
+
+
+async def handle_connection(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    latency: float,
+    etag: bool = False,
+    max_age: Optional[int] = None,
+    recorded: Optional[RecordedResponses] = None,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    drop_rate: float = 0.0
+):
+    """
+    Serve keep-alive HTTP/1.1 GET requests on one connection
+
+    Every response waits ``latency`` plus up to ``jitter`` seconds; a
+    fraction ``error_rate`` of requests get a 503 and a fraction
+    ``drop_rate`` have their connection closed without a response.
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers: Dict[str, str] = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            target = request_line.split()[1].decode()
+            delay = latency + (random.uniform(0, jitter) if jitter else 0.0)
+            if delay:
+                await asyncio.sleep(delay)
+            fault = random.random() if error_rate or drop_rate else 1.0
+            if fault < drop_rate:
+                break
+            if fault < drop_rate + error_rate:
+                body, content_type = b"Service Unavailable", "text/plain"
+                status = b"503 Service Unavailable"
+            else:
+                body, content_type = route(target, recorded)
+                status = b"200 OK"
+
+            response_headers = [("Content-Type", content_type)]
+            if max_age is not None and status == b"200 OK":
+                response_headers.append(("Cache-Control", f"max-age={max_age}"))
+            if etag and status == b"200 OK":
+                tag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                response_headers.append(("ETag", tag))
+                if headers.get("if-none-match") == tag:
+                    status, body = b"304 Not Modified", b""
+            if body and "gzip" in headers.get("accept-encoding", ""):
+                body = gzip.compress(body, compresslevel=6)
+                response_headers.append(("Content-Encoding", "gzip"))
+            response_headers.append(("Content-Length", str(len(body))))
+
+            writer.write(
+                b"HTTP/1.1 " + status + b"\r\n"
+                + b"".join(f"{name}: {value}\r\n".encode() for name, value in response_headers)
+                + b"\r\n" + body
+            )
+            await writer.drain()
+    except (ConnectionError, IndexError):
+        pass
+    finally:
+        writer.close()
+
+
+class StubServer:
+    """
+    Asyncio stub upstream server running in a background thread
+
+    Args:
+        latency: Seconds added to every response
+        port: Port to listen on (0 picks a free one)
+        etag: Send ETags and answer matching If-None-Match with 304
+        max_age: Send Cache-Control: max-age
+        recorded: Replay the recorded fixtures instead of synthesized payloads
+        jitter: Up to this many extra seconds per response (uniform)
+        error_rate: Fraction of requests answered with a 503
+        drop_rate: Fraction of requests whose connection is closed unanswered
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        port: int = 0,
+        etag: bool = False,
+        max_age: Optional[int] = None,
+        recorded: bool = False,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        drop_rate: float = 0.0
+    ):
+        self.latency = latency
+        self.port = port
+        self.etag = etag
+        self.max_age = max_age
+        self.recorded = RecordedResponses() if recorded else None
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self._loop = asyncio.new_event_loop()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "StubServer":
+        self._server = self._loop.run_until_complete(asyncio.start_server(
+            lambda r, w: handle_connection(
+                r, w, self.latency, self.etag, self.max_age,
+                self.recorded, self.jitter, self.error_rate, self.drop_rate
+            ),
+            "127.0.0.1", self.port, backlog=1024
+        ))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    async def _shutdown(self):
+        self._server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class StubProcess:
+    """
+    Stub upstream server running in a child process
+    Keeps the stub's request handling off the benchmarked process's GIL
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        etag: bool = False,
+        max_age: Optional[int] = None,
+        recorded: bool = False,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        drop_rate: float = 0.0
+    ):
+        self.latency = latency
+        self.etag = etag
+        self.max_age = max_age
+        self.recorded = recorded
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self._proc: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "StubProcess":
+        command = [sys.executable, "-m", "benchmarks.stub_server", "--port", str(self.port), "--latency", str(self.latency)]
+        if self.etag:
+            command.append("--etag")
+        if self.max_age is not None:
+            command += ["--max-age", str(self.max_age)]
+        if self.recorded:
+            command.append("--recorded")
+        command += ["--jitter", str(self.jitter), "--error-rate", str(self.error_rate), "--drop-rate", str(self.drop_rate)]
+        self._proc = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        self._proc.kill()
+        raise RuntimeError("Stub server did not start")
+
+    def __exit__(self, *exc):
+        self._proc.terminate()
+        self._proc.wait()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the stub upstream server")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every response")
+    parser.add_argument("--etag", action="store_true", help="Send ETags and answer If-None-Match with 304")
+    parser.add_argument("--max-age", type=int, default=None, help="Send Cache-Control: max-age")
+    parser.add_argument("--recorded", action="store_true", help="Replay the recorded fixtures")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of connections closed unanswered")
+    args = parser.parse_args()
+
+    with StubServer(
+        latency=args.latency, port=args.port, etag=args.etag, max_age=args.max_age, recorded=args.recorded,
+        jitter=args.jitter, error_rate=args.error_rate, drop_rate=args.drop_rate
+    ) as stub:
+        print(f"Stub upstream listening on {stub.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
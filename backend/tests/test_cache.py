@@ -0,0 +1,87 @@
+"""
+Concurrent misses on one key must share a single upstream fetch
+"""
+import asyncio
+
+import pytest
+
+from app.cache import ResponseCache
+
+
+def counting_fetch(value="sunny", delay: float = 0.01, error: Exception = None):
+    """Fetch coroutine factory that counts how often it runs"""
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return value
+
+    return fetch, calls
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = ResponseCache(ttls={"weather": 60})
+    fetch, calls = counting_fetch()
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_fetch("weather", "geo:28.6,77.2", fetch) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ["sunny"] * 10
+    assert [fetched for _, fetched in results].count(True) == 1
+    assert cache.stats()["coalesced"] == 9
+    assert cache.get("weather", "geo:28.6,77.2") == (True, "sunny")
+
+
+def test_failed_fetch_is_shared_but_not_cached():
+    cache = ResponseCache(ttls={"weather": 60})
+    fetch, calls = counting_fetch(error=RuntimeError("upstream down"))
+
+    async def scenario():
+        return await asyncio.gather(
+            *(cache.get_or_fetch("weather", "delhi", fetch) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("weather", "delhi") == (False, None)
+    assert cache.stats()["inflight"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_fetch():
+    cache = ResponseCache(ttls={"weather": 60})
+    fetch, calls = counting_fetch(delay=0.05)
+
+    async def scenario():
+        first = asyncio.ensure_future(cache.get_or_fetch("weather", "delhi", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(cache.get_or_fetch("weather", "delhi", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == ("sunny", False)
+    assert len(calls) == 1
+    assert cache.get("weather", "delhi") == (True, "sunny")
+
+
+def test_results_failing_cache_if_are_not_stored():
+    cache = ResponseCache(ttls={"aqi": 60})
+    fetch, calls = counting_fetch(value={"aqi": None})
+
+    async def scenario():
+        for _ in range(2):
+            await cache.get_or_fetch("aqi", "delhi", fetch, cache_if=lambda result: result["aqi"] is not None)
+
+    asyncio.run(scenario())
+
+    assert len(calls) == 2
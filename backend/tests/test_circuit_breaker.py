@@ -0,0 +1,93 @@
+"""
+Upstream circuit breakers must open on repeated failures, let one probe
+through after the open period and close again once the host recovers
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.locations import LocationResolver
+from app.scraper import AsyncWeatherScraper
+
+HOST = "wttr.test"
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(HOST, failure_threshold=2, open_seconds=0.05)
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    # One probe at a time while half-open
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.transitions == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(HOST, failure_threshold=1, open_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.retry_after() > 0
+
+
+def test_released_probe_slot_can_be_claimed_again():
+    breaker = CircuitBreaker(HOST, failure_threshold=1, open_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.release()
+
+    assert breaker.state == HALF_OPEN and breaker.allow()
+
+
+def test_scraper_fails_fast_while_the_host_is_down():
+    calls = []
+    up = False
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if not up:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={})
+
+    scraper = AsyncWeatherScraper(base_url=f"http://{HOST}", waqi_base_url=f"http://{HOST}", locations=LocationResolver())
+    scraper._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    breaker = scraper.health.breaker(HOST)
+    breaker.failure_threshold, breaker.open_seconds = 2, 0.05
+    url = f"http://{HOST}/Delhi?format=j1"
+
+    async def scenario():
+        nonlocal up
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await scraper._send(url, "wttr_json")
+        # Rejected without a request while open
+        with pytest.raises(CircuitOpenError):
+            await scraper._send(url, "wttr_json")
+        assert len(calls) == 2
+
+        up = True
+        await asyncio.sleep(0.06)
+        response = await scraper._send(url, "wttr_json")
+        await scraper.close()
+        return response
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert len(calls) == 3
+    assert breaker.state == CLOSED
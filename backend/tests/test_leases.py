@@ -0,0 +1,95 @@
+"""
+Shard leases must give each shard to one process at a time, and hand it over
+when the holder stops renewing
+"""
+import threading
+import time
+from collections import Counter
+
+import mongomock
+import pytest
+
+from app.leases import LeaseTable, run_sharded_cycle
+
+SHARDS = 8
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().weather_db
+
+
+def lease_table(db, worker_id: str, ttl: float = 30) -> LeaseTable:
+    return LeaseTable(database=lambda: db, ttl=ttl, worker_id=worker_id)
+
+
+def test_lease_is_exclusive_until_released(db):
+    first, second = lease_table(db, "first"), lease_table(db, "second")
+
+    assert first.acquire("refresh:0")
+    assert not second.acquire("refresh:0")
+    assert first.holds("refresh:0") and not second.holds("refresh:0")
+    # Re-acquiring our own lease extends it
+    assert first.acquire("refresh:0")
+
+    first.release("refresh:0")
+
+    assert not first.holds("refresh:0")
+    assert second.acquire("refresh:0")
+    assert second.held() == {"refresh:0"}
+
+
+def test_expired_lease_is_taken_over(db):
+    first, second = lease_table(db, "first", ttl=0.2), lease_table(db, "second", ttl=0.2)
+    assert first.acquire("refresh:0")
+
+    time.sleep(0.3)
+
+    # The holder considers the lease lost before it actually expires
+    assert not first.holds("refresh:0")
+    assert second.acquire("refresh:0")
+    assert second.stats()["takeovers"] == 1
+    # The old holder learns it lost the lease at its next heartbeat
+    assert first.renew() == set()
+    assert first.stats()["lost"] == 1
+    assert not first.acquire("refresh:0")
+
+
+def test_sharded_cycle_runs_each_shard_exactly_once(db):
+    tables = [lease_table(db, "first"), lease_table(db, "second")]
+    runs = Counter()
+    ran_by = {}
+    lock = threading.Lock()
+
+    def work(shard: int):
+        with lock:
+            runs[shard] += 1
+        time.sleep(0.01)
+
+    def worker(leases: LeaseTable):
+        ran_by[leases.worker_id] = run_sharded_cycle(leases, "rollup", "2026-10-18", SHARDS, work, poll_interval=0.01)
+
+    threads = [threading.Thread(target=worker, args=(leases,)) for leases in tables]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert runs == {shard: 1 for shard in range(SHARDS)}
+    assert sorted(ran_by["first"] + ran_by["second"]) == list(range(SHARDS))
+
+    # A later call for the same cycle has nothing left to do
+    assert run_sharded_cycle(tables[0], "rollup", "2026-10-18", SHARDS, work) == []
+    assert sum(runs.values()) == SHARDS
+
+
+def test_sharded_cycle_takes_over_shards_of_a_dead_process(db):
+    dead, alive = lease_table(db, "dead", ttl=0.2), lease_table(db, "alive", ttl=0.2)
+    # The dead process claimed a shard, then crashed without completing it
+    assert dead.acquire("rollup:3", {"cycle": {"$ne": "2026-10-18"}})
+    runs = Counter()
+
+    ran = run_sharded_cycle(alive, "rollup", "2026-10-18", SHARDS, lambda shard: runs.update([shard]), poll_interval=0.05)
+
+    assert sorted(ran) == list(range(SHARDS))
+    assert runs == {shard: 1 for shard in range(SHARDS)}
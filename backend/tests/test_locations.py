@@ -0,0 +1,160 @@
+"""
+Location IDs must be the same in every process sharing a database
+"""
+import threading
+import time
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from app.forecast import FORECAST_COLLECTION
+from app.locations import LOCATION_COLLECTION, LocationResolver
+from app.rollups import ROLLUP_COLLECTIONS
+
+DELHI = {"name": "New Delhi", "latitude": 28.61, "longitude": 77.23}
+MUMBAI = {"name": "Mumbai", "latitude": 19.07, "longitude": 72.87}
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().weather_db
+
+
+@pytest.fixture
+def resolver(db):
+    """Resolvers sharing ``db``; background syncs are left to the tests (sync())"""
+    created = []
+
+    def create(database=None, **kwargs) -> LocationResolver:
+        locations = LocationResolver(database=database or (lambda: db), sync_interval=3600, **kwargs)
+        created.append(locations)
+        return locations
+
+    yield create
+    for locations in created:
+        locations.close()
+
+
+def test_resolvers_sharing_a_database_agree(resolver):
+    first, second = resolver(), resolver()
+
+    learned = first.learn("Delhi", DELHI)
+    first.sync()
+    second.sync()
+
+    assert learned.id == "geo:28.6,77.2"
+    assert second.resolve("  delhi ").id == learned.id
+    assert second.resolve("Delhi").name == learned.name
+
+
+def test_missed_name_is_looked_up_in_the_background(resolver):
+    first, second = resolver(), resolver()
+    first.learn("Delhi", DELHI)
+    first.sync()
+
+    # Answered from memory until the lookup has run
+    assert second.resolve("Delhi").id == "name:delhi"
+    second.sync()
+    assert second.resolve("Delhi").id == "geo:28.6,77.2"
+
+
+def test_remembered_miss_is_refreshed_by_a_fetch_without_area(resolver):
+    first, second = resolver(), resolver()
+    second.resolve("Delhi")
+    second.sync()
+
+    first.learn("Delhi", DELHI)
+    first.sync()
+
+    # A miss is remembered for miss_ttl; the HTML fallback (no area) looks again
+    second.resolve("Delhi")
+    assert second.stats()["pending_lookups"] == 0
+    second.learn("Delhi", None)
+    second.sync()
+    assert second.resolve("Delhi").id == "geo:28.6,77.2"
+
+
+def test_first_stored_resolution_wins(resolver):
+    first, second = resolver(), resolver()
+
+    first.learn("Delhi", DELHI)
+    first.sync()
+    second.learn("Delhi", MUMBAI)
+    second.sync()
+
+    assert second.resolve("Delhi").id == "geo:28.6,77.2"
+    assert first.resolve("Delhi").id == second.resolve("Delhi").id
+
+
+def test_learned_names_are_never_forgotten(db, resolver):
+    locations = resolver(max_entries=1)
+    cities = {f"City {i}": {"name": None, "latitude": i, "longitude": i} for i in range(5)}
+
+    for city, area in cities.items():
+        locations.learn(city, area)
+    locations.sync()
+
+    assert all(locations.resolve(city).id.startswith("geo:") for city in cities)
+    assert db[LOCATION_COLLECTION].count_documents({"_id": {"$regex": "^name:"}}) == 5
+
+
+def test_resolving_a_name_moves_its_data_to_the_cell(db, resolver):
+    timestamp = datetime(2024, 1, 1, 12)
+    db.weather_data.insert_many([
+        {
+            "location_id": "name:delhi", "city": "Delhi", "temperature": 20.0 + i, "humidity": 50.0,
+            "wind_speed": 5.0, "condition": "Sunny", "aqi": 100, "aqi_level": "Moderate", "timestamp": timestamp,
+        }
+        for i in range(3)
+    ])
+    db[FORECAST_COLLECTION].insert_one({"location_id": "name:delhi", "city": "Delhi", "issued_at": timestamp})
+
+    locations = resolver()
+    locations.learn("Delhi", DELHI)
+    locations.sync()
+
+    assert db.weather_data.count_documents({"location_id": "geo:28.6,77.2"}) == 3
+    assert db.weather_data.count_documents({"location_id": "name:delhi"}) == 0
+    assert db[FORECAST_COLLECTION].find_one({"location_id": "geo:28.6,77.2"}) is not None
+    hourly = db[ROLLUP_COLLECTIONS["hour"]].find_one({"location_id": "geo:28.6,77.2"})
+    assert hourly["samples"] == 3
+
+
+def test_resolutions_learned_offline_are_shared_later(db, resolver):
+    available = False
+    offline = resolver(lambda: db if available else None)
+
+    assert offline.learn("Delhi", DELHI).id == "geo:28.6,77.2"
+    assert not offline.sync()
+    assert offline.stats()["unsynced"] == 2
+
+    available = True
+    assert offline.sync()
+
+    assert offline.stats()["unsynced"] == 0
+    other = resolver()
+    other.sync()
+    assert other.resolve("Delhi").id == "geo:28.6,77.2"
+
+
+def test_resolving_never_touches_the_database_on_the_caller_thread(db):
+    callers = set()
+
+    def database():
+        callers.add(threading.current_thread())
+        return db
+
+    locations = LocationResolver(database=database, sync_interval=0.01)
+    locations.resolve("Delhi")
+    locations.resolve("28.61,77.23")
+    locations.learn("Delhi", DELHI)
+    locations.learn("Mumbai", None)
+    assert threading.current_thread() not in callers
+
+    # The sync thread stores what was learned
+    deadline = time.monotonic() + 5
+    while db[LOCATION_COLLECTION].find_one({"_id": "name:delhi"}) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    locations.close()
+    assert db[LOCATION_COLLECTION].find_one({"_id": "name:delhi"})["location_id"] == "geo:28.6,77.2"
@@ -0,0 +1,44 @@
+"""
+A sharded cycle across worker processes scrapes every city exactly once and
+speeds up with more workers (needs a MongoDB server; skipped without one)
+"""
+import argparse
+import os
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from benchmarks.bench_sharded_scrape import run
+
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+# Fraction of linear speedup the larger worker count must reach
+MIN_EFFICIENCY = 0.6
+
+
+def mongod_reachable() -> bool:
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+
+pytestmark = pytest.mark.skipif(not mongod_reachable(), reason=f"no MongoDB server at {MONGODB_URI}")
+
+
+def test_cycle_runs_each_city_once_and_scales_with_workers():
+    args = argparse.Namespace(
+        uri=MONGODB_URI, db="test_sharded_scrape", cities=160, shards=32, latency=0.05, ttl=3
+    )
+
+    results = {workers: run(args, workers, crash=False) for workers in (1, 4)}
+
+    for workers, (_, counts, _, incomplete) in results.items():
+        assert set(counts.values()) == {1}, f"{workers} workers scraped a city more or less than once"
+        assert incomplete == 0
+    speedup = results[1][0] / results[4][0]
+    assert speedup >= 4 * MIN_EFFICIENCY, f"4 workers only {speedup:.2f}x faster than 1"
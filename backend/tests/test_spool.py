@@ -0,0 +1,94 @@
+"""
+Spooled observations must survive a crash and be replayed once each
+"""
+import os
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from app.spool import WriteAheadSpool
+
+START = datetime(2024, 1, 1, 12)
+
+
+def observation_key(doc):
+    return doc["location_id"], doc["timestamp"]
+
+
+def observations(count: int, location_id: str = "geo:28.6,77.2"):
+    return [
+        {"location_id": location_id, "city": "Delhi", "temperature": 20.0 + i, "timestamp": START + timedelta(minutes=i)}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().weather_db.weather_data
+
+
+def store_new(collection):
+    """Replay target that skips observations already stored, as services._replay_spooled does"""
+    def write(docs):
+        stored = {observation_key(doc) for doc in collection.find({}, {"location_id": 1, "timestamp": 1})}
+        fresh = [doc for doc in docs if observation_key(doc) not in stored]
+        if fresh:
+            collection.insert_many(fresh)
+    return write
+
+
+def test_duplicate_observations_are_spooled_once(tmp_path):
+    spool = WriteAheadSpool(directory=str(tmp_path), key=observation_key, fsync="never")
+
+    assert spool.extend(observations(3)) == 3
+    assert not spool.append(observations(1)[0])
+    assert spool.stats()["duplicates"] == 1
+    assert spool.pending() == 3
+    spool.close()
+
+
+def test_spool_is_replayed_after_a_crash(tmp_path, collection):
+    crashed = WriteAheadSpool(directory=str(tmp_path), key=observation_key, fsync="always")
+    crashed.extend(observations(5))
+    # Crash: never closed, and the last record was torn mid-write
+    segment = os.path.join(tmp_path, sorted(os.listdir(tmp_path))[-1])
+    with open(segment, "ab") as f:
+        f.write(b"\x40\x00\x00\x00torn")
+
+    reopened = WriteAheadSpool(directory=str(tmp_path), key=observation_key, fsync="never")
+
+    assert reopened.pending() == 5
+    assert reopened.stats()["corrupt"] == 1
+    # Keys of recovered records still deduplicate
+    assert not reopened.append(observations(1)[0])
+    assert reopened.replay(store_new(collection)) == 5
+    assert collection.count_documents({}) == 5
+    assert reopened.pending() == 0
+    assert os.listdir(tmp_path) == []
+    reopened.close()
+
+
+def test_interrupted_replay_is_retried_without_duplicates(tmp_path, collection):
+    spool = WriteAheadSpool(directory=str(tmp_path), key=observation_key, fsync="never")
+    spool.extend(observations(10))
+    write = store_new(collection)
+    calls = 0
+
+    def flaky_write(docs):
+        nonlocal calls
+        calls += 1
+        write(docs)
+        if calls == 2:
+            raise ConnectionError("database went away")
+
+    with pytest.raises(ConnectionError):
+        spool.replay(flaky_write, batch_size=4)
+    assert spool.pending() == 10
+
+    assert spool.replay(flaky_write, batch_size=4) == 10
+
+    stored = [observation_key(doc) for doc in collection.find()]
+    assert len(stored) == len(set(stored)) == 10
+    assert spool.pending() == 0
+    spool.close()
@@ -0,0 +1,89 @@
+"""
+The buffered writer must flush when a batch fills, when the interval passes
+and on shutdown
+"""
+import time
+
+import mongomock
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.writer import BufferedWriter
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().weather_db.weather_data
+
+
+@pytest.fixture
+def writer(collection):
+    created = []
+
+    def create(**kwargs) -> BufferedWriter:
+        writer = BufferedWriter(lambda: collection, name="test_writer", **kwargs)
+        created.append(writer)
+        return writer
+
+    yield create
+    for writer in created:
+        writer.close()
+
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_full_batch_is_flushed_at_once(collection, writer):
+    buffered = writer(batch_size=3, flush_interval=3600)
+
+    for i in range(2):
+        buffered.add({"i": i})
+    time.sleep(0.05)
+    assert collection.count_documents({}) == 0
+
+    buffered.add({"i": 2})
+
+    assert wait_for(lambda: collection.count_documents({}) == 3)
+    assert buffered.stats()["flushes"] == 1
+
+
+def test_partial_batch_is_flushed_after_the_interval(collection, writer):
+    buffered = writer(batch_size=100, flush_interval=0.05)
+
+    buffered.add({"i": 0})
+
+    assert wait_for(lambda: collection.count_documents({}) == 1)
+    assert buffered.stats()["pending"] == 0
+
+
+def test_close_flushes_what_is_left(collection, writer):
+    buffered = writer(batch_size=100, flush_interval=3600)
+    inserted = []
+    buffered.after_insert = inserted.extend
+    for i in range(5):
+        buffered.add({"i": i})
+
+    buffered.close()
+
+    assert collection.count_documents({}) == 5
+    assert [doc["i"] for doc in inserted] == list(range(5))
+
+
+def test_unwritable_batch_goes_to_the_failure_hook():
+    def unreachable():
+        raise ServerSelectionTimeoutError("no servers")
+
+    failed = []
+    buffered = BufferedWriter(unreachable, batch_size=2, flush_interval=3600, on_failure=lambda docs, e: failed.extend(docs))
+    buffered.add({"i": 0})
+    buffered.add({"i": 1})
+    buffered.close()
+
+    assert [doc["i"] for doc in failed] == [0, 1]
+    assert buffered.stats()["failed"] == 2
@@ -1,4 +1,5 @@
 import { memo } from 'react'
+import { getExportUrl } from '../services/api'
 
 /**
  * Export weather data component
@@ -8,7 +9,8 @@ function ExportData({ currentWeather, historyData, city }) {
     const data = {
       city: city || currentWeather?.city,
       current: currentWeather,
-      history: historyData?.data || [],
+      // Decoded history carries epoch milliseconds
+      history: (historyData?.data || []).map((row) => ({ ...row, timestamp: new Date(row.timestamp).toISOString() })),
       exportedAt: new Date().toISOString(),
     }
     
@@ -29,30 +31,12 @@ function ExportData({ currentWeather, historyData, city }) {
       return
     }
 
-    const headers = ['Date', 'City', 'Temperature (°C)', 'Humidity (%)', 'Wind Speed (km/h)', 'Condition']
-    const rows = historyData.data.map(item => [
-      new Date(item.timestamp).toLocaleString(),
-      item.city,
-      item.temperature,
-      item.humidity,
-      item.wind_speed,
-      item.condition,
-    ])
-
-    const csv = [
-      headers.join(','),
-      ...rows.map(row => row.map(cell => `"${cell}"`).join(','))
-    ].join('\n')
-
-    const blob = new Blob([csv], { type: 'text/csv' })
-    const url = URL.createObjectURL(blob)
+    // Streamed by the server straight from the database
     const a = document.createElement('a')
-    a.href = url
-    a.download = `weather_${city}_${new Date().toISOString().split('T')[0]}.csv`
+    a.href = getExportUrl(city || currentWeather?.city, 30, 'csv')
     document.body.appendChild(a)
     a.click()
     document.body.removeChild(a)
-    URL.revokeObjectURL(url)
   }
 
   if (!currentWeather && (!historyData?.data || historyData.data.length === 0)) {
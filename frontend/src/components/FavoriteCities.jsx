@@ -1,10 +1,12 @@
 import { useState, useEffect, memo } from 'react'
+import { streamCurrentWeatherBatch } from '../services/api'
 
 /**
  * Favorite cities component
  */
 function FavoriteCities({ onSelectCity, currentCity }) {
   const [favorites, setFavorites] = useState([])
+  const [temperatures, setTemperatures] = useState({})
 
   useEffect(() => {
     // Load favorites from localStorage
@@ -14,6 +16,20 @@ function FavoriteCities({ onSelectCity, currentCity }) {
     }
   }, [])
 
+  useEffect(() => {
+    // Fetch all favorites in one batch request, showing each city as it arrives
+    if (favorites.length === 0) return
+    let cancelled = false
+    streamCurrentWeatherBatch(favorites, (result) => {
+      if (!cancelled && result.weather) {
+        setTemperatures((prev) => ({ ...prev, [result.city]: result.weather.temperature }))
+      }
+    }).catch(() => {})
+    return () => {
+      cancelled = true
+    }
+  }, [favorites])
+
   const addFavorite = (city) => {
     if (!city || favorites.includes(city)) return
     
@@ -62,6 +78,9 @@ function FavoriteCities({ onSelectCity, currentCity }) {
                 className="px-4 py-2 bg-white/20 hover:bg-white/30 text-white rounded-lg text-sm font-medium transition-all hover:scale-105 flex items-center gap-2 group"
               >
                 <span>{city}</span>
+                {temperatures[city] !== undefined && (
+                  <span className="text-sky-100/80">{Math.round(temperatures[city])}°C</span>
+                )}
                 <button
                   onClick={(e) => {
                     e.stopPropagation()
@@ -2,6 +2,7 @@
  * API service for weather data
  */
 import axios from 'axios'
+import { decodeColumnarHistory } from './columnar'
 
 // Use relative path to leverage Vite proxy, or absolute URL if VITE_API_URL is set
 const API_BASE_URL = import.meta.env.VITE_API_URL || '/api'
@@ -39,18 +40,65 @@ export const getCurrentWeather = async (city) => {
   }
 }
 
+/**
+ * Get current weather for several cities in one request
+ * Results are streamed by the server (NDJSON) and reported as each city completes
+ * @param {string[]} cities - City names
+ * @param {Function} onResult - Called with {city, status, weather} or {city, status, error}
+ * @returns {Promise} Resolves once every city has been reported
+ */
+export const streamCurrentWeatherBatch = async (cities, onResult) => {
+  let response
+  try {
+    response = await fetch(`${API_BASE_URL}/weather/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ cities }),
+    })
+  } catch (error) {
+    throw new Error('Network error. Please check your connection.')
+  }
+  if (!response.ok) {
+    const body = await response.json().catch(() => ({}))
+    throw new Error(body.detail || 'Failed to fetch weather')
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    buffered += decoder.decode(value || new Uint8Array(), { stream: !done })
+    const lines = buffered.split('\n')
+    buffered = lines.pop()
+    lines.filter((line) => line.trim()).forEach((line) => onResult(JSON.parse(line)))
+    if (done) break
+  }
+  if (buffered.trim()) {
+    onResult(JSON.parse(buffered))
+  }
+}
+
 /**
  * Get historical weather data for a city
+ * Raw history is fetched in the compact columnar format and expanded to rows here
  * @param {string} city - City name
  * @param {number} days - Number of days of history (default: 7)
+ * @param {string} [resolution] - 'hour' or 'day' for min/max/mean aggregates (allows up to 365 days)
  * @returns {Promise} Historical weather data
  */
-export const getWeatherHistory = async (city, days = 7) => {
+export const getWeatherHistory = async (city, days = 7, resolution) => {
   try {
+    if (resolution) {
+      const response = await api.get('/weather/history', {
+        params: { city, days, resolution },
+      })
+      return response.data
+    }
     const response = await api.get('/weather/history', {
-      params: { city, days },
+      params: { city, days, format: 'columnar' },
     })
-    return response.data
+    return decodeColumnarHistory(response.data)
   } catch (error) {
     if (error.response) {
       throw new Error(error.response.data.detail || 'Failed to fetch weather history')
@@ -62,3 +110,16 @@ export const getWeatherHistory = async (city, days = 7) => {
   }
 }
 
+
+/**
+ * Get the download URL for a server-side history export
+ * The server streams the file, so large ranges are not built in the browser
+ * @param {string} city - City name
+ * @param {number} days - Number of days of history (default: 30)
+ * @param {string} format - 'csv', 'ndjson' or 'parquet' (default: 'csv')
+ * @returns {string} Export URL
+ */
+export const getExportUrl = (city, days = 30, format = 'csv') => {
+  const params = new URLSearchParams({ city, days: String(days), format })
+  return `${API_BASE_URL}/weather/export?${params}`
+}
@@ -0,0 +1,49 @@
+/**
+ * Decoding for columnar history responses (GET /weather/history?format=columnar)
+ * Kept free of dependencies so it can also run under node (backend benchmarks)
+ */
+
+/**
+ * Rebuild epoch milliseconds from delta-encoded timestamps
+ * @param {{first: number|null, deltas: number[]}} timestamps - First timestamp and successive differences
+ * @returns {number[]} Epoch milliseconds per row
+ */
+const decodeTimestamps = ({ first, deltas }) => {
+  if (first === null) return []
+  const times = new Array(deltas.length + 1)
+  times[0] = first
+  for (let i = 0; i < deltas.length; i++) {
+    times[i + 1] = times[i] + deltas[i]
+  }
+  return times
+}
+
+/**
+ * Convert a columnar history payload into the row shape of format=json
+ * Timestamps stay epoch milliseconds (UTC); new Date() accepts them like ISO strings
+ * @param {Object} payload - Columnar history response
+ * @returns {{city: string, data: Object[], next_cursor: string|null}} Historical weather data
+ */
+export const decodeColumnarHistory = (payload) => {
+  const times = decodeTimestamps(payload.timestamps)
+  const { city, location_id, temperature, humidity, wind_speed, aqi } = payload
+  const condition = payload.condition
+  const aqiLevel = payload.aqi_level
+  const data = new Array(times.length)
+  for (let i = 0; i < times.length; i++) {
+    const conditionCode = condition.codes[i]
+    const aqiLevelCode = aqiLevel.codes[i]
+    data[i] = {
+      city,
+      location_id,
+      temperature: temperature[i],
+      humidity: humidity[i],
+      wind_speed: wind_speed[i],
+      condition: conditionCode === null ? null : condition.values[conditionCode],
+      aqi: aqi[i],
+      aqi_level: aqiLevelCode === null ? null : aqiLevel.values[aqiLevelCode],
+      timestamp: times[i],
+    }
+  }
+  return { city, data, next_cursor: payload.next_cursor }
+}